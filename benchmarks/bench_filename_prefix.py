@@ -0,0 +1,125 @@
+"""
+Benchmark the filename_prefix rewrite applied to every submitted prompt.
+
+Compares the previous recursive walk over the whole request body against
+the targeted rewrite of prompt node inputs, on synthetic workflows that
+embed their workflow JSON in extra_data like the ComfyUI frontend does.
+
+    python benchmarks/bench_filename_prefix.py --nodes 2000
+"""
+
+import sys
+import os
+import copy
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+# The ComfyUI stand-ins live with the tests.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests"))
+
+import comfy_stubs
+
+CLASS_TYPES = ("KSampler", "CLIPTextEncode", "VAEDecode", "LoraLoader", "ImageScale")
+
+
+def legacy_add_user_specific_folder_paths(json_data, user_id: str = "user"):
+    """The recursive walk used before the targeted rewrite."""
+    if isinstance(json_data, dict):
+        for key, value in json_data.items():
+            if key == "filename_prefix":
+                json_data[key] = f"{user_id}/{value}"
+            else:
+                legacy_add_user_specific_folder_paths(value, user_id)
+    elif isinstance(json_data, list):
+        for item in json_data:
+            legacy_add_user_specific_folder_paths(item, user_id)
+
+    return json_data
+
+
+def build_request(nodes: int, save_every: int, seed: int = 0) -> dict:
+    """Build a /prompt request body with an embedded workflow."""
+    rng = random.Random(seed)
+    prompt = {}
+    workflow_nodes = []
+
+    for i in range(nodes):
+        if i % save_every == 0:
+            class_type = "SaveImage"
+            inputs = {"images": [str(i - 1), 0], "filename_prefix": f"render_{i}"}
+        else:
+            class_type = rng.choice(CLASS_TYPES)
+            inputs = {
+                "seed": rng.randrange(2**32),
+                "text": "a photo of a cat " * 8,
+                "model": [str(max(i - 1, 0)), 0],
+                "strength": rng.random(),
+            }
+
+        prompt[str(i)] = {"class_type": class_type, "inputs": inputs}
+        workflow_nodes.append(
+            {
+                "id": i,
+                "type": class_type,
+                "pos": [rng.random() * 1000, rng.random() * 1000],
+                "size": [320, 240],
+                "inputs": [{"name": "model", "type": "MODEL", "link": i}],
+                "outputs": [{"name": "MODEL", "type": "MODEL", "links": [i + 1]}],
+                "properties": {"Node name for S&R": class_type},
+                "widgets_values": list(inputs.values()),
+            }
+        )
+
+    return {
+        "client_id": "bench",
+        "prompt": prompt,
+        "extra_data": {"extra_pnginfo": {"workflow": {"nodes": workflow_nodes}}},
+    }
+
+
+def measure(function, request: dict, repeat: int) -> float:
+    """Return the best time in milliseconds over `repeat` fresh copies."""
+    best = float("inf")
+    for _ in range(repeat):
+        data = copy.deepcopy(request)
+        start = time.perf_counter()
+        function(data)
+        best = min(best, time.perf_counter() - start)
+
+    return best * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--nodes", type=int, default=2000)
+    parser.add_argument("--save-every", type=int, default=50, help="one SaveImage node per N nodes")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    comfy_stubs.install(asyncio.new_event_loop())
+    utils = comfy_stubs.import_utils()
+    server = comfy_stubs.PromptServer.instance
+    users_db = utils.UsersDB(os.path.join(tempfile.mkdtemp(), "users_db.json"))
+    access_control = utils.AccessControl(users_db, server)
+    access_control.set_current_user_id("user")
+
+    request = build_request(args.nodes, args.save_every)
+
+    rewritten = access_control.add_user_specific_folder_paths(copy.deepcopy(request))
+    twice = access_control.add_user_specific_folder_paths(copy.deepcopy(rewritten))
+    assert rewritten == twice, "rewrite is not idempotent"
+    assert rewritten["prompt"] == legacy_add_user_specific_folder_paths(
+        copy.deepcopy(request)
+    )["prompt"]
+
+    legacy = measure(legacy_add_user_specific_folder_paths, request, args.repeat)
+    targeted = measure(access_control.add_user_specific_folder_paths, request, args.repeat)
+
+    print(f"nodes: {args.nodes} | legacy walk: {legacy:.3f} ms | targeted: {targeted:.3f} ms | speedup: {legacy / targeted:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Benchmark the memory used by a full prompt history.
+
+Fills a history of --entries prompts with a synthetic workflow of --nodes
+nodes, once with plain entry dicts like the stock prompt queue keeps and once
+with compact HistoryRecord objects. Reports the traced memory of each, and the
+time to read a page of full entries, a page of summaries and one detail entry.
+
+    python benchmarks/bench_history_memory.py --entries 10000 --nodes 20
+"""
+
+import os
+import sys
+import gc
+import json
+import time
+import random
+import argparse
+import tracemalloc
+
+# The ComfyUI stand-ins live with the tests.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests"))
+
+import comfy_stubs
+
+CLASS_TYPES = (
+    "CheckpointLoaderSimple",
+    "CLIPTextEncode",
+    "KSampler",
+    "VAEDecode",
+    "EmptyLatentImage",
+    "LoraLoader",
+    "ControlNetApply",
+    "SaveImage",
+)
+
+
+def make_prompt_json(nodes: int) -> str:
+    """Build a prompt graph and its LiteGraph workflow as JSON text."""
+    rng = random.Random(0)
+    graph = {}
+    workflow_nodes = []
+    for node_id in range(1, nodes + 1):
+        class_type = CLASS_TYPES[node_id % len(CLASS_TYPES)]
+        inputs = {
+            "seed": "__SEED__",
+            "steps": rng.randint(10, 50),
+            "text": "a detailed photograph of a mountain lake at sunrise, " * 2,
+            "model": [str(max(node_id - 1, 1)), 0],
+        }
+        if class_type == "SaveImage":
+            inputs["filename_prefix"] = "user/ComfyUI"
+        graph[str(node_id)] = {
+            "class_type": class_type,
+            "inputs": inputs,
+            "_meta": {"title": class_type},
+        }
+        workflow_nodes.append(
+            {
+                "id": node_id,
+                "type": class_type,
+                "pos": [rng.random() * 2000, rng.random() * 2000],
+                "size": [315, 262],
+                "flags": {},
+                "order": node_id,
+                "mode": 0,
+                "inputs": [{"name": "model", "type": "MODEL", "link": node_id}],
+                "outputs": [{"name": "MODEL", "type": "MODEL", "links": [node_id + 1]}],
+                "properties": {"Node name for S&R": class_type},
+                "widgets_values": ["__SEED__", "randomize", 20, 8, "euler", "normal", 1],
+            }
+        )
+
+    extra_data = {
+        "client_id": "__CLIENT__",
+        "extra_pnginfo": {"workflow": {"nodes": workflow_nodes, "links": [], "version": 0.4}},
+    }
+    return json.dumps([graph, extra_data])
+
+
+def make_entry(template: str, number: int) -> tuple[str, dict]:
+    """Parse a fresh copy of the prompt, like every submission arrives from JSON."""
+    graph, extra_data = json.loads(
+        template.replace('"__SEED__"', str(number)).replace("__CLIENT__", f"client{number}")
+    )
+    prompt_id = f"prompt-{number:08d}"
+    return prompt_id, {
+        "prompt": (number, prompt_id, graph, extra_data, ["1"]),
+        "outputs": {"1": {"images": [{"filename": f"ComfyUI_{number:05d}_.png", "type": "output"}]}},
+        "status": {
+            "status_str": "success",
+            "completed": True,
+            "messages": [["execution_start", {"prompt_id": prompt_id, "timestamp": number}]],
+        },
+        "user_id": f"user-{number % 50}",
+    }
+
+
+def fill(args: argparse.Namespace, template: str, compact: bool) -> tuple[dict, float]:
+    """Fill a history and get it with the memory it holds, in MB."""
+    from utils.history import HistoryRecord
+
+    gc.collect()
+    tracemalloc.start()
+    history = {}
+    for number in range(args.entries):
+        prompt_id, entry = make_entry(template, number)
+        history[prompt_id] = HistoryRecord.from_entry(entry) if compact else entry
+    gc.collect()
+    memory = tracemalloc.get_traced_memory()[0] / 1024 / 1024
+    tracemalloc.stop()
+    return history, memory
+
+
+def time_reads(history: dict, page_size: int, compact: bool) -> dict:
+    """Time a page of full entries, a page of summaries and a detail read, in ms."""
+    from utils.history import HistoryRecord
+
+    page = list(history)[-page_size:]
+
+    def full(prompt_id: str) -> dict:
+        entry = history[prompt_id]
+        return entry.to_entry() if compact else entry
+
+    def summary(prompt_id: str) -> dict:
+        entry = history[prompt_id]
+        if compact:
+            return entry.to_summary(prompt_id)
+        return HistoryRecord.summarize_entry(prompt_id, entry)
+
+    timings = {}
+    for name, read, prompt_ids in (
+        ("page_ms", full, page),
+        ("summary_page_ms", summary, page),
+        ("detail_ms", full, page[-1:]),
+    ):
+        started_at = time.perf_counter()
+        json.dumps({prompt_id: read(prompt_id) for prompt_id in prompt_ids}, default=str)
+        timings[name] = (time.perf_counter() - started_at) * 1000
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--entries", type=int, default=comfy_stubs.MAXIMUM_HISTORY_SIZE)
+    parser.add_argument("--nodes", type=int, default=20, help="nodes per prompt graph")
+    parser.add_argument("--page-size", type=int, default=64, help="entries per history page")
+    args = parser.parse_args()
+
+    comfy_stubs.install()
+    comfy_stubs.import_utils()
+
+    template = make_prompt_json(args.nodes)
+    print(f"{args.entries} entries | ~{len(template) / 1024:.0f} KB of prompt JSON each")
+
+    results = {}
+    for compact in (False, True):
+        history, memory = fill(args, template, compact)
+        results[compact] = memory
+        timings = time_reads(history, args.page_size, compact)
+        del history
+
+        print(
+            f"{'HistoryRecord' if compact else 'entry dicts':14} {memory:9.1f} MB | "
+            + " | ".join(f"{name} {value:7.2f}" for name, value in timings.items())
+        )
+
+    print(f"memory saved: {1 - results[True] / results[False]:.0%}")
+
+
+if __name__ == "__main__":
+    main()
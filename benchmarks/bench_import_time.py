@@ -0,0 +1,87 @@
+"""
+Benchmark how long ComfyUI takes to import this extension.
+
+Imports the extension in a fresh interpreter with -X importtime, against the
+ComfyUI stand-ins, and reports the cumulative import time of the extension,
+the slowest modules it pulls in and whether heavy dependencies (bleach,
+bcrypt, jwt, cryptography, argon2) are imported before the first request.
+Exits with status 1 when the import takes longer than --max-ms.
+
+    python benchmarks/bench_import_time.py --repeat 5 --max-ms 150
+"""
+
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+HEAVY_MODULES = ("bleach", "bcrypt", "jwt", "cryptography", "argon2")
+PACKAGE = "comfyui_sentinel"
+
+IMPORT_SCRIPT = f"""
+import sys, time, asyncio
+sys.path.insert(0, {os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests")!r})
+import comfy_stubs
+comfy_stubs.install(asyncio.new_event_loop())
+started_at = time.perf_counter()
+comfy_stubs.import_extension({PACKAGE!r})
+print(time.perf_counter() - started_at)
+"""
+
+
+def import_once() -> tuple[float, dict[str, tuple[int, int]]]:
+    """Import the extension in a new interpreter.
+
+    Returns the import time in ms and the modules it imported -> (self us, cumulative us).
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT_SCRIPT],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        if name.strip() == "comfy_stubs":
+            # Everything before this line was imported by the stand-ins.
+            modules = {}
+            continue
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return float(result.stdout.split()[-1]) * 1000, modules
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest modules to list")
+    parser.add_argument("--max-ms", type=float, default=0, help="fail above this import time")
+    args = parser.parse_args()
+
+    runs = [import_once() for _ in range(args.repeat)]
+    extension_ms = [elapsed_ms for elapsed_ms, _ in runs]
+    median_ms = statistics.median(extension_ms)
+
+    print(f"extension import: median {median_ms:.1f} ms | min {min(extension_ms):.1f} ms")
+
+    last = runs[-1][1]
+    heavy = [name for name in HEAVY_MODULES if name in last]
+    print(f"heavy modules imported: {', '.join(heavy) or 'none'}")
+
+    print("slowest modules (self time):")
+    for name, (self_us, cumulative_us) in sorted(
+        last.items(), key=lambda item: item[1][0], reverse=True
+    )[: args.top]:
+        print(f"  {self_us / 1000:8.2f} ms self | {cumulative_us / 1000:8.2f} ms total | {name}")
+
+    if args.max_ms and median_ms > args.max_ms:
+        print(f"FAIL: {median_ms:.1f} ms is above the {args.max_ms:.1f} ms budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
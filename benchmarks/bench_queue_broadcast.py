@@ -0,0 +1,115 @@
+"""
+Benchmark queue status traffic per completed prompt with N connected users.
+
+Every "status" message makes the ComfyUI frontend refetch /api/queue and
+/api/history, so the request volume is estimated from the number of status
+messages delivered to the connected sockets.
+
+    python benchmarks/bench_queue_broadcast.py --users 50 --tabs 2
+"""
+
+import sys
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+
+# The ComfyUI stand-ins live with the tests.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests"))
+
+import comfy_stubs
+
+REFETCHES_PER_STATUS = 2
+
+
+async def run(args: argparse.Namespace, coalesced: bool) -> dict:
+    loop = asyncio.get_running_loop()
+    comfy_stubs.install(loop)
+    utils = comfy_stubs.import_utils()
+
+    server = comfy_stubs.PromptServer(loop)
+    users_db = utils.UsersDB(os.path.join(tempfile.mkdtemp(), "users_db.json"))
+    access_control = utils.AccessControl(
+        users_db, server, queue_status_window=args.window
+    )
+    access_control.patch_prompt_queue()
+
+    if not coalesced:
+        # Broadcast the global status on every queue mutation like stock ComfyUI.
+        server.queue_updated = comfy_stubs.PromptServer.queue_updated.__get__(server)
+        access_control.queue_updated = server.queue_updated
+
+    closed = asyncio.Event()
+
+    async def websocket_handler(user_id: str, sid: str) -> None:
+        """Register a tab's socket like ComfyUI's /ws handler, after JWT authentication."""
+        access_control.set_current_user_id(user_id)
+        server.sockets[sid] = object()
+        try:
+            await closed.wait()
+        finally:
+            server.sockets.pop(sid, None)
+
+    connections = [
+        asyncio.ensure_future(websocket_handler(f"user{u}", f"sid{u}-{t}"))
+        for u in range(args.users)
+        for t in range(args.tabs)
+    ]
+
+    await asyncio.sleep(args.window * 3)
+    server.messages_sent.clear()
+
+    queue = server.prompt_queue
+    total = args.users * args.prompts
+
+    def executor() -> None:
+        for _ in range(total):
+            _, item_id = queue.get()
+            time.sleep(args.job_ms / 1000)
+            queue.task_done(item_id, {"outputs": {}}, None)
+
+    worker = loop.run_in_executor(None, executor)
+
+    for p in range(args.prompts):
+        for u in range(args.users):
+            access_control.set_current_user_id(f"user{u}")
+            queue.put((server.number, f"prompt{u}-{p}", {}, {}, []))
+            server.number += 1
+        await asyncio.sleep(0)
+
+    await worker
+    await asyncio.sleep(args.window * 3)
+
+    closed.set()
+    await asyncio.gather(*connections)
+
+    messages = sum(server.messages_sent.values())
+    return {
+        "mode": "coalesced per-user" if coalesced else "global broadcast",
+        "sockets": args.users * args.tabs,
+        "status messages": messages,
+        "messages / prompt": messages / total,
+        "requests / prompt": messages * REFETCHES_PER_STATUS / total,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--tabs", type=int, default=2, help="open tabs per user")
+    parser.add_argument("--prompts", type=int, default=3, help="prompts per user")
+    parser.add_argument("--job-ms", type=float, default=20, help="execution time per prompt")
+    parser.add_argument("--window", type=float, default=0.1, help="coalescing window in seconds")
+    args = parser.parse_args()
+
+    for coalesced in (False, True):
+        result = asyncio.run(run(args, coalesced))
+        print(" | ".join(
+            f"{key}: {value:.1f}" if isinstance(value, float) else f"{key}: {value}"
+            for key, value in result.items()
+        ))
+
+
+if __name__ == "__main__":
+    main()
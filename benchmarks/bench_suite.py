@@ -0,0 +1,270 @@
+"""
+Benchmark the extension's request path and hot helpers without ComfyUI.
+
+Copies the extension to a temporary directory, imports it against the ComfyUI
+stand-ins and serves the real middleware stack on a local aiohttp server.
+Reports requests/second and p50/p99 latency for static, authenticated API,
+upload and login traffic, then runs micro-benchmarks for UsersDB, IPFilter,
+Sanitizer and the patched queue methods. Results are written as JSON so runs
+on different commits can be compared.
+
+    python benchmarks/bench_suite.py --requests 2000 --concurrency 16 --output bench.json
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+
+import aiohttp
+from aiohttp.test_utils import TestServer
+
+# The ComfyUI stand-ins live with the tests.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests"))
+
+import comfy_stubs
+
+USERNAME = "bench"
+PASSWORD = "BenchPassword1"
+SANITIZER_INPUT = "a portrait, <b>soft light</b>; 35mm & film grain | (masterpiece:1.2)"
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def summarize(latencies: list[float], elapsed: float, errors: int) -> dict:
+    """Get the throughput and latency of a load run in requests/second and ms."""
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+async def load(send, requests: int, concurrency: int) -> dict:
+    """Send requests from concurrent workers and time each of them."""
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in remaining:
+            started_at = time.perf_counter()
+            status = await send(i)
+            latencies.append(time.perf_counter() - started_at)
+            if status >= 400:
+                errors += 1
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started_at, errors)
+
+
+def measure(function, iterations: int) -> dict:
+    """Time a function call in operations/second and microseconds per call."""
+    started_at = time.perf_counter()
+    for i in range(iterations):
+        function(i)
+    elapsed = time.perf_counter() - started_at
+    return {
+        "iterations": iterations,
+        "ops_per_s": iterations / elapsed if elapsed else 0.0,
+        "us_per_op": elapsed / iterations * 1e6,
+    }
+
+
+async def run_http(args: argparse.Namespace, sentinel, server) -> dict:
+    users_db = sentinel.users_db
+    user_id = "bench-user"
+    users_db.add_user(user_id, USERNAME, PASSWORD, True)
+
+    # Starting the server runs the startup hook that imports PyJWT.
+    test_server = TestServer(server.app)
+    await test_server.start_server()
+
+    token = sentinel.jwt_auth.create_access_token({"id": user_id, "username": USERNAME})
+    headers = {"Authorization": f"Bearer {token}"}
+    base_url = str(test_server.make_url(""))
+    static_url = sentinel.static_assets.url_for("/sentinel/css/styles.css")
+    image = os.urandom(args.upload_kb * 1024)
+
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    async with aiohttp.ClientSession(base_url, connector=connector) as session:
+
+        async def get(url: str, **kwargs) -> int:
+            async with session.get(url, **kwargs) as response:
+                await response.read()
+                return response.status
+
+        async def static(i: int) -> int:
+            return await get(static_url)
+
+        async def api(i: int) -> int:
+            return await get("/object_info", headers=headers)
+
+        async def upload(i: int) -> int:
+            form = aiohttp.FormData()
+            form.add_field("image", image, filename=f"bench_{i % 16}.png", content_type="image/png")
+            async with session.post("/upload/image", data=form, headers=headers) as response:
+                await response.read()
+                return response.status
+
+        async def login(i: int) -> int:
+            data = {"username": USERNAME, "password": PASSWORD}
+            async with session.post("/login", data=data) as response:
+                await response.read()
+                return response.status
+
+        results = {}
+        for name, send, requests in (
+            ("static", static, args.requests),
+            ("api", api, args.requests),
+            ("upload", upload, args.requests // 4),
+            ("login", login, args.login_requests),
+        ):
+            await load(send, min(requests, args.concurrency), args.concurrency)
+            results[name] = await load(send, requests, args.concurrency)
+
+    await test_server.close()
+    return results
+
+
+def run_micro(args: argparse.Namespace, sentinel, server) -> dict:
+    utils = sys.modules[f"{args.package}.utils"]
+    users_db = sentinel.users_db
+    access_control = sentinel.access_control
+    queue = server.prompt_queue
+    iterations = args.iterations
+
+    ip_filter = utils.IPFilter(
+        os.path.join(args.directory, "bench_whitelist.txt"),
+        os.path.join(args.directory, "bench_blacklist.txt"),
+    )
+    with open(ip_filter.blacklist_file, "w") as f:
+        f.writelines(f"10.0.{i // 256}.{i % 256}\n" for i in range(args.blacklist_size))
+
+    users = {
+        f"user-{i}": {"username": f"user{i}", "password": "x"} for i in range(args.users)
+    }
+    users_db.save_users({**users_db.load_users(), **users})
+    users_db.flush()
+
+    results = {
+        "users_db.get_user": measure(
+            lambda i: users_db.get_user(f"user{i % args.users}"), iterations
+        ),
+        "users_db.load_users": measure(lambda i: users_db.load_users(), iterations),
+        "ip_filter.is_allowed": measure(
+            lambda i: ip_filter.is_allowed(f"192.168.{i // 256 % 256}.{i % 256}"), iterations
+        ),
+        "sanitizer.sanitize_input": measure(
+            lambda i: utils.Sanitizer.sanitize_input(SANITIZER_INPUT), iterations
+        ),
+    }
+
+    def put(i: int) -> None:
+        access_control.set_current_user_id(f"user-{i % args.users}")
+        queue.put((i, f"prompt-{i}", {}, {}, []))
+
+    def get_and_done(i: int) -> None:
+        _, item_id = queue.get()
+        queue.task_done(item_id, {"outputs": {}}, None)
+
+    def get_current_queue(i: int) -> None:
+        access_control.set_current_user_id(f"user-{i % args.users}")
+        queue.get_current_queue()
+
+    def get_history(i: int) -> None:
+        access_control.set_current_user_id(f"user-{i % args.users}")
+        queue.get_history(max_items=64)
+
+    queue_items = args.queue_items
+    results["queue.put"] = measure(put, queue_items)
+    results["queue.get_current_queue"] = measure(get_current_queue, iterations // 10)
+    results["queue.get+task_done"] = measure(get_and_done, queue_items)
+    results["queue.get_history"] = measure(get_history, iterations // 10)
+    return results
+
+
+def get_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=comfy_stubs.EXT_PATH,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000, help="requests per HTTP scenario")
+    parser.add_argument("--login-requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--upload-kb", type=int, default=256)
+    parser.add_argument("--iterations", type=int, default=20000, help="calls per micro-benchmark")
+    parser.add_argument("--users", type=int, default=200, help="users in the database")
+    parser.add_argument("--queue-items", type=int, default=2000)
+    parser.add_argument("--blacklist-size", type=int, default=1000)
+    parser.add_argument("--work-factor", type=int, help="bcrypt rounds for login (default: config)")
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args()
+
+    args.directory = tempfile.mkdtemp(prefix="sentinel-suite-")
+    args.package = "comfyui_sentinel"
+    config = {"password_work_factor": args.work_factor} if args.work_factor else {}
+    ext_path = os.path.join(args.directory, "extension")
+    os.makedirs(ext_path)
+    comfy_stubs.copy_extension(ext_path, config)
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    server = comfy_stubs.install(loop, os.path.join(args.directory, "comfyui"))
+    comfy_stubs.import_extension(args.package, ext_path)
+    server.add_routes()
+    sentinel = sys.modules[f"{args.package}.sentinel"]
+
+    http = loop.run_until_complete(run_http(args, sentinel, server))
+    micro = run_micro(args, sentinel, server)
+
+    for name, result in http.items():
+        print(
+            f"{name:8} {result['rps']:9.1f} req/s | p50 {result['p50_ms']:7.2f} ms | "
+            f"p99 {result['p99_ms']:7.2f} ms | errors {result['errors']}"
+        )
+    for name, result in micro.items():
+        print(f"{name:26} {result['ops_per_s']:12.0f} ops/s | {result['us_per_op']:8.2f} us/op")
+
+    with open(args.output, "w") as f:
+        json.dump(
+            {
+                "commit": get_commit(),
+                "timestamp": time.time(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "args": {key: value for key, value in vars(args).items() if key != "directory"},
+                "http": http,
+                "micro": micro,
+            },
+            f,
+            indent=2,
+        )
+    print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
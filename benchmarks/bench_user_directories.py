@@ -0,0 +1,84 @@
+"""
+Benchmark per-user directory resolution during an /object_info pass.
+
+ComfyUI resolves folder_paths.get_input_directory() and friends many times
+while building /object_info. This simulates that pass against the patched
+folder_paths, with and without the per-user directory cache, and counts the
+os.makedirs calls made. --makedirs-latency-ms adds a delay to every makedirs
+call to model a network filesystem.
+
+    python benchmarks/bench_user_directories.py --nodes 800 --makedirs-latency-ms 0.5
+"""
+
+import sys
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+
+# The ComfyUI stand-ins live with the tests.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests"))
+
+import comfy_stubs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--nodes", type=int, default=800, help="node classes in /object_info")
+    parser.add_argument("--lookups", type=int, default=2, help="directory lookups per node class")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--makedirs-latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    comfy_stubs.install(asyncio.new_event_loop())
+    utils = comfy_stubs.import_utils()
+    import folder_paths
+
+    server = comfy_stubs.PromptServer.instance
+    users_db = utils.UsersDB(os.path.join(tempfile.mkdtemp(), "users_db.json"))
+    access_control = utils.AccessControl(users_db, server)
+    access_control.set_current_user_id("user")
+
+    get_input_directory = folder_paths.get_input_directory
+    makedirs = os.makedirs
+    calls = 0
+
+    def counting_makedirs(*args_, **kwargs) -> None:
+        nonlocal calls
+        calls += 1
+        if args.makedirs_latency_ms:
+            time.sleep(args.makedirs_latency_ms / 1000)
+        makedirs(*args_, **kwargs)
+
+    def uncached_user_input_directory() -> str:
+        """The resolution used before the cache: one makedirs per call."""
+        directory = os.path.join(get_input_directory(), "user")
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    def object_info(resolve) -> None:
+        for _ in range(args.nodes):
+            for _ in range(args.lookups):
+                resolve()
+
+    os.makedirs = counting_makedirs
+    try:
+        for label, resolve in (
+            ("without cache", uncached_user_input_directory),
+            ("with cache", access_control.get_user_input_directory),
+        ):
+            calls = 0
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                object_info(resolve)
+                best = min(best, time.perf_counter() - start)
+
+            print(f"{label}: {best * 1000:.3f} ms per /object_info | makedirs calls: {calls / args.repeat:.0f}")
+    finally:
+        os.makedirs = makedirs
+
+
+if __name__ == "__main__":
+    main()
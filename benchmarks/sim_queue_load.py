@@ -0,0 +1,264 @@
+"""
+Simulate many users driving the patched prompt queue at once.
+
+Producer threads, one per user, submit prompts in batches and poll
+get_current_queue and get_history between batches like the frontend does. A
+fake executor thread pulls prompts and completes them after a job duration.
+The queue mutex is instrumented to report how long it is held and how often
+threads wait for it. Every thread draws its timings from a seeded random
+generator, so the same arguments replay the same workload.
+
+    python benchmarks/sim_queue_load.py --users 50 --batches 4 --batch-size 5 --job-ms 2
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import resource
+import tempfile
+import threading
+import tracemalloc
+
+# The ComfyUI stand-ins live with the tests.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests"))
+
+import comfy_stubs
+
+OPERATIONS = ("put", "get", "task_done", "get_current_queue", "get_history")
+
+
+class InstrumentedLock:
+    """RLock that records wait and hold times of its outermost acquisitions."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_times = []
+        self.hold_times = []
+
+    def _owned(self) -> int:
+        return getattr(self._local, "depth", 0)
+
+    def _start_hold(self, wait_time: float, contended: bool) -> None:
+        self._local.depth = 1
+        self._local.acquired_at = time.perf_counter()
+        with self._stats_lock:
+            self.acquisitions += 1
+            self.contended += contended
+            self.wait_times.append(wait_time)
+
+    def _end_hold(self) -> None:
+        hold_time = time.perf_counter() - self._local.acquired_at
+        self._local.depth = 0
+        with self._stats_lock:
+            self.hold_times.append(hold_time)
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        if self._owned():
+            self._local.depth += 1
+            return self._lock.acquire()
+
+        started_at = time.perf_counter()
+        contended = not self._lock.acquire(blocking=False)
+        if contended and not self._lock.acquire(blocking, timeout):
+            return False
+        self._start_hold(time.perf_counter() - started_at, contended)
+        return True
+
+    def release(self) -> None:
+        if self._owned() == 1:
+            self._end_hold()
+        else:
+            self._local.depth -= 1
+        self._lock.release()
+
+    __enter__ = acquire
+
+    def __exit__(self, *args) -> None:
+        self.release()
+
+    # threading.Condition releases and restores the lock around wait().
+    def _is_owned(self) -> bool:
+        return self._owned() > 0
+
+    def _release_save(self):
+        depth = self._owned()
+        self._end_hold()
+        return self._lock._release_save(), depth
+
+    def _acquire_restore(self, state) -> None:
+        lock_state, depth = state
+        started_at = time.perf_counter()
+        self._lock._acquire_restore(lock_state)
+        self._start_hold(time.perf_counter() - started_at, False)
+        self._local.depth = depth
+
+
+def percentiles(values: list[float]) -> dict:
+    """Summarize durations in milliseconds."""
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    pick = lambda fraction: ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] * 1000
+    return {
+        "count": len(ordered),
+        "p50_ms": pick(0.50),
+        "p99_ms": pick(0.99),
+        "max_ms": ordered[-1] * 1000,
+        "total_ms": sum(ordered) * 1000,
+    }
+
+
+def simulate(args: argparse.Namespace) -> dict:
+    loop = asyncio.new_event_loop()
+    loop_thread = threading.Thread(target=loop.run_forever, daemon=True)
+    loop_thread.start()
+
+    server = comfy_stubs.install(loop)
+    utils = comfy_stubs.import_utils()
+
+    queue = server.prompt_queue
+    lock = InstrumentedLock()
+    queue.mutex = lock
+    queue.not_empty = threading.Condition(lock)
+
+    users_db = utils.UsersDB(os.path.join(tempfile.mkdtemp(), "users_db.json"))
+    access_control = utils.AccessControl(users_db, server)
+    access_control.patch_prompt_queue()
+
+    total = args.users * args.batches * args.batch_size
+    latencies = {operation: [] for operation in OPERATIONS}
+
+    def timed(samples: list, function, *function_args):
+        started_at = time.perf_counter()
+        result = function(*function_args)
+        samples.append(time.perf_counter() - started_at)
+        return result
+
+    def producer(user: int, samples: dict) -> None:
+        rng = random.Random(args.seed * 100003 + user)
+        access_control.set_current_user_id(f"user{user}")
+        for batch in range(args.batches):
+            for i in range(args.batch_size):
+                number = (batch * args.batch_size + i) * args.users + user
+                timed(samples["put"], queue.put, (number, f"prompt-{user}-{batch}-{i}", {}, {}, []))
+            for _ in range(args.polls):
+                timed(samples["get_current_queue"], queue.get_current_queue)
+                timed(samples["get_history"], queue.get_history, None, args.history_items)
+            time.sleep(rng.uniform(0, 2 * args.think_ms) / 1000)
+
+    def executor(samples: dict) -> None:
+        rng = random.Random(args.seed)
+        for _ in range(total):
+            item, item_id = timed(samples["get"], queue.get)
+            time.sleep(rng.uniform(0.5, 1.5) * args.job_ms / 1000)
+            timed(samples["task_done"], queue.task_done, item_id, {"outputs": {}}, None)
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    memory_before = tracemalloc.get_traced_memory()[0] if args.tracemalloc else 0
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    thread_samples = [{operation: [] for operation in OPERATIONS} for _ in range(args.users + 1)]
+    threads = [
+        threading.Thread(target=producer, args=(user, thread_samples[user]))
+        for user in range(args.users)
+    ]
+    threads.append(threading.Thread(target=executor, args=(thread_samples[-1],)))
+
+    started_at = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started_at
+
+    for samples in thread_samples:
+        for operation, values in samples.items():
+            latencies[operation].extend(values)
+
+    memory = {
+        "max_rss_growth_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before,
+        "history_entries": len(queue.history),
+    }
+    if args.tracemalloc:
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        memory.update(
+            traced_growth_kb=(current - memory_before) / 1024, traced_peak_kb=peak / 1024
+        )
+
+    loop.call_soon_threadsafe(loop.stop)
+    loop_thread.join()
+
+    return {
+        "elapsed_s": elapsed,
+        "prompts": total,
+        "prompts_per_s": total / elapsed,
+        "operations": {operation: percentiles(values) for operation, values in latencies.items()},
+        "lock": {
+            "acquisitions": lock.acquisitions,
+            "contended": lock.contended,
+            "contended_ratio": lock.contended / lock.acquisitions if lock.acquisitions else 0.0,
+            "utilization": sum(lock.hold_times) / elapsed,
+            "wait": percentiles(lock.wait_times),
+            "hold": percentiles(lock.hold_times),
+        },
+        "memory": memory,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--batches", type=int, default=4, help="batches submitted per user")
+    parser.add_argument("--batch-size", type=int, default=5, help="prompts per batch")
+    parser.add_argument("--polls", type=int, default=2, help="queue and history polls after each batch")
+    parser.add_argument("--history-items", type=int, default=64, help="max_items per history poll")
+    parser.add_argument("--job-ms", type=float, default=2, help="mean execution time per prompt")
+    parser.add_argument("--think-ms", type=float, default=5, help="mean pause between batches")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tracemalloc", action="store_true", help="trace Python allocations (slower)")
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    result = simulate(args)
+
+    print(
+        f"{result['prompts']} prompts from {args.users} users in {result['elapsed_s']:.2f} s "
+        f"({result['prompts_per_s']:.1f} prompts/s)"
+    )
+    for operation, stats in result["operations"].items():
+        print(
+            f"  {operation:18} n={stats['count']:6} | p50 {stats['p50_ms']:8.3f} ms | "
+            f"p99 {stats['p99_ms']:8.3f} ms | max {stats['max_ms']:8.3f} ms"
+        )
+
+    lock = result["lock"]
+    print(
+        f"  mutex: {lock['acquisitions']} acquisitions | {lock['contended_ratio']:.1%} contended | "
+        f"held {lock['utilization']:.1%} of the time"
+    )
+    for name in ("wait", "hold"):
+        stats = lock[name]
+        print(
+            f"  mutex {name:4}: p50 {stats['p50_ms']:8.3f} ms | p99 {stats['p99_ms']:8.3f} ms | "
+            f"max {stats['max_ms']:8.3f} ms"
+        )
+    print("  memory: " + " | ".join(f"{key} {value:.0f}" for key, value in result["memory"].items()))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), **result}, f, indent=2)
+        print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 let failedAttempts = 0;
 let timeoutEndTime = null;
+let countdownTimer = null;
 
 Object.defineProperty(String.prototype, 'capitalize', {
   value: function() {
@@ -114,34 +115,34 @@ function validateGenerateForm() {
 function disableForm(duration, action) {
   const form = document.getElementById(`${action}-form`);
   const button = form.querySelector("button[type='submit']");
-  button.disabled = true;
 
-  // const fields = form.querySelectorAll("input, button");
-  // fields.forEach((field) => (field.disabled = true));
+  // Only one countdown runs at a time, a new lockout replaces it.
+  clearTimeout(countdownTimer);
+  countdownTimer = null;
 
-  let remainingTime = duration;
+  const endTime = Date.now() + duration * 1000;
 
-  if (remainingTime > 0) {
-    const countdownInterval = setInterval(() => {
-      const minutes = Math.floor(remainingTime / 60);
-      const seconds = remainingTime % 60;
-      const remainingTimeMessage =
-        remainingTime > 60 ? `${minutes}min ${seconds}s` : `${remainingTime}s`;
+  function tick() {
+    const remainingTime = Math.ceil((endTime - Date.now()) / 1000);
 
-      button.textContent = `Wait ${remainingTimeMessage}`;
-      remainingTime--;
+    if (remainingTime <= 0) {
+      countdownTimer = null;
+      button.disabled = false;
+      button.textContent = action.capitalize();
+      return;
+    }
 
-      if (remainingTime <= 0) {
-        clearInterval(countdownInterval);
-        button.disabled = false;
-        button.textContent = action.capitalize();
-        // fields.forEach((field) => (field.disabled = false));
-      }
-    }, 1000);
-  } else {
-    button.disabled = false;
-    button.textContent = action.capitalize();
+    const minutes = Math.floor(remainingTime / 60);
+    const seconds = remainingTime % 60;
+    const remainingTimeMessage =
+      remainingTime > 60 ? `${minutes}min ${seconds}s` : `${remainingTime}s`;
+
+    button.disabled = true;
+    button.textContent = `Wait ${remainingTimeMessage}`;
+    countdownTimer = setTimeout(tick, (endTime - Date.now()) % 1000 || 1000);
   }
+
+  tick();
 }
 
 function loadTimeoutFromStorage(action) {
@@ -1,6 +1,9 @@
 import os
-import jwt
+import json
 import uuid
+import asyncio
+import itertools
+from datetime import datetime, timezone
 from aiohttp import web
 
 from server import PromptServer
@@ -15,23 +18,102 @@ logger = Logger(LOG_FILE, LOG_LEVELS)
 sanitizer = Sanitizer()
 ip_filter = IPFilter(WHITELIST, BLACKLIST)
 timeout = Timeout(ip_filter, BLACKLIST_AFTER_ATTEMPTS)
-users_db = UsersDB(USERS_FILE)
-access_control = AccessControl(users_db, instance)
+users_db = UsersDB(
+    USERS_FILE,
+    password_hasher=PasswordHasher(
+        PASSWORD_SCHEME, PASSWORD_TARGET_MS, PASSWORD_WORK_FACTOR
+    ),
+)
+permissions = Permissions(users_db, ROLES, DEFAULT_ROLE)
+user_id_map = UserIdMap(users_db, instance.user_manager)
+static_assets = StaticAssets(WEB_DIR, reload=RELOAD_WEB_FILES)
+user_admin = UserAdmin(users_db, permissions)
+history_store = (
+    HistoryStore(HISTORY_DB, HISTORY_HOT_ITEMS, HISTORY_MAX_AGE_DAYS)
+    if SEPERATE_USERS and HISTORY_DB
+    else None
+)
+queue_journal = QueueJournal(QUEUE_JOURNAL) if SEPERATE_USERS and QUEUE_JOURNAL else None
+prompt_dedup = (
+    PromptDedup(PROMPT_DEDUP_SECONDS)
+    if SEPERATE_USERS and PROMPT_DEDUP_SECONDS
+    else None
+)
+access_control = AccessControl(
+    users_db,
+    instance,
+    history_store,
+    HISTORY_MAX_ITEMS_PER_USER,
+    queue_journal,
+    permissions=permissions,
+    prompt_dedup=prompt_dedup,
+)
+output_directory, temp_directory, input_directory = access_control.folder_paths
+storage_usage = (
+    StorageUsage(
+        {
+            "input": input_directory,
+            "output": output_directory,
+            "temp": temp_directory,
+        },
+        USER_QUOTA_BYTES,
+    )
+    if SEPERATE_USERS and (STORAGE_ACCOUNTING or USER_QUOTA_BYTES)
+    else None
+)
+blob_store = (
+    BlobStore(os.path.join(input_directory, ".blobs"), {"input": input_directory})
+    if SEPERATE_USERS and INPUT_DEDUP
+    else None
+)
+storage_gc = (
+    StorageGC(
+        {"input": input_directory, "temp": temp_directory},
+        logger,
+        GC_MAX_USER_BYTES,
+        GC_MAX_AGE_HOURS,
+        GC_INTERVAL_MINUTES,
+        GC_MAX_FILES_PER_SECOND,
+        GC_DRY_RUN,
+        storage_usage,
+        blob_store,
+        access_control,
+    )
+    if SEPERATE_USERS
+    else None
+)
+output_index = (
+    OutputIndex(OUTPUT_INDEX, output_directory)
+    if SEPERATE_USERS and OUTPUT_INDEX
+    else None
+)
+idle_monitor = IdleMonitor(
+    instance, logger, IDLE_FREE_MINUTES, IDLE_UNLOAD_MODELS, IDLE_FREE_MEMORY
+)
+keyring = (
+    Keyring(TOKEN_KEYRING, TOKEN_KEY_ALGORITHM, TOKEN_VERIFY_ONLY)
+    if TOKEN_KEY_ALGORITHM
+    else None
+)
 jwt_auth = JWTAuth(
-    users_db, access_control, logger, SECRET_KEY, TOKEN_EXPIRE_MINUTES, TOKEN_ALGORITHM
+    users_db,
+    access_control,
+    logger,
+    SECRET_KEY,
+    TOKEN_EXPIRE_MINUTES,
+    TOKEN_ALGORITHM,
+    idle_monitor,
+    keyring,
 )
 
 
 @routes.get("/register")
 async def get_register(request: web.Request) -> web.Response:
-    with open(os.path.join(HTML_DIR, "register.html"), "r") as f:
-        html_content = f.read()
-
-    if not users_db.load_users():
-        html_content = html_content.replace("{{ X-Admin-User }}", "true")
-    html_content = html_content.replace("{{ X-Admin-User }}", "false")
-
-    return web.Response(body=html_content, content_type="text/html")
+    return static_assets.template_response(
+        request,
+        "register.html",
+        {"{{ X-Admin-User }}": "false" if users_db.load_users() else "true"},
+    )
 
 
 @routes.post("/register")
@@ -83,8 +165,9 @@ async def post_register(request: web.Request) -> web.Response:
     if None not in users_db.get_user(new_user_username):
         return web.json_response({"error": "Username already exists"}, status=400)
 
+    new_user_id = str(uuid.uuid4())
     users_db.add_user(
-        str(uuid.uuid4()),
+        new_user_id,
         new_user_username,
         new_user_password,
         not bool(admin_user_id),
@@ -92,7 +175,8 @@ async def post_register(request: web.Request) -> web.Response:
     try:
         # 调用 ComfyUI 的 UserManager.add_user
         # 这将生成隔离 Key (例如: "username_uuid") 并写入 ComfyUI 的 users.json
-        instance.user_manager.add_user(new_user_username) 
+        settings_key = instance.user_manager.add_user(new_user_username)
+        user_id_map.add(new_user_id, settings_key)
     except Exception as e:
         # 记录 ComfyUI 注册失败的错误
         logger.error(f"Failed to add user to ComfyUI UserManager: {e}")
@@ -113,7 +197,7 @@ async def get_login(request: web.Request) -> web.Response:
     token = jwt_auth.get_token_from_request(request)
     if token:
         return web.HTTPFound("/logout")
-    return web.FileResponse(os.path.join(HTML_DIR, "login.html"))
+    return static_assets.template_response(request, "login.html")
 
 
 @routes.post("/login")
@@ -128,6 +212,12 @@ async def post_login(request: web.Request) -> web.Response:
             {"error": "Missing login credentials (username and password)"}, status=400
         )
 
+    if not jwt_auth.can_issue_tokens:
+        return web.json_response(
+            {"error": "This server cannot issue tokens, log in on the main server"},
+            status=503,
+        )
+
     if users_db.check_username_password(username, password):
         timeout.remove_failed_attempts(ip)
 
@@ -139,7 +229,7 @@ async def post_login(request: web.Request) -> web.Response:
             {
                 "message": "Login successful",
                 "jwt_token": token,
-                "user_settings_id": next((key for key, value in instance.user_manager.users.items() if value == username), ""),
+                "user_settings_id": user_id_map.get_settings_key(user_id) or "",
             }
         )
         secure_flag = request.headers.get("X-Forwarded-Proto", "http") == "https"
@@ -162,7 +252,7 @@ async def get_generate_token(request: web.Request) -> web.Response:
     token = jwt_auth.get_token_from_request(request)
     if token:
         return web.HTTPFound("/logout")
-    return web.FileResponse(os.path.join(HTML_DIR, "generate_token.html"))
+    return static_assets.template_response(request, "generate_token.html")
 
 
 @routes.post("/generate_token")
@@ -196,6 +286,12 @@ async def post_generate_token(request: web.Request) -> web.Response:
             {"error": "Missing login credentials (username and password)"}, status=400
         )
 
+    if not jwt_auth.can_issue_tokens:
+        return web.json_response(
+            {"error": "This server cannot issue tokens, log in on the main server"},
+            status=503,
+        )
+
     if users_db.check_username_password(username, password):
         timeout.remove_failed_attempts(ip)
 
@@ -231,25 +327,12 @@ async def get_logout(request: web.Request) -> web.Response:
 
     token = jwt_auth.get_token_from_request(request)
     if token and FREE_MEMORY_ON_LOGOUT:
+        jwt = import_jwt()
         try:
             username = jwt_auth.decode_access_token(token).get("username")
             if free_memory or unload_models:
-                if hasattr(instance, "post_free"):
-                    json_data = {
-                        "unload_models": unload_models,
-                        "free_memory": free_memory,
-                    }
-                    mock_request = web.Request(
-                        app=app,
-                        method="POST",
-                        path="/free",
-                        headers={},
-                        match_info={},
-                        payload=None,
-                    )
-                    mock_request._post = json_data
-                    await instance.post_free(mock_request)
-                    logger.memory_free(ip, username, free_memory, unload_models)
+                request_memory_free(instance, unload_models, free_memory)
+                logger.memory_free(ip, username, free_memory, unload_models)
 
             logger.logout(ip, username)
         except jwt.ExpiredSignatureError:
@@ -265,13 +348,365 @@ async def get_logout(request: web.Request) -> web.Response:
     return response
 
 
-app.add_routes(
-    [
-        web.static("/sentinel/css", CSS_DIR),
-        web.static("/sentinel/js", JS_DIR),
-        web.static("/sentinel/assets", ASSETS_DIR),
-    ]
-)
+@routes.get("/admin/storage")
+async def get_admin_storage(request: web.Request) -> web.Response:
+    if not permissions.has_permission(request.get("user_id"), "manage_storage"):
+        return web.json_response({"error": "Admin access required"}, status=403)
+
+    if storage_usage is None:
+        return web.json_response(
+            {"error": "Storage accounting is not enabled"}, status=404
+        )
+
+    user_id = request.query.get("user_id")
+    report = {user_id: storage_usage.get(user_id)} if user_id else storage_usage.report()
+
+    users = users_db.load_users()
+    return web.json_response(
+        {
+            "scan_complete": storage_usage.scan_complete,
+            "quota_bytes": storage_usage.quota_bytes,
+            "users": {
+                uid: {
+                    "username": users.get(uid, {}).get("username"),
+                    **usage,
+                    "total": sum(usage.values()),
+                }
+                for uid, usage in report.items()
+            },
+        }
+    )
+
+
+@routes.get("/admin/storage/gc")
+async def get_admin_storage_gc(request: web.Request) -> web.Response:
+    if not permissions.has_permission(request.get("user_id"), "manage_storage"):
+        return web.json_response({"error": "Admin access required"}, status=403)
+
+    if storage_gc is None:
+        return web.json_response(
+            {"error": "Storage cleanup requires separate users"}, status=404
+        )
+
+    report = await asyncio.get_running_loop().run_in_executor(
+        None, lambda: storage_gc.collect(dry_run=True)
+    )
+    return web.json_response(report)
+
+
+@routes.get("/admin/storage/blobs")
+async def get_admin_storage_blobs(request: web.Request) -> web.Response:
+    if not permissions.has_permission(request.get("user_id"), "manage_storage"):
+        return web.json_response({"error": "Admin access required"}, status=403)
+
+    if blob_store is None:
+        return web.json_response(
+            {"error": "Input deduplication is disabled"}, status=404
+        )
+
+    report = await asyncio.get_running_loop().run_in_executor(None, blob_store.report)
+    return web.json_response(report)
+
+
+@routes.get("/admin/queue/dedup")
+async def get_admin_queue_dedup(request: web.Request) -> web.Response:
+    if not permissions.has_permission(request.get("user_id"), "manage_nodes"):
+        return web.json_response({"error": "Admin access required"}, status=403)
+
+    if prompt_dedup is None:
+        return web.json_response(
+            {"error": "Prompt deduplication is not enabled"}, status=404
+        )
+
+    return web.json_response(prompt_dedup.report())
+
+
+@routes.get("/outputs")
+async def get_outputs(request: web.Request) -> web.Response:
+    if output_index is None:
+        return web.json_response({"error": "Output index is not enabled"}, status=404)
+
+    current_user_id = request.get("user_id")
+    user_id = request.query.get("user_id") or current_user_id
+    if not access_control.can_access_folder(current_user_id, user_id):
+        return web.json_response(
+            {"error": "You do not have access to this folder."}, status=403
+        )
+
+    # The user id names files and folders, so only known users are looked up.
+    if user_id != "public" and user_id not in users_db.load_users():
+        return web.json_response({"error": "User not found"}, status=404)
+
+    try:
+        offset = max(int(request.query.get("offset", 0)), 0)
+        limit = min(max(int(request.query.get("limit", 100)), 1), 1000)
+    except ValueError:
+        return web.json_response(
+            {"error": "Offset and limit must be numbers"}, status=400
+        )
+
+    total, files = await asyncio.get_running_loop().run_in_executor(
+        None,
+        lambda: output_index.list_files(
+            user_id,
+            sort=request.query.get("sort", "mtime"),
+            descending=request.query.get("order", "desc") != "asc",
+            offset=offset,
+            limit=limit,
+        ),
+    )
+
+    return web.json_response(
+        {
+            "user_id": user_id,
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "files": files,
+        }
+    )
+
+
+def parse_time(value: str | None) -> float | None:
+    """Parse a Unix time or an ISO 8601 date, assuming UTC without a timezone."""
+    if not value:
+        return None
+
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+@routes.get("/export/history")
+async def get_export_history(request: web.Request) -> web.StreamResponse:
+    if not SEPERATE_USERS:
+        return web.json_response(
+            {"error": "History export requires separate_users"}, status=404
+        )
+
+    current_user_id = request.get("user_id")
+    user_id = request.query.get("user_id") or current_user_id
+    if not access_control.can_access_folder(current_user_id, user_id):
+        return web.json_response(
+            {"error": "You do not have access to this history."}, status=403
+        )
+
+    try:
+        since = parse_time(request.query.get("since"))
+        until = parse_time(request.query.get("until"))
+    except ValueError:
+        return web.json_response(
+            {"error": "since and until must be Unix times or ISO 8601 dates"},
+            status=400,
+        )
+
+    statuses = {
+        status for status in request.query.get("status", "").split(",") if status
+    }
+    summary = request.query.get("graph", "true").lower() == "false"
+    entries = access_control.export_history(user_id, since, until, statuses, summary)
+
+    def next_chunk() -> bytes:
+        lines = [
+            json.dumps({"prompt_id": prompt_id, **entry}, default=str) + "\n"
+            for prompt_id, entry in itertools.islice(entries, 256)
+        ]
+        return "".join(lines).encode("utf-8")
+
+    response = web.StreamResponse(
+        headers={
+            "Content-Type": "application/x-ndjson",
+            "Content-Disposition": f'attachment; filename="history-{user_id}.ndjson"',
+        }
+    )
+    await response.prepare(request)
+
+    loop = asyncio.get_running_loop()
+    while chunk := await loop.run_in_executor(None, next_chunk):
+        await response.write(chunk)
+
+    await response.write_eof()
+    return response
+
+
+async def get_request_data(request: web.Request) -> dict:
+    """Get the sanitized form or JSON body of a request."""
+    if request.content_type == "application/json":
+        try:
+            data = await request.json()
+        except ValueError:
+            return {}
+        return sanitizer.sanitize_input(data) if isinstance(data, dict) else {}
+
+    return request.get("_sanitized_data", {})
+
+
+async def run_user_admin_action(request: web.Request, action) -> web.Response:
+    """Run a user admin action for a user with the manage_users permission."""
+    if not permissions.has_permission(request.get("user_id"), "manage_users"):
+        return web.json_response({"error": "Admin access required"}, status=403)
+
+    try:
+        result = await asyncio.get_running_loop().run_in_executor(None, action)
+    except KeyError:
+        return web.json_response({"error": "User not found"}, status=404)
+    except ValueError as e:
+        return web.json_response({"error": str(e)}, status=400)
+
+    logger.info(
+        f"User admin {request.method} {request.path} by {request.get('user')}"
+    )
+    return web.json_response(result)
+
+
+@routes.get("/admin/users")
+async def get_admin_users(request: web.Request) -> web.Response:
+    if not permissions.has_permission(request.get("user_id"), "manage_users"):
+        return web.json_response({"error": "Admin access required"}, status=403)
+
+    try:
+        offset = max(int(request.query.get("offset", 0)), 0)
+        limit = min(max(int(request.query.get("limit", 100)), 1), 1000)
+    except ValueError:
+        return web.json_response(
+            {"error": "Offset and limit must be numbers"}, status=400
+        )
+
+    total, users = user_admin.list_users(
+        prefix=request.query.get("prefix", ""),
+        role=request.query.get("role"),
+        offset=offset,
+        limit=limit,
+    )
+    return web.json_response(
+        {"total": total, "offset": offset, "limit": limit, "users": users}
+    )
+
+
+@routes.delete("/admin/users/{user_id}")
+async def delete_admin_user(request: web.Request) -> web.Response:
+    user_id = request.match_info["user_id"]
+    return await run_user_admin_action(
+        request, lambda: user_admin.delete_user(user_id)
+    )
+
+
+@routes.post("/admin/users/{user_id}/disable")
+async def post_admin_user_disable(request: web.Request) -> web.Response:
+    user_id = request.match_info["user_id"]
+    data = await get_request_data(request)
+    disabled = str(data.get("disabled", "true")).lower() in ("true", "1")
+    return await run_user_admin_action(
+        request, lambda: user_admin.set_disabled(user_id, disabled)
+    )
+
+
+@routes.post("/admin/users/{user_id}/rename")
+async def post_admin_user_rename(request: web.Request) -> web.Response:
+    user_id = request.match_info["user_id"]
+    username = (await get_request_data(request)).get("username", "")
+    return await run_user_admin_action(
+        request, lambda: user_admin.rename_user(user_id, username)
+    )
+
+
+@routes.post("/admin/users/{user_id}/password")
+async def post_admin_user_password(request: web.Request) -> web.Response:
+    user_id = request.match_info["user_id"]
+    password = (await get_request_data(request)).get("password", "")
+    return await run_user_admin_action(
+        request, lambda: user_admin.reset_password(user_id, password)
+    )
+
+
+@routes.post("/admin/users/{user_id}/role")
+async def post_admin_user_role(request: web.Request) -> web.Response:
+    user_id = request.match_info["user_id"]
+    role = (await get_request_data(request)).get("role", "")
+    return await run_user_admin_action(
+        request, lambda: user_admin.set_role(user_id, role)
+    )
+
+
+@routes.post("/admin/users/import")
+async def post_admin_users_import(request: web.Request) -> web.Response:
+    if not permissions.has_permission(request.get("user_id"), "manage_users"):
+        return web.json_response({"error": "Admin access required"}, status=403)
+
+    try:
+        records = user_admin.parse_import(await request.text(), request.content_type)
+    except ValueError as e:
+        return web.json_response({"error": f"Invalid import: {e}"}, status=400)
+
+    return await run_user_admin_action(
+        request, lambda: user_admin.import_users(records)
+    )
+
+
+def on_users_changed(event: str, users: dict) -> None:
+    """Keep the ComfyUI user manager and per-user caches in sync with user changes."""
+    if event == "created":
+        user_id_map.add_users(
+            {user_id: user_data["username"] for user_id, user_data in users.items()}
+        )
+    elif event == "renamed":
+        for user_id, user_data in users.items():
+            user_id_map.rename(user_id, user_data["username"])
+    elif event == "deleted":
+        for user_id in users:
+            user_id_map.remove(user_id)
+            access_control.invalidate_user_directories(user_id)
+            if output_index is not None:
+                output_index.forget_user(user_id)
+
+
+user_admin.add_on_change_handler(on_users_changed)
+
+
+def load_on_startup() -> None:
+    """Import the modules, read the files and calibrate the hashes the first requests will need."""
+    import_jwt()
+    import_bleach()
+
+    users_db.load_users()
+    permissions.refresh(force=True)
+    user_id_map.rebuild()
+    static_assets.load()
+    ip_filter.load_filter_list()
+    if keyring is not None:
+        keyring.load()
+    users_db.password_hasher.ensure_calibrated()
+
+    if history_store is not None:
+        history_store.open()
+    if blob_store is not None:
+        blob_store.create_directory()
+    if output_index is not None:
+        output_index.create_directory()
+
+    # Start the background work once the files it reads are in place.
+    access_control.start_queue_journal()
+    access_control.start_history_pruning()
+    if storage_usage is not None:
+        storage_usage.start()
+    if storage_gc is not None:
+        storage_gc.start()
+    idle_monitor.start()
+
+
+async def on_startup(app: web.Application) -> None:
+    await asyncio.get_running_loop().run_in_executor(None, load_on_startup)
+
+
+app.on_startup.append(on_startup)
+
+app.add_routes(static_assets.get_routes())
 
 if FORCE_HTTPS:
     app.middlewares.append(create_https_middleware(MATCH_HEADERS))
@@ -290,9 +725,42 @@ app.middlewares.append(
     )
 )
 
+app.middlewares.append(
+    permissions.create_permission_middleware(
+        {
+            ("POST", "/prompt"): "submit_prompts",
+            ("POST", "/api/prompt"): "submit_prompts",
+        }
+    )
+)
+
 if SEPERATE_USERS:
     app.middlewares.append(access_control.create_folder_access_control_middleware())
 
+    if history_store is not None:
+        app.middlewares.append(access_control.create_history_middleware())
+
+    if prompt_dedup is not None:
+        app.middlewares.append(access_control.create_prompt_dedup_middleware())
+
+    if storage_usage is not None:
+        app.middlewares.append(storage_usage.create_storage_middleware())
+        access_control.add_on_task_done_handler(
+            lambda user_id, prompt_id, entry: storage_usage.add_outputs(
+                user_id, entry.get("outputs")
+            )
+        )
+
+    if blob_store is not None:
+        app.middlewares.append(blob_store.create_blob_middleware())
+
+    if output_index is not None:
+        access_control.add_on_task_done_handler(
+            lambda user_id, prompt_id, entry: output_index.add_outputs(
+                user_id, prompt_id, entry.get("outputs")
+            )
+        )
+
     access_control.patch_folder_paths()
     access_control.patch_prompt_queue()
 
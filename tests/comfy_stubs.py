@@ -0,0 +1,318 @@
+"""
+Lightweight stand-ins for the ComfyUI modules this extension imports.
+
+Call install() before importing the extension to register fake `server`,
+`folder_paths` and `execution` modules that behave like the ComfyUI ones
+as far as this extension is concerned.
+"""
+
+import os
+import sys
+import json
+import copy
+import heapq
+import shutil
+import types
+import uuid
+import importlib.util
+import asyncio
+import tempfile
+import threading
+from collections import Counter
+from typing import NamedTuple, Optional
+
+from aiohttp import web
+
+EXT_PATH = os.path.join(os.path.dirname(__file__), "..")
+MAXIMUM_HISTORY_SIZE = 10000
+
+
+class PromptQueue:
+    """Copy of the parts of ComfyUI's execution.PromptQueue the extension patches."""
+
+    class ExecutionStatus(NamedTuple):
+        status_str: str
+        completed: bool
+        messages: list
+
+    def __init__(self, server):
+        self.server = server
+        self.mutex = threading.RLock()
+        self.not_empty = threading.Condition(self.mutex)
+        self.task_counter = 0
+        self.queue = []
+        self.currently_running = {}
+        self.history = {}
+        self.flags = {}
+
+    def put(self, item):
+        with self.mutex:
+            heapq.heappush(self.queue, item)
+            self.server.queue_updated()
+            self.not_empty.notify()
+
+    def get(self, timeout=None):
+        with self.not_empty:
+            while len(self.queue) == 0:
+                self.not_empty.wait(timeout=timeout)
+                if timeout is not None and len(self.queue) == 0:
+                    return None
+            item = heapq.heappop(self.queue)
+            i = self.task_counter
+            self.currently_running[i] = copy.deepcopy(item)
+            self.task_counter += 1
+            self.server.queue_updated()
+            return (item, i)
+
+    def task_done(self, item_id, history_result, status, process_item=None):
+        with self.mutex:
+            prompt = self.currently_running.pop(item_id)
+            if len(self.history) > MAXIMUM_HISTORY_SIZE:
+                self.history.pop(next(iter(self.history)))
+
+            status_dict = None
+            if status is not None:
+                status_dict = copy.deepcopy(status._asdict())
+
+            self.history[prompt[1]] = {
+                "prompt": prompt,
+                "outputs": {},
+                "status": status_dict,
+            }
+            self.history[prompt[1]].update(history_result)
+            self.server.queue_updated()
+
+    def get_current_queue(self):
+        with self.mutex:
+            return (list(self.currently_running.values()), copy.deepcopy(self.queue))
+
+    def get_tasks_remaining(self):
+        with self.mutex:
+            return len(self.queue) + len(self.currently_running)
+
+    def wipe_queue(self):
+        with self.mutex:
+            self.queue = []
+            self.server.queue_updated()
+
+    def delete_queue_item(self, function):
+        with self.mutex:
+            for x in range(len(self.queue)):
+                if function(self.queue[x]):
+                    self.queue.pop(x)
+                    heapq.heapify(self.queue)
+                    self.server.queue_updated()
+                    return True
+        return False
+
+    def get_history(self, prompt_id=None, max_items=None, offset=-1, map_function=None):
+        with self.mutex:
+            if prompt_id is None:
+                return dict(self.history)
+            if prompt_id in self.history:
+                return {prompt_id: copy.deepcopy(self.history[prompt_id])}
+            return {}
+
+    def wipe_history(self):
+        with self.mutex:
+            self.history = {}
+
+    def delete_history_item(self, id_to_delete):
+        with self.mutex:
+            self.history.pop(id_to_delete, None)
+
+    def set_flag(self, name, data):
+        with self.mutex:
+            self.flags[name] = data
+            self.not_empty.notify()
+
+    def get_flags(self, reset=True):
+        with self.mutex:
+            if reset:
+                ret = self.flags
+                self.flags = {}
+                return ret
+            return self.flags.copy()
+
+
+class UserManager:
+    """Stand-in for ComfyUI's app.user_manager.UserManager."""
+
+    def __init__(self):
+        self.users = {}
+
+    def add_user(self, name: str) -> str:
+        user_id = f"{name}_{len(self.users)}"
+        self.users[user_id] = name
+        return user_id
+
+
+class PromptServer:
+    """Stand-in for ComfyUI's server.PromptServer."""
+
+    instance = None
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        PromptServer.instance = self
+
+        self.loop = loop or asyncio.get_event_loop()
+        self.app = web.Application()
+        self.routes = web.RouteTableDef()
+        self.user_manager = UserManager()
+        self.prompt_queue = PromptQueue(self)
+
+        self.number = 0
+        self.sockets = {}
+        self.on_prompt_handlers = []
+        self.messages_sent = Counter()
+
+    def get_queue_info(self) -> dict:
+        return {"exec_info": {"queue_remaining": self.prompt_queue.get_tasks_remaining()}}
+
+    def queue_updated(self) -> None:
+        self.send_sync("status", {"status": self.get_queue_info()})
+
+    async def send_json(self, event: str, data: dict, sid: Optional[str] = None) -> None:
+        if sid is None:
+            for socket_id in self.sockets:
+                self.messages_sent[socket_id] += 1
+        elif sid in self.sockets:
+            self.messages_sent[sid] += 1
+
+    def send_sync(self, event: str, data: dict, sid: Optional[str] = None) -> None:
+        self.loop.call_soon_threadsafe(
+            lambda: self.loop.create_task(self.send_json(event, data, sid))
+        )
+
+    def add_on_prompt_handler(self, handler) -> None:
+        self.on_prompt_handlers.append(handler)
+
+    def trigger_on_prompt(self, json_data: dict) -> dict:
+        for handler in self.on_prompt_handlers:
+            json_data = handler(json_data)
+        return json_data
+
+    async def post_prompt(self, request: web.Request) -> web.Response:
+        """Queue a prompt like ComfyUI does, without validating the graph."""
+        json_data = self.trigger_on_prompt(await request.json())
+        number = self.number
+        self.number += 1
+
+        prompt = json_data["prompt"]
+        prompt_id = str(json_data.get("prompt_id", uuid.uuid4()))
+        extra_data = json_data.get("extra_data", {})
+        if "client_id" in json_data:
+            extra_data["client_id"] = json_data["client_id"]
+
+        outputs_to_execute = list(prompt)
+        self.prompt_queue.put((number, prompt_id, prompt, extra_data, outputs_to_execute))
+        return web.json_response({"prompt_id": prompt_id, "number": number, "node_errors": {}})
+
+    async def post_free(self, request: web.Request) -> web.Response:
+        json_data = await request.json()
+        if json_data.get("unload_models", False):
+            self.prompt_queue.set_flag("unload_models", True)
+        if json_data.get("free_memory", False):
+            self.prompt_queue.set_flag("free_memory", True)
+        return web.Response(status=200)
+
+    async def get_object_info(self, request: web.Request) -> web.Response:
+        """Resolve the folders like node classes listing their input files do."""
+        import folder_paths
+
+        return web.json_response(
+            {
+                "LoadImage": {"input": sorted(os.listdir(folder_paths.get_input_directory()))},
+                "SaveImage": {"output": folder_paths.get_output_directory()},
+            }
+        )
+
+    async def post_upload_image(self, request: web.Request) -> web.Response:
+        import folder_paths
+
+        post = await request.post()
+        image = post.get("image")
+        if image is None or not hasattr(image, "file"):
+            return web.Response(status=400)
+
+        filename = os.path.basename(image.filename)
+        with open(os.path.join(folder_paths.get_input_directory(), filename), "wb") as f:
+            f.write(image.file.read())
+        return web.json_response({"name": filename, "subfolder": "", "type": "input"})
+
+    def add_routes(self) -> None:
+        """Register the ComfyUI routes after the extensions, like ComfyUI does."""
+        self.routes.get("/object_info")(self.get_object_info)
+        self.routes.post("/upload/image")(self.post_upload_image)
+        self.routes.post("/prompt")(self.post_prompt)
+        self.routes.post("/free")(self.post_free)
+        self.app.add_routes(self.routes)
+
+
+def install(
+    loop: Optional[asyncio.AbstractEventLoop] = None, base_directory: str = ""
+) -> PromptServer:
+    """Register the stand-in modules and return a fresh PromptServer."""
+    base_directory = base_directory or tempfile.mkdtemp(prefix="sentinel-bench-")
+
+    folder_paths = types.ModuleType("folder_paths")
+    for name in ("output", "temp", "input"):
+        directory = os.path.join(base_directory, name)
+        os.makedirs(directory, exist_ok=True)
+        setattr(folder_paths, f"get_{name}_directory", lambda directory=directory: directory)
+
+    execution = types.ModuleType("execution")
+    execution.PromptQueue = PromptQueue
+    execution.MAXIMUM_HISTORY_SIZE = MAXIMUM_HISTORY_SIZE
+
+    server = types.ModuleType("server")
+    server.PromptServer = PromptServer
+
+    sys.modules.update(folder_paths=folder_paths, execution=execution, server=server)
+    return PromptServer(loop)
+
+
+def import_utils() -> types.ModuleType:
+    """Import the extension's utils package against the installed stand-ins."""
+    if EXT_PATH not in sys.path:
+        sys.path.insert(0, EXT_PATH)
+
+    import utils
+
+    return utils
+
+
+def copy_extension(directory: str, config: Optional[dict] = None) -> str:
+    """Copy the extension to a directory so its data files are written there."""
+    for name in ("__init__.py", "nodes.py", "sentinel.py", "config.json"):
+        shutil.copy(os.path.join(EXT_PATH, name), directory)
+    for name in ("utils", "sentinel-web", "web"):
+        shutil.copytree(
+            os.path.join(EXT_PATH, name),
+            os.path.join(directory, name),
+            ignore=shutil.ignore_patterns("__pycache__"),
+        )
+
+    if config:
+        config_file = os.path.join(directory, "config.json")
+        with open(config_file, "r") as f:
+            merged = {**json.load(f), **config}
+        with open(config_file, "w") as f:
+            json.dump(merged, f, indent=4)
+
+    return directory
+
+
+def import_extension(
+    name: str = "comfyui_sentinel", ext_path: str = EXT_PATH
+) -> types.ModuleType:
+    """Import the whole extension package the way ComfyUI loads custom nodes."""
+    spec = importlib.util.spec_from_file_location(
+        name,
+        os.path.join(ext_path, "__init__.py"),
+        submodule_search_locations=[ext_path],
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
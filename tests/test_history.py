@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+import comfy_stubs
+
+
+@pytest.fixture
+def server():
+    loop = asyncio.new_event_loop()
+    yield comfy_stubs.install(loop)
+    loop.close()
+
+
+@pytest.fixture
+def index(server):
+    comfy_stubs.import_utils()
+    from utils.history import HistoryIndex
+
+    return HistoryIndex()
+
+
+@pytest.fixture
+def access_control(server):
+    comfy_stubs.import_utils()
+    from utils.access_control import AccessControl
+
+    access_control = AccessControl(None, server)
+    access_control.patch_prompt_queue()
+    return access_control
+
+
+def run_prompt(server, access_control, user_id: str, prompt_id: str) -> None:
+    access_control.set_current_user_id(user_id)
+    server.prompt_queue.put((server.number, prompt_id, {}, {}, []))
+    server.number += 1
+    _, item_id = server.prompt_queue.get()
+    server.prompt_queue.task_done(item_id, {"outputs": {"9": prompt_id}}, None)
+
+
+def test_index_pages_per_user(index):
+    for i in range(5):
+        index.add("alice", f"a{i}")
+        index.add("bob", f"b{i}")
+
+    assert index.count("alice") == 5
+    assert index.page("alice") == ["a0", "a1", "a2", "a3", "a4"]
+    # A negative offset returns the latest max_items entries.
+    assert index.page("alice", max_items=2) == ["a3", "a4"]
+    assert index.page("alice", max_items=2, offset=1) == ["a1", "a2"]
+    assert index.page("alice", max_items=10, offset=3) == ["a3", "a4"]
+    assert index.page("alice", offset=4) == ["a4"]
+    assert index.page("alice", max_items=2, offset=5) == []
+    assert index.page("carol", max_items=2) == []
+
+
+def test_index_removes_oldest_and_middle_entries(index):
+    for i in range(100):
+        index.add("alice", i)
+
+    for i in range(80):
+        assert index.oldest("alice") == i
+        assert index.remove(i) == "alice"
+    assert index.remove(90) == "alice"
+
+    assert index.count("alice") == 19
+    assert index.page("alice", max_items=3, offset=0) == [80, 81, 82]
+    assert index.page("alice", max_items=2) == [98, 99]
+    assert 90 not in index
+    assert index.remove(90) is None
+
+    assert index.remove_user("alice") == [*range(80, 90), *range(91, 100)]
+    assert index.count("alice") == 0
+    assert index.owner(99) is None
+
+
+def test_index_readding_moves_entry_to_the_end(index):
+    index.add("alice", "p1")
+    index.add("alice", "p2")
+    index.add("bob", "p1")
+
+    assert index.owner("p1") == "bob"
+    assert index.page("alice") == ["p2"]
+    assert index.page("bob") == ["p1"]
+
+
+def test_history_pages_only_the_current_users_entries(server, access_control):
+    for i in range(3):
+        run_prompt(server, access_control, "alice", f"a{i}")
+        run_prompt(server, access_control, "bob", f"b{i}")
+
+    access_control.set_current_user_id("alice")
+    history = server.prompt_queue.get_history()
+    assert list(history) == ["a0", "a1", "a2"]
+    assert history["a1"]["outputs"] == {"9": "a1"}
+    assert list(server.prompt_queue.get_history(max_items=2)) == ["a1", "a2"]
+    assert list(server.prompt_queue.get_history(max_items=1, offset=0)) == ["a0"]
+
+
+def test_history_hides_other_users_entries(server, access_control):
+    run_prompt(server, access_control, "alice", "a0")
+    run_prompt(server, access_control, "bob", "b0")
+
+    access_control.set_current_user_id("bob")
+    assert server.prompt_queue.get_history("a0") == {}
+    assert list(server.prompt_queue.get_history("b0")) == ["b0"]
+
+    # Deleting another user's entry does nothing.
+    server.prompt_queue.delete_history_item("a0")
+    access_control.set_current_user_id("alice")
+    assert list(server.prompt_queue.get_history("a0")) == ["a0"]
+
+    server.prompt_queue.wipe_history()
+    assert server.prompt_queue.get_history() == {}
+    access_control.set_current_user_id("bob")
+    assert list(server.prompt_queue.get_history()) == ["b0"]
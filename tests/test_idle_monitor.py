@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+import comfy_stubs
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+class FakeLogger:
+    def __init__(self):
+        self.messages = []
+
+    def info(self, message: str) -> None:
+        self.messages.append(message)
+
+    def error(self, message: str) -> None:
+        self.messages.append(message)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    comfy_stubs.import_utils()
+    from utils import idle_monitor
+
+    clock = FakeClock()
+    monkeypatch.setattr(idle_monitor, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def server():
+    loop = asyncio.new_event_loop()
+    yield comfy_stubs.install(loop)
+    loop.close()
+
+
+@pytest.fixture
+def monitor(server, clock):
+    from utils.idle_monitor import IdleMonitor
+
+    return IdleMonitor(server, FakeLogger(), idle_minutes=10)
+
+
+def test_check_frees_after_idle_window(server, clock, monitor):
+    monitor.touch("alice")
+
+    clock.now += 9 * 60
+    assert not monitor.check()
+    assert server.prompt_queue.flags == {}
+
+    clock.now += 60
+    assert monitor.check()
+    assert server.prompt_queue.flags == {"unload_models": True, "free_memory": True}
+
+    # Memory is freed once per idle period.
+    server.prompt_queue.get_flags()
+    clock.now += 60 * 60
+    assert not monitor.check()
+    assert server.prompt_queue.flags == {}
+
+
+def test_check_does_not_free_while_queue_has_work(server, clock, monitor):
+    monitor.touch("alice")
+    server.prompt_queue.queue.append({"prompt": (0, "prompt-0", {}, {}, []), "user_id": "bob"})
+
+    clock.now += 60 * 60
+    assert not monitor.check()
+    assert monitor.get_active_users() == {"bob"}
+
+    # The queued prompt starts running.
+    server.prompt_queue.currently_running[0] = server.prompt_queue.queue.pop()
+    clock.now += 60 * 60
+    assert not monitor.check()
+
+    # Its user counts as active for the window after it finished.
+    server.prompt_queue.currently_running.clear()
+    clock.now += 9 * 60
+    assert not monitor.check()
+    clock.now += 60
+    assert monitor.check()
+    assert monitor.get_active_users() == set()
+
+
+def test_touch_resets_idle_timer(server, clock, monitor):
+    monitor.touch("alice")
+
+    clock.now += 9 * 60
+    monitor.touch("bob")
+    clock.now += 9 * 60
+    assert not monitor.check()
+    assert monitor.get_active_users() == {"bob"}
+
+    clock.now += 60
+    assert monitor.check()
+
+    # Activity after freeing starts a new idle period.
+    monitor.touch("alice")
+    clock.now += 10 * 60
+    assert monitor.check()
@@ -0,0 +1,144 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+import comfy_stubs
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def server():
+    loop = asyncio.new_event_loop()
+    yield comfy_stubs.install(loop)
+    loop.close()
+
+
+@pytest.fixture
+def clock(server, monkeypatch):
+    comfy_stubs.import_utils()
+    from utils import prompt_dedup
+
+    clock = FakeClock()
+    monkeypatch.setattr(prompt_dedup, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def dedup(clock):
+    from utils.prompt_dedup import PromptDedup
+
+    return PromptDedup(window_seconds=30, max_aliases=3)
+
+
+@pytest.fixture
+def access_control(server, dedup):
+    from utils.access_control import AccessControl
+
+    access_control = AccessControl(None, server, prompt_dedup=dedup)
+    access_control.patch_prompt_queue()
+    access_control.set_current_user_id("alice")
+    return access_control
+
+
+def make_item(prompt_id: str, prefix: str = "alice/out", client_id: str = "tab-1") -> tuple:
+    graph = {
+        "1": {"class_type": "KSampler", "inputs": {"seed": 1}, "_meta": {"title": "A"}},
+        "2": {"class_type": "SaveImage", "inputs": {"filename_prefix": prefix}},
+    }
+    return (0, prompt_id, graph, {"client_id": client_id}, ["2"])
+
+
+def test_hash_ignores_client_data_titles_and_user_prefix(dedup):
+    digest = dedup.canonical_hash(make_item("p1"), "alice/")
+
+    assert dedup.canonical_hash(make_item("p2", client_id="tab-2"), "alice/") == digest
+    assert dedup.canonical_hash(make_item("p3", prefix="out"), "alice/") == digest
+
+    item = make_item("p4")
+    item[2]["1"]["inputs"]["seed"] = 2
+    assert dedup.canonical_hash(item, "alice/") != digest
+
+
+def test_match_within_window_per_user(dedup, clock):
+    dedup.remember("alice", "digest", "p1")
+
+    assert dedup.match("alice", "digest") == "p1"
+    assert dedup.match("bob", "digest") is None
+
+    clock.now += 31
+    assert dedup.match("alice", "digest") is None
+
+
+def test_forget_stops_matching(dedup):
+    dedup.remember("alice", "digest", "p1")
+    dedup.forget("p1")
+
+    assert dedup.match("alice", "digest") is None
+
+    # Forgetting a prompt replaced by a newer one keeps the newer one.
+    dedup.remember("alice", "digest", "p2")
+    dedup.remember("alice", "digest", "p3")
+    dedup.forget("p2")
+    assert dedup.match("alice", "digest") == "p3"
+
+
+def test_aliases_resolve_and_are_bounded(dedup):
+    for i in range(4):
+        dedup.add_alias(f"dup{i}", "p1")
+
+    assert dedup.resolve("dup3") == "p1"
+    assert dedup.resolve("p1") == "p1"
+    # The oldest alias is dropped beyond max_aliases.
+    assert dedup.resolve("dup0") == "dup0"
+    assert dedup.report()["deduplicated"] == 4
+    assert dedup.report()["aliases"] == 3
+
+
+def test_duplicate_put_attaches_to_queued_prompt(server, access_control, dedup):
+    queue = server.prompt_queue
+    queue.put(make_item("p1"))
+    queue.put(make_item("p2", client_id="tab-2"))
+
+    assert [item["prompt"][1] for item in queue.queue] == ["p1"]
+    assert dedup.resolve("p2") == "p1"
+
+    # Once the prompt finished, the same graph is queued again.
+    _, item_id = queue.get()
+    queue.task_done(item_id, {"outputs": {}}, None)
+    queue.put(make_item("p3"))
+    assert [item["prompt"][1] for item in queue.queue] == ["p3"]
+
+    # The history of the alias is the one of the prompt that ran.
+    assert list(queue.get_history("p2")) == ["p2"]
+    assert queue.get_history("p2")["p2"]["prompt"][1] == "p1"
+
+
+def test_middleware_answers_with_the_attached_prompt(server, access_control, dedup):
+    async def post_prompt(request: web.Request) -> web.Response:
+        data = await request.json()
+        server.prompt_queue.put(make_item(data["prompt_id"]))
+        return web.json_response({"prompt_id": data["prompt_id"], "number": 0})
+
+    async def main() -> list:
+        app = web.Application(middlewares=[access_control.create_prompt_dedup_middleware()])
+        app.router.add_post("/api/prompt", post_prompt)
+        async with TestClient(TestServer(app)) as client:
+            responses = []
+            for prompt_id in ("p1", "p2"):
+                response = await client.post("/api/prompt", json={"prompt_id": prompt_id})
+                responses.append(await response.json())
+            return responses
+
+    first, second = server.loop.run_until_complete(main())
+
+    assert first == {"prompt_id": "p1", "number": 0}
+    assert second == {"prompt_id": "p1", "number": 0, "deduplicated": True}
@@ -0,0 +1,142 @@
+import json
+import asyncio
+
+import pytest
+
+import comfy_stubs
+
+
+@pytest.fixture
+def server():
+    loop = asyncio.new_event_loop()
+    yield comfy_stubs.install(loop)
+    loop.close()
+
+
+@pytest.fixture
+def journal_file(server, tmp_path):
+    comfy_stubs.import_utils()
+    return tmp_path / "queue_journal.jsonl"
+
+
+def put_event(prompt_id: str, number: int, user_id: str, sensitive: bool = False) -> dict:
+    return {
+        "op": "put",
+        "prompt_id": prompt_id,
+        "user_id": user_id,
+        "item": [number, prompt_id, {"1": {"class_type": "SaveImage"}}, {}, ["1"]],
+        "sensitive": sensitive,
+    }
+
+
+def write_journal(journal_file, events: list, tail: str = "") -> None:
+    with open(journal_file, "w", encoding="utf-8") as f:
+        for event in events:
+            f.write(json.dumps(event) + "\n")
+        f.write(tail)
+
+
+def read_journal(journal_file) -> list:
+    with open(journal_file, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_replay_restores_queue_with_users_and_priority(server, journal_file):
+    from utils.access_control import AccessControl
+    from utils.queue_journal import QueueJournal
+
+    write_journal(
+        journal_file,
+        [
+            put_event("running", 3, "alice"),
+            put_event("queued", 1, "bob"),
+            put_event("sensitive", 2, None, sensitive=True),
+            put_event("finished", 0, "alice"),
+            {"op": "get", "prompt_id": "finished"},
+            {"op": "get", "prompt_id": "running"},
+            {"op": "done", "prompt_id": "finished"},
+        ],
+    )
+    server.number = 2
+
+    queue_journal = QueueJournal(journal_file)
+    access_control = AccessControl(None, server, queue_journal=queue_journal)
+    access_control.patch_prompt_queue()
+    access_control.start_queue_journal()
+    try:
+        queue = server.prompt_queue
+        assert queue.get_tasks_remaining() == 3
+        # New submissions stay behind the replayed prompts.
+        assert server.number == 4
+
+        # The prompt that was running when the server stopped runs again, in order.
+        items = {}
+        order = []
+        for _ in range(3):
+            item, item_id = queue.get()
+            items[item[1]] = item
+            order.append((item[1], queue.currently_running[item_id]["user_id"]))
+        assert order == [("queued", "bob"), ("sensitive", None), ("running", "alice")]
+        # Sensitive extra data is never journaled, so an empty dict takes its place.
+        assert len(items["running"]) == 5
+        assert items["sensitive"][5] == {}
+    finally:
+        queue_journal.close()
+
+
+def test_replay_ignores_torn_last_line(journal_file):
+    from utils.queue_journal import QueueJournal
+
+    write_journal(
+        journal_file,
+        [put_event("p1", 0, "alice"), put_event("p2", 1, "alice")],
+        tail='{"op": "done", "prompt_id": "p1"',
+    )
+
+    replayed = QueueJournal(journal_file).replay()
+
+    assert [(item[1], user_id) for item, user_id in replayed] == [
+        ("p1", "alice"),
+        ("p2", "alice"),
+    ]
+    assert [event["prompt_id"] for event in read_journal(journal_file)] == ["p1", "p2"]
+
+
+def test_compaction_keeps_pending_prompts(journal_file):
+    from utils.queue_journal import QueueJournal
+
+    events = [put_event(f"p{i}", i, "alice") for i in range(6)]
+    events += [{"op": "get", "prompt_id": "p3"}]
+    events += [{"op": "done", "prompt_id": f"p{i}"} for i in range(3)]
+    events += [{"op": "remove", "prompt_id": "p4"}]
+    write_journal(journal_file, events)
+
+    replayed = QueueJournal(journal_file).replay()
+
+    assert [item[1] for item, _ in replayed] == ["p3", "p5"]
+    compacted = read_journal(journal_file)
+    assert [(event["prompt_id"], event.get("running")) for event in compacted] == [
+        ("p3", True),
+        ("p5", None),
+    ]
+    # Replaying the compacted journal gives the same queue.
+    assert QueueJournal(journal_file).replay() == replayed
+
+
+def test_writer_compacts_while_running(journal_file):
+    from utils.queue_journal import QueueJournal
+
+    queue_journal = QueueJournal(journal_file, compact_every=4)
+    queue_journal.replay()
+    queue_journal.start()
+    for i in range(20):
+        queue_journal.record_put((i, f"p{i}", {}, {}, []), "alice")
+        if i % 2:
+            queue_journal.record_get(f"p{i}")
+            queue_journal.record_done(f"p{i}")
+    queue_journal.close()
+
+    pending = [f"p{i}" for i in range(0, 20, 2)]
+    # Without compaction the journal would hold all 40 events.
+    assert len(read_journal(journal_file)) < len(pending) + 5
+    assert [item[1] for item, _ in QueueJournal(journal_file).replay()] == pending
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+import comfy_stubs
+
+WINDOW = 0.01
+
+
+@pytest.fixture
+def server():
+    loop = asyncio.new_event_loop()
+    server = comfy_stubs.install(loop)
+    server.sent = []
+
+    async def send_json(event: str, data: dict, sid=None) -> None:
+        server.sent.append((sid, data))
+
+    server.send_json = send_json
+    yield server
+    loop.close()
+
+
+@pytest.fixture
+def access_control(server):
+    comfy_stubs.import_utils()
+    from utils.access_control import AccessControl
+
+    access_control = AccessControl(None, server, queue_status_window=WINDOW)
+    access_control.patch_prompt_queue()
+    return access_control
+
+
+def connect(server, access_control, user_id, sid: str) -> None:
+    """Register a socket like ComfyUI's /ws handler does after JWT authentication."""
+
+    async def websocket_handler() -> None:
+        access_control.set_current_user_id(user_id)
+        server.sockets[sid] = object()
+
+    server.loop.run_until_complete(websocket_handler())
+
+
+def settle(server) -> list:
+    """Let the coalescing window pass and return the messages sent meanwhile."""
+    server.loop.run_until_complete(asyncio.sleep(WINDOW * 5))
+    sent, server.sent = server.sent, []
+    return sent
+
+
+def test_socket_without_client_id_gets_its_users_status(server, access_control):
+    # ComfyUI generates the sid of a new tab that did not send a clientId.
+    connect(server, access_control, "alice", "0f1e2d")
+    connect(server, access_control, "bob", "bob-tab")
+    settle(server)
+
+    access_control.set_current_user_id("alice")
+    server.prompt_queue.put((0, "p1", {}, {}, []))
+
+    sent = dict(settle(server))
+    assert sent["0f1e2d"]["status"]["queue_pending"] == ["p1"]
+    # Bob's queue did not change.
+    assert "bob-tab" not in sent
+
+
+def test_unresolved_socket_gets_the_global_status(server, access_control):
+    connect(server, access_control, None, "anonymous")
+    settle(server)
+
+    access_control.set_current_user_id("alice")
+    server.prompt_queue.put((0, "p1", {}, {}, []))
+
+    assert settle(server) == [
+        ("anonymous", {"status": {"exec_info": {"queue_remaining": 1}}})
+    ]
+
+
+def test_prompt_finished_within_one_window_is_notified(server, access_control):
+    connect(server, access_control, "alice", "alice-tab")
+    connect(server, access_control, "bob", "bob-tab")
+    settle(server)
+
+    access_control.set_current_user_id("alice")
+    queue = server.prompt_queue
+    queue.put((0, "p1", {}, {}, []))
+    _, item_id = queue.get()
+    queue.task_done(item_id, {"outputs": {}}, None)
+
+    # The queue looks the same as before, but the history changed.
+    assert [sid for sid, _ in settle(server)] == ["alice-tab"]
+
+
+def test_disconnected_socket_is_forgotten(server, access_control):
+    connect(server, access_control, "alice", "alice-tab")
+    settle(server)
+
+    server.sockets.pop("alice-tab", None)
+    access_control.set_current_user_id("alice")
+    server.prompt_queue.put((0, "p1", {}, {}, []))
+
+    assert settle(server) == []
@@ -0,0 +1,88 @@
+import os
+import json
+import asyncio
+
+import pytest
+
+import comfy_stubs
+
+
+class FileUserManager(comfy_stubs.UserManager):
+    """User manager that saves its users file like ComfyUI's."""
+
+    def __init__(self, users_file: str):
+        super().__init__()
+        self.users_file = users_file
+        self.add_user_calls = 0
+
+    def get_users_file(self) -> str:
+        return self.users_file
+
+    def add_user(self, name: str) -> str:
+        self.add_user_calls += 1
+        user_id = super().add_user(name)
+        with open(self.users_file, "w") as f:
+            json.dump(self.users, f)
+        return user_id
+
+
+@pytest.fixture
+def user_id_map(tmp_path):
+    loop = asyncio.new_event_loop()
+    comfy_stubs.install(loop)
+    comfy_stubs.import_utils()
+    from utils.users_db import UsersDB
+    from utils.user_id_map import UserIdMap
+
+    users_db = UsersDB(str(tmp_path / "users_db.json"))
+    users_db.update_users(
+        lambda users: users.update(
+            {f"u{i}": {"username": f"user {i}"} for i in range(3)}
+        )
+    )
+    yield UserIdMap(users_db, FileUserManager(str(tmp_path / "users.json")))
+    loop.close()
+
+
+def read_users_file(user_id_map) -> dict:
+    with open(user_id_map.user_manager.get_users_file()) as f:
+        return json.load(f)
+
+
+def test_single_user_goes_through_user_manager(user_id_map):
+    user_id_map.add_users({"u0": "user 0"})
+
+    assert user_id_map.user_manager.add_user_calls == 1
+    assert read_users_file(user_id_map) == {user_id_map.get_settings_key("u0"): "user 0"}
+
+
+def test_bulk_add_replaces_users_file_once(user_id_map, monkeypatch):
+    from utils.users_db import UsersDB
+
+    writes = []
+    write_atomic = UsersDB.write_atomic
+    monkeypatch.setattr(
+        UsersDB,
+        "write_atomic",
+        staticmethod(lambda path, data: (writes.append(path), write_atomic(path, data))),
+    )
+
+    user_id_map.add_users({f"u{i}": f"user {i}" for i in range(3)})
+
+    assert user_id_map.user_manager.add_user_calls == 0
+    assert writes == [user_id_map.user_manager.get_users_file()]
+    users = read_users_file(user_id_map)
+    assert sorted(users.values()) == ["user 0", "user 1", "user 2"]
+    for i in range(3):
+        settings_key = user_id_map.get_settings_key(f"u{i}")
+        assert settings_key.startswith(f"user-{i}_")
+        assert user_id_map.get_user_id(settings_key) == f"u{i}"
+    assert not os.path.exists(f"{user_id_map.user_manager.get_users_file()}.tmp")
+
+
+def test_rename_updates_users_file(user_id_map):
+    user_id_map.add_users({"u0": "user 0", "u1": "user 1"})
+
+    user_id_map.rename("u1", "renamed")
+
+    assert read_users_file(user_id_map)[user_id_map.get_settings_key("u1")] == "renamed"
@@ -0,0 +1,100 @@
+import os
+import json
+import asyncio
+
+import pytest
+
+import comfy_stubs
+
+
+@pytest.fixture
+def database(tmp_path):
+    loop = asyncio.new_event_loop()
+    comfy_stubs.install(loop)
+    comfy_stubs.import_utils()
+    yield str(tmp_path / "users_db.json")
+    loop.close()
+
+
+def make_users_db(database: str, write_delay: float = 0.05):
+    from utils.users_db import UsersDB
+
+    return UsersDB(database, write_delay=write_delay)
+
+
+def read_json(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_burst_of_changes_is_written_once(database, monkeypatch):
+    users_db = make_users_db(database, write_delay=0.2)
+    writes = []
+    write_atomic = users_db.write_atomic
+
+    def count_writes(path: str, data: bytes) -> None:
+        writes.append(path)
+        write_atomic(path, data)
+
+    monkeypatch.setattr(users_db, "write_atomic", count_writes)
+
+    for i in range(20):
+        users_db.update_users(lambda users, i=i: users.update({f"u{i}": {"username": f"user{i}"}}))
+    # The users in memory are ahead of the file until it is written.
+    assert len(users_db.load_users()) == 20
+
+    users_db.flush()
+
+    assert writes == [database, users_db.backup]
+    assert len(read_json(database)) == 20
+    assert read_json(users_db.backup) == read_json(database)
+    assert not any(name.endswith(".tmp") for name in os.listdir(os.path.dirname(database)))
+
+
+def test_corrupt_database_loads_the_backup(database):
+    users_db = make_users_db(database)
+    users_db.update_users(lambda users: users.update({"u1": {"username": "alice"}}))
+    users_db.flush()
+
+    # A write torn by a crash or a bad manual edit.
+    with open(database, "w", encoding="utf-8") as f:
+        f.write('{"u1": {"username": "al')
+
+    restarted = make_users_db(database)
+    assert restarted.get_user("alice")[0] == "u1"
+
+
+def test_unreadable_database_keeps_the_users_in_memory(database):
+    users_db = make_users_db(database)
+    users_db.update_users(lambda users: users.update({"u1": {"username": "alice"}}))
+    users_db.flush()
+    users_db.load_users()
+
+    with open(users_db.backup, "w", encoding="utf-8") as f:
+        f.write("[]")
+    with open(database, "w", encoding="utf-8") as f:
+        f.write("{")
+
+    assert users_db.get_user("alice")[0] == "u1"
+
+
+def test_corrupt_database_without_backup_fails_loudly(database):
+    with open(database, "w", encoding="utf-8") as f:
+        f.write("not json")
+
+    with pytest.raises(RuntimeError, match="no usable backup"):
+        make_users_db(database).load_users()
+
+
+def test_missing_database_starts_over(database):
+    users_db = make_users_db(database)
+    users_db.update_users(lambda users: users.update({"u1": {"username": "alice"}}))
+    users_db.flush()
+
+    # Deleting the database is the documented way to start over, so the
+    # backup is not restored.
+    os.remove(database)
+
+    restarted = make_users_db(database)
+    assert restarted.load_users() == {}
+    assert restarted.get_user("alice") == (None, {})
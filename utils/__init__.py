@@ -2,11 +2,25 @@ from .config import *
 from .validate import *
 
 from .logger import Logger
+from .password_hasher import PasswordHasher
 from .users_db import UsersDB
 
 from .force_https import create_https_middleware
 from .ip_filter import IPFilter, get_ip
-from .sanitizer import Sanitizer
+from .sanitizer import Sanitizer, import_bleach
 from .timeout import Timeout
-from .jwt_auth import JWTAuth
+from .idle_monitor import IdleMonitor, request_memory_free
+from .keyring import Keyring
+from .jwt_auth import JWTAuth, import_jwt
+from .permissions import Permissions
+from .user_id_map import UserIdMap
+from .user_admin import UserAdmin
+from .static_assets import StaticAssets
+from .history_store import HistoryStore
+from .queue_journal import QueueJournal
+from .prompt_dedup import PromptDedup
+from .storage import StorageUsage
+from .blob_store import BlobStore
+from .storage_gc import StorageGC
+from .output_index import OutputIndex
 from .access_control import AccessControl
\ No newline at end of file
@@ -1,21 +1,72 @@
 import os
+import json
 import heapq
 import copy
+import asyncio
+import logging
+import threading
 import contextvars
 from aiohttp import web
-from typing import Optional
+from typing import Iterator, Optional
 
 import folder_paths
 from server import PromptServer
 from execution import PromptQueue, MAXIMUM_HISTORY_SIZE
 
 from .users_db import UsersDB
+from .permissions import Permissions
+from .history import HistoryIndex, HistoryRecord
+from .history_store import HistoryStore
+from .queue_journal import QueueJournal
+from .prompt_dedup import PromptDedup
+
+OUTPUT_PATH_INPUTS = ("filename_prefix",)
+
+
+class UserQueueItem(dict):
+    """Prompt queue item tagged with its user, ordered like the wrapped prompt."""
+
+    def __lt__(self, other: "UserQueueItem") -> bool:
+        return self["prompt"] < other["prompt"]
+
+
+class UserSockets(dict):
+    """PromptServer.sockets that reports the sids the websocket handler registers and removes."""
+
+    def __init__(self, sockets: dict, on_add, on_remove):
+        super().__init__(sockets)
+        self._on_add = on_add
+        self._on_remove = on_remove
+
+    def __setitem__(self, sid, ws) -> None:
+        super().__setitem__(sid, ws)
+        self._on_add(sid)
+
+    def __delitem__(self, sid) -> None:
+        super().__delitem__(sid)
+        self._on_remove(sid)
+
+    def pop(self, sid, *default):
+        ws = super().pop(sid, *default)
+        self._on_remove(sid)
+        return ws
 
 
 class AccessControl:
-    def __init__(self, users_db: UsersDB, server: PromptServer):
+    def __init__(
+        self,
+        users_db: UsersDB,
+        server: PromptServer,
+        history_store: Optional[HistoryStore] = None,
+        history_max_items_per_user: int = 0,
+        queue_journal: Optional[QueueJournal] = None,
+        queue_status_window: float = 0.1,
+        permissions: Optional[Permissions] = None,
+        prompt_dedup: Optional[PromptDedup] = None,
+    ):
         self.users_db = users_db
         self.server = server
+        self.permissions = permissions or Permissions(users_db)
 
         self._current_user = contextvars.ContextVar("user_id", default=None)
         self.__current_user_id = None
@@ -27,6 +78,26 @@ class AccessControl:
         self.__prompt_queue = self.server.prompt_queue
         self.__prompt_queue_put = self.__prompt_queue.put
 
+        self._user_directories = {}
+        self._output_path_inputs = {}
+
+        self._history_index = HistoryIndex()
+        self._history_store = history_store
+        self._history_max_items_per_user = history_max_items_per_user
+        self._history_pruner = None
+        self._history_prune_stop = threading.Event()
+
+        self._queue_journal = queue_journal
+        self._prompt_dedup = prompt_dedup
+        self._on_task_done_handlers = []
+
+        self._queue_status_window = queue_status_window
+        self._queue_status_lock = threading.Lock()
+        self._queue_status_scheduled = False
+        self._socket_users = {}
+        self._socket_status = {}
+        self._history_versions = {}
+
     @property
     def folder_paths(self) -> tuple:
         return (
@@ -49,44 +120,88 @@ class AccessControl:
 
         return self.__current_user_id
 
+    def get_user_directory(self, get_base_directory) -> str:
+        """Get a user-specific directory, creating it on first use."""
+        user_id = self.get_current_user_id() or "public"
+        base_directory = get_base_directory()
+
+        directories = self._user_directories.get(user_id)
+        if directories is None:
+            directories = self._user_directories.setdefault(user_id, {})
+
+        directory = directories.get(base_directory)
+        if directory is None:
+            directory = os.path.join(base_directory, user_id)
+            os.makedirs(directory, exist_ok=True)
+            directories[base_directory] = directory
+
+        return directory
+
+    def invalidate_user_directories(self, user_id: str) -> None:
+        """Forget the cached directories of a user."""
+        self._user_directories.pop(user_id, None)
+
     def get_user_output_directory(self) -> str:
         """Get the user-specific output directory."""
-        return os.path.join(
-            self.__get_output_directory(),
-            self.get_current_user_id() or "public",
-        )
+        return self.get_user_directory(self.__get_output_directory)
 
     def get_user_temp_directory(self) -> str:
         """Get the user-specific temp directory."""
-        return os.path.join(
-            self.__get_temp_directory(),
-            self.get_current_user_id() or "public",
-        )
+        return self.get_user_directory(self.__get_temp_directory)
 
     def get_user_input_directory(self) -> str:
         """Get the user-specific input directory."""
-        input_directory = os.path.join(
-            self.__get_input_directory(),
-            self.get_current_user_id() or "public",
-        )
-
-        os.makedirs(input_directory, exist_ok=True)
+        return self.get_user_directory(self.__get_input_directory)
+
+    def get_output_path_inputs(self, class_type: str) -> Optional[tuple]:
+        """
+        Get the output path inputs of a node class, cached per class type.
+        - Returns None when the class is unknown, meaning every output path
+          input name has to be checked.
+        """
+        try:
+            return self._output_path_inputs[class_type]
+        except KeyError:
+            pass
+
+        try:
+            import nodes
+
+            input_types = nodes.NODE_CLASS_MAPPINGS[class_type].INPUT_TYPES()
+            names = {
+                **input_types.get("required", {}),
+                **input_types.get("optional", {}),
+            }
+            output_path_inputs = tuple(
+                name for name in OUTPUT_PATH_INPUTS if name in names
+            )
+        except Exception:
+            output_path_inputs = None
 
-        return input_directory
+        self._output_path_inputs[class_type] = output_path_inputs
+        return output_path_inputs
 
-    def add_user_specific_folder_paths(self, json_data) -> None:
+    def add_user_specific_folder_paths(self, json_data) -> dict:
         """Add user-specific folder paths to the prompt JSON data."""
-        user_id = self.get_current_user_id() or "public"
+        user_prefix = f"{self.get_current_user_id() or 'public'}/"
 
-        if isinstance(json_data, dict):
-            for key, value in json_data.items():
-                if key == "filename_prefix":
-                    json_data[key] = f"{user_id}/{value}"
-                else:
-                    self.add_user_specific_folder_paths(value)
-        elif isinstance(json_data, list):
-            for item in json_data:
-                self.add_user_specific_folder_paths(item)
+        prompt = json_data.get("prompt") if isinstance(json_data, dict) else None
+        if not isinstance(prompt, dict):
+            return json_data
+
+        for node in prompt.values():
+            inputs = node.get("inputs") if isinstance(node, dict) else None
+            if not inputs:
+                continue
+
+            output_path_inputs = self.get_output_path_inputs(node.get("class_type"))
+            for key in (
+                OUTPUT_PATH_INPUTS if output_path_inputs is None else output_path_inputs
+            ):
+                value = inputs.get(key)
+                # Links are lists and already prefixed values are left alone.
+                if isinstance(value, str) and not value.startswith(user_prefix):
+                    inputs[key] = user_prefix + value
 
         return json_data
 
@@ -98,6 +213,17 @@ class AccessControl:
 
         self.server.add_on_prompt_handler(self.add_user_specific_folder_paths)
 
+    def can_access_folder(self, user_id: str, folder_user_id: str) -> bool:
+        """Check if a user can access the folders of another user."""
+        if folder_user_id == "public":
+            return True
+
+        permissions = self.permissions.get_permissions(user_id)
+        if user_id not in self.users_db.users:
+            return False
+
+        return user_id == folder_user_id or "view_all_folders" in permissions
+
     def create_folder_access_control_middleware(
         self, folder_paths: tuple = ()
     ) -> web.middleware:
@@ -113,25 +239,13 @@ class AccessControl:
             if not request.path.startswith(folder_paths):
                 return await handler(request)
 
-            user_id = request.get("user_id")
-
-            user_id, user = self.users_db.get_user(user_id)
-
             try:
                 path_parts = request.path.strip("/").split("/")
                 folder_user_id = path_parts[1]
             except:
                 return web.HTTPNotFound(reason="Folder not found.")
 
-            if folder_user_id == "public":
-                return await handler(request)
-
-            if (
-                not user_id
-                or not user
-                or len(path_parts) < 2
-                or (user_id != folder_user_id and not user.get("admin"))
-            ):
+            if not self.can_access_folder(request.get("user_id"), folder_user_id):
                 return web.HTTPForbidden(
                     reason="You do not have access to this folder."
                 )
@@ -140,10 +254,130 @@ class AccessControl:
 
         return folder_access_control_middleware
 
+    def queue_updated(self) -> None:
+        """Schedule a coalesced per-user queue status update."""
+        with self._queue_status_lock:
+            if self._queue_status_scheduled:
+                return
+            self._queue_status_scheduled = True
+
+        loop = self.server.loop
+        loop.call_soon_threadsafe(
+            loop.call_later, self._queue_status_window, self._flush_queue_status
+        )
+
+    def _flush_queue_status(self) -> None:
+        """Send the queue status scheduled by queue_updated."""
+        with self._queue_status_lock:
+            self._queue_status_scheduled = False
+
+        asyncio.ensure_future(self.send_queue_status())
+
+    def get_users_queue_status(self) -> tuple[dict, dict]:
+        """Get the running and pending prompt ids and the history version of every user."""
+        status = {}
+        with self.__prompt_queue.mutex:
+            for item in self.__prompt_queue.currently_running.values():
+                running, _ = status.setdefault(item["user_id"], ([], []))
+                running.append(item["prompt"][1])
+            for item in sorted(self.__prompt_queue.queue):
+                _, pending = status.setdefault(item["user_id"], ([], []))
+                pending.append(item["prompt"][1])
+            history_versions = dict(self._history_versions)
+        return status, history_versions
+
+    async def send_queue_status(self) -> None:
+        """
+        Send each connected socket the queue status of its own user.
+        - Sockets whose user is not known yet get the global status.
+        - A socket gets no message if neither its user's queue nor history changed.
+        """
+        status, history_versions = self.get_users_queue_status()
+
+        for sid in list(self.server.sockets):
+            if sid not in self._socket_users:
+                data = {"status": self.server.get_queue_info()}
+                version = None
+            else:
+                user_id = self._socket_users[sid]
+                running, pending = status.get(user_id, ([], []))
+                data = {
+                    "status": {
+                        "exec_info": {"queue_remaining": len(running) + len(pending)},
+                        "queue_running": running,
+                        "queue_pending": pending,
+                    }
+                }
+                # A prompt queued and finished within one window leaves the queue
+                # unchanged, so the history version tells the client to refetch.
+                version = history_versions.get(user_id, 0)
+
+            if self._socket_status.get(sid) == (data, version):
+                continue
+
+            self._socket_status[sid] = (data, version)
+            await self.server.send_json("status", data, sid)
+
+    def track_sockets(self) -> None:
+        """Record the user of each websocket when the ComfyUI websocket handler registers it."""
+        if isinstance(self.server.sockets, UserSockets):
+            return
+
+        self.server.sockets = UserSockets(
+            self.server.sockets, self._add_socket, self._remove_socket
+        )
+
+    def _add_socket(self, sid) -> None:
+        # The handler runs in the request context the JWT middleware set the user in.
+        user_id = self._current_user.get()
+        if user_id is not None:
+            self._socket_users[sid] = user_id
+        else:
+            self._socket_users.pop(sid, None)
+        self._socket_status.pop(sid, None)
+        self.queue_updated()
+
+    def _remove_socket(self, sid) -> None:
+        self._socket_users.pop(sid, None)
+        self._socket_status.pop(sid, None)
+
+    def get_active_prompts(self) -> list[tuple[str, dict]]:
+        """Get the (user folder, prompt graph) of the running and pending prompts."""
+        with self.__prompt_queue.mutex:
+            items = [
+                *self.__prompt_queue.currently_running.values(),
+                *self.__prompt_queue.queue,
+            ]
+
+        return [
+            (item["user_id"] or "public", item["prompt"][2])
+            for item in items
+            if isinstance(item["prompt"][2], dict)
+        ]
+
     def user_queue_put(self, item):
-        """Put an item in the user-specific queue."""
-        item = {"prompt": item, "user_id": self.get_current_user_id()}
-        self.__prompt_queue_put(item)
+        """Put an item in the user-specific queue, unless it duplicates an active one."""
+        user_id = self.get_current_user_id()
+        digest = (
+            self._prompt_dedup.canonical_hash(item, f"{user_id or 'public'}/")
+            if self._prompt_dedup is not None
+            else None
+        )
+
+        with self.__prompt_queue.mutex:
+            if digest is not None:
+                prompt_id = self._prompt_dedup.match(user_id, digest)
+                if prompt_id is not None:
+                    self._prompt_dedup.add_alias(item[1], prompt_id)
+                    return
+
+                self._prompt_dedup.remember(user_id, digest, item[1])
+
+            self.__prompt_queue_put(UserQueueItem(prompt=item, user_id=user_id))
+
+            # Journal the put before the executor can get the item and journal that.
+            if self._queue_journal is not None:
+                self._queue_journal.record_put(item, user_id)
 
     def user_queue_get(self, timeout=None):
         """Get an item from the user-specific queue."""
@@ -157,7 +391,11 @@ class AccessControl:
             i = self.__prompt_queue.task_counter
             self.__prompt_queue.currently_running[i] = copy.deepcopy(item)
             self.__prompt_queue.task_counter += 1
-            self.server.queue_updated()
+            self.queue_updated()
+
+            if self._queue_journal is not None:
+                self._queue_journal.record_get(item["prompt"][1])
+
             return (item["prompt"], i)
 
     # def user_queue_task_done(
@@ -172,23 +410,245 @@ class AccessControl:
         process_item: Optional[dict] = None, # <--- 新增此参数
     ):
         """Mark a user-specific queue task as done."""
+        # With a history store only the latest entries are kept in memory and
+        # in the index, older ones are paged from the store.
+        history_size = (
+            self._history_store.hot_items
+            if self._history_store is not None
+            else MAXIMUM_HISTORY_SIZE
+        )
+
+        # Only this thread removes running prompts, so the item read here is
+        # still running when the entry is stored, and it can be compressed
+        # without holding the queue mutex.
         with self.__prompt_queue.mutex:
-            prompt = self.__prompt_queue.currently_running.pop(item_id)
-            if len(self.__prompt_queue.history) > MAXIMUM_HISTORY_SIZE:
-                self.__prompt_queue.history.pop(next(iter(self.__prompt_queue.history)))
-
-            status_dict: Optional[dict] = None
-            if status is not None:
-                status_dict = copy.deepcopy(status._asdict())
-
-            self.__prompt_queue.history[prompt["prompt"][1]] = {
-                "prompt": prompt["prompt"],
-                "outputs": {},
-                "status": status_dict,
-                "user_id": prompt["user_id"],
-            }
-            self.__prompt_queue.history[prompt["prompt"][1]].update(history_result)
-            self.server.queue_updated()
+            prompt = self.__prompt_queue.currently_running[item_id]
+
+        status_dict: Optional[dict] = None
+        if status is not None:
+            status_dict = copy.deepcopy(status._asdict())
+
+        user_id = prompt["user_id"]
+        prompt_id = prompt["prompt"][1]
+        entry = {
+            "prompt": prompt["prompt"],
+            "outputs": {},
+            "status": status_dict,
+            "user_id": user_id,
+        }
+        entry.update(history_result)
+        record = HistoryRecord.from_entry(entry)
+
+        with self.__prompt_queue.mutex:
+            history = self.__prompt_queue.history
+            self.__prompt_queue.currently_running.pop(item_id)
+            if len(history) > history_size:
+                oldest_prompt_id = next(iter(history))
+                history.pop(oldest_prompt_id)
+                self._history_index.remove(oldest_prompt_id)
+
+            history.pop(prompt_id, None)
+            history[prompt_id] = record
+            self._history_index.add(user_id, prompt_id)
+            self._history_versions[user_id] = self._history_versions.get(user_id, 0) + 1
+
+            while (
+                self._history_store is None
+                and self._history_max_items_per_user
+                and self._history_index.count(user_id)
+                > self._history_max_items_per_user
+            ):
+                expired_prompt_id = self._history_index.oldest(user_id)
+                self._history_index.remove(expired_prompt_id)
+                history.pop(expired_prompt_id, None)
+
+        if self._queue_journal is not None:
+            self._queue_journal.record_done(prompt_id)
+
+        if self._prompt_dedup is not None:
+            self._prompt_dedup.forget(prompt_id)
+
+        for handler in self._on_task_done_handlers:
+            try:
+                handler(user_id, prompt_id, entry)
+            except Exception as e:
+                logging.getLogger("Sentinel").warning(
+                    f"Error in task done handler {handler}: {e}"
+                )
+
+        if self._history_store is not None:
+            try:
+                self._history_store.put(prompt_id, user_id, entry)
+            except (TypeError, ValueError) as e:
+                # Only the in-memory entry is kept, so it is gone once it leaves the hot items.
+                logging.getLogger("Sentinel").warning(
+                    f"History entry {prompt_id} is not persisted, it holds values JSON cannot encode: {e}"
+                )
+            if self._history_max_items_per_user:
+                self._drop_history_entries(
+                    self._history_store.trim_user(
+                        user_id, self._history_max_items_per_user
+                    )
+                )
+
+        # Clients refetch the history on status updates, so send them once the
+        # entry can be paged from the store.
+        self.queue_updated()
+
+    def add_on_task_done_handler(self, handler) -> None:
+        """Add a handler called with (user_id, prompt_id, history_entry) when a prompt finishes."""
+        self._on_task_done_handlers.append(handler)
+
+    def prune_expired_history(self) -> None:
+        """Drop history entries older than the history store retention age."""
+        self._drop_history_entries(self._history_store.prune_expired())
+
+    def start_history_pruning(self, interval: float = 60) -> None:
+        """Prune expired history now and then every interval seconds in the background."""
+        if (
+            self._history_pruner is not None
+            or self._history_store is None
+            or not self._history_store.max_age_days
+        ):
+            return
+
+        self._history_pruner = threading.Thread(
+            target=self._prune_history_loop,
+            args=(interval,),
+            name="sentinel-history-prune",
+            daemon=True,
+        )
+        self._history_pruner.start()
+
+    def stop_history_pruning(self) -> None:
+        """Stop pruning expired history."""
+        self._history_prune_stop.set()
+
+    def _prune_history_loop(self, interval: float) -> None:
+        while True:
+            try:
+                self.prune_expired_history()
+            except Exception as e:
+                logging.getLogger("Sentinel").warning(f"History pruning failed: {e}")
+            if self._history_prune_stop.wait(interval):
+                return
+
+    def _drop_history_entries(self, prompt_ids: list) -> None:
+        """Remove history entries deleted from the store from memory."""
+        if not prompt_ids:
+            return
+
+        with self.__prompt_queue.mutex:
+            for prompt_id in prompt_ids:
+                self._history_index.remove(prompt_id)
+                self.__prompt_queue.history.pop(prompt_id, None)
+
+    def _owns_history_entry(self, user_id: str, prompt_id) -> bool:
+        """Check if a history entry belongs to a user, in memory or in the history store."""
+        with self.__prompt_queue.mutex:
+            if prompt_id in self._history_index:
+                return self._history_index.owner(prompt_id) == user_id
+
+        # The store is read without the queue mutex, so it never blocks the executor.
+        return self._history_store is not None and self._history_store.owns(
+            prompt_id, user_id
+        )
+
+    def _get_history_page(
+        self, user_id: str, max_items: Optional[int] = None, offset: int = -1
+    ) -> list:
+        """Get a page of a user's prompt ids from the history store or the index."""
+        if self._history_store is not None:
+            return self._history_store.page(user_id, max_items, offset)
+
+        with self.__prompt_queue.mutex:
+            return self._history_index.page(user_id, max_items, offset)
+
+    def _get_history_entries(self, prompt_ids: list, summary: bool = False) -> dict:
+        """
+        Get history entries from memory, falling back to the history store.
+        - Records are decoded after the queue mutex is released.
+        - With summary, entries are returned without the prompt graph.
+        """
+        entries = dict.fromkeys(prompt_ids)
+        missing = []
+
+        with self.__prompt_queue.mutex:
+            history = self.__prompt_queue.history
+            for prompt_id in prompt_ids:
+                if prompt_id in history:
+                    entries[prompt_id] = history[prompt_id]
+                else:
+                    missing.append(prompt_id)
+
+        if missing and self._history_store is not None:
+            entries.update(self._history_store.get_many(missing))
+
+        out = {}
+        for prompt_id, entry in entries.items():
+            if isinstance(entry, HistoryRecord):
+                entry = entry.to_summary(prompt_id) if summary else entry.to_entry()
+            elif entry is None:
+                continue
+            elif summary:
+                entry = HistoryRecord.summarize_entry(prompt_id, entry)
+            out[prompt_id] = entry
+        return out
+
+    @staticmethod
+    def get_history_entry_time(entry: dict) -> Optional[float]:
+        """Get the time a history entry finished, from the timestamp of its last status message."""
+        messages = (entry.get("status") or {}).get("messages") or []
+        for message in reversed(messages):
+            data = message[1] if isinstance(message, (list, tuple)) and len(message) > 1 else None
+            if isinstance(data, dict) and "timestamp" in data:
+                return data["timestamp"] / 1000
+        return None
+
+    def export_history(
+        self,
+        user_id: str,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        statuses: Optional[set] = None,
+        summary: bool = False,
+        batch_size: int = 256,
+    ) -> Iterator[tuple[str, dict]]:
+        """
+        Iterate over the history entries of a user, oldest first.
+        - Prompt ids are paged from the history store, or copied from the index
+          under the queue mutex, and entries are fetched in batches.
+        - since and until are Unix times, statuses are status_str values.
+        - With summary, entries are returned without the prompt graph.
+        """
+        if self._history_store is not None:
+            batches = self._history_store.iter_ids(user_id, batch_size)
+        else:
+            with self.__prompt_queue.mutex:
+                prompt_ids = self._history_index.ids(user_id)
+            batches = (
+                prompt_ids[start : start + batch_size]
+                for start in range(0, len(prompt_ids), batch_size)
+            )
+
+        for batch in batches:
+            entries = self._get_history_entries(batch, summary)
+
+            for prompt_id in batch:
+                entry = entries.get(prompt_id)
+                if entry is None:
+                    continue
+                if statuses and (entry.get("status") or {}).get("status_str") not in statuses:
+                    continue
+                if since is not None or until is not None:
+                    finished_at = self.get_history_entry_time(entry)
+                    if (
+                        finished_at is None
+                        or (since is not None and finished_at < since)
+                        or (until is not None and finished_at >= until)
+                    ):
+                        continue
+                yield prompt_id, entry
 
     def user_queue_get_current_queue(self):
         """Get the current user-specific queue."""
@@ -209,68 +669,161 @@ class AccessControl:
 
     def user_queue_wipe_queue(self):
         """Wipe the user-specific queue."""
+        current_user_id = self.get_current_user_id()
         with self.__prompt_queue.mutex:
+            removed = [
+                item
+                for item in self.__prompt_queue.queue
+                if item["user_id"] == current_user_id
+            ]
             self.__prompt_queue.queue = [
                 item
                 for item in self.__prompt_queue.queue
-                if item["user_id"] != self.get_current_user_id()
+                if item["user_id"] != current_user_id
             ]
-            self.server.queue_updated()
+            heapq.heapify(self.__prompt_queue.queue)
+            self.queue_updated()
+
+        for item in removed:
+            if self._queue_journal is not None:
+                self._queue_journal.record_remove(item["prompt"][1])
+            if self._prompt_dedup is not None:
+                self._prompt_dedup.forget(item["prompt"][1])
 
     def user_queue_delete_queue_item(self, function):
         """Delete an item from the user-specific queue."""
         with self.__prompt_queue.mutex:
             for x in range(len(self.__prompt_queue.queue)):
-                if (
-                    function(self.__prompt_queue.queue[x])
-                    and self.__prompt_queue.queue[x]["user_id"]
-                    == self.get_current_user_id()
-                ):
-                    if len(self.__prompt_queue.queue) == 1:
-                        self.__prompt_queue.wipe_queue()
-                    else:
-                        self.__prompt_queue.pop(x)
-                        heapq.heapify(self.__prompt_queue.queue)
-                    self.server.queue_updated()
+                item = self.__prompt_queue.queue[x]
+                if function(item) and item["user_id"] == self.get_current_user_id():
+                    self.__prompt_queue.queue.pop(x)
+                    heapq.heapify(self.__prompt_queue.queue)
+                    self.queue_updated()
+
+                    if self._queue_journal is not None:
+                        self._queue_journal.record_remove(item["prompt"][1])
+                    if self._prompt_dedup is not None:
+                        self._prompt_dedup.forget(item["prompt"][1])
                     return True
         return False
 
-    def user_queue_get_history(self, prompt_id=None, max_items=None, offset=-1):
+    def user_queue_get_history(
+        self, prompt_id=None, max_items=None, offset=-1, map_function=None
+    ):
         """Get the user-specific queue history."""
-        with self.__prompt_queue.mutex:
-            user_history = {
-                k: v
-                for k, v in self.__prompt_queue.history.items()
-                if v["user_id"] == self.get_current_user_id()
-            }
-            if prompt_id is None:
-                out = {}
-                i = 0
-                if offset < 0 and max_items is not None:
-                    offset = len(self.__prompt_queue.history) - max_items
-                for k in user_history:
-                    if i >= offset:
-                        out[k] = user_history[k]
-                        if max_items is not None and len(out) >= max_items:
-                            break
-                    i += 1
-                return out
-            elif prompt_id in user_history:
-                return {prompt_id: copy.deepcopy(user_history[prompt_id])}
-            else:
-                return {}
+        current_user_id = self.get_current_user_id()
+
+        requested_id = prompt_id
+        if prompt_id is not None and self._prompt_dedup is not None:
+            # Duplicate submissions get the result of the prompt they were attached to.
+            prompt_id = self._prompt_dedup.resolve(prompt_id)
+
+        if prompt_id is None:
+            prompt_ids = self._get_history_page(current_user_id, max_items, offset)
+        elif self._owns_history_entry(current_user_id, prompt_id):
+            prompt_ids = [prompt_id]
+        else:
+            return {}
+
+        out = self._get_history_entries(prompt_ids)
+        if requested_id != prompt_id:
+            out = {requested_id: entry for entry in out.values()}
+
+        if map_function is not None:
+            return {k: map_function(v) for k, v in out.items()}
+        if prompt_id is not None:
+            return copy.deepcopy(out)
+        return out
 
     def user_queue_wipe_history(self):
         """Wipe the user-specific queue history."""
+        current_user_id = self.get_current_user_id()
         with self.__prompt_queue.mutex:
-            self.__prompt_queue.history = {
-                k: v
-                for k, v in self.__prompt_queue.history.items()
-                if v["user_id"] != self.get_current_user_id()
-            }
+            history = self.__prompt_queue.history
+            for prompt_id in self._history_index.remove_user(current_user_id):
+                history.pop(prompt_id, None)
+
+        if self._history_store is not None:
+            self._history_store.delete_user(current_user_id)
+
+    def user_queue_delete_history_item(self, id_to_delete):
+        """Delete an item from the user-specific queue history."""
+        if not self._owns_history_entry(self.get_current_user_id(), id_to_delete):
+            return
+
+        with self.__prompt_queue.mutex:
+            self._history_index.remove(id_to_delete)
+            self.__prompt_queue.history.pop(id_to_delete, None)
+
+        if self._history_store is not None:
+            self._history_store.delete((id_to_delete,))
+
+    def create_history_middleware(self) -> web.middleware:
+        """Create middleware that reads /history off the event loop."""
+
+        @web.middleware
+        async def history_middleware(request: web.Request, handler) -> web.Response:
+            """Middleware to serve history pages from a worker thread."""
+            path = request.path.removeprefix("/api")
+            if request.method != "GET" or not (
+                path == "/history" or path.startswith("/history/")
+            ):
+                return await handler(request)
+
+            prompt_id = path[len("/history/") :] if path != "/history" else None
+            try:
+                max_items = request.query.get("max_items")
+                max_items = int(max_items) if max_items is not None else None
+                offset = int(request.query.get("offset", -1))
+            except ValueError:
+                return web.json_response(
+                    {"error": "max_items and offset must be numbers"}, status=400
+                )
+
+            # Copy the context so the worker thread sees the current user.
+            context = contextvars.copy_context()
+            history = await asyncio.get_running_loop().run_in_executor(
+                None,
+                lambda: context.run(
+                    self.__prompt_queue.get_history, prompt_id, max_items, offset
+                ),
+            )
+            return web.json_response(history)
+
+        return history_middleware
+
+    def create_prompt_dedup_middleware(self) -> web.middleware:
+        """Create middleware that answers duplicate prompts with the prompt they attached to."""
+
+        @web.middleware
+        async def prompt_dedup_middleware(request: web.Request, handler) -> web.Response:
+            """Middleware to return the id of the prompt that runs for a duplicate."""
+            response = await handler(request)
+            if (
+                request.method != "POST"
+                or request.path.removeprefix("/api") != "/prompt"
+                or response.status != 200
+                or response.content_type != "application/json"
+            ):
+                return response
+
+            data = json.loads(response.body)
+            prompt_id = data.get("prompt_id")
+            original_id = self._prompt_dedup.resolve(prompt_id)
+            if original_id == prompt_id:
+                return response
+
+            # The submitted id was never queued, so it gets no events and cannot
+            # be cancelled; clients follow the earlier prompt instead.
+            data.update(prompt_id=original_id, deduplicated=True)
+            return web.json_response(data)
+
+        return prompt_dedup_middleware
 
     def patch_prompt_queue(self):
         """Patch the prompt queue with user-specific methods."""
+        self.server.queue_updated = self.queue_updated
+        self.track_sockets()
         self.__prompt_queue.put = self.user_queue_put
         self.__prompt_queue.get = self.user_queue_get
         self.__prompt_queue.task_done = self.user_queue_task_done
@@ -281,6 +834,28 @@ class AccessControl:
         self.__prompt_queue.delete_queue_item = self.user_queue_delete_queue_item
         self.__prompt_queue.get_history = self.user_queue_get_history
         self.__prompt_queue.wipe_history = self.user_queue_wipe_history
+        self.__prompt_queue.delete_history_item = self.user_queue_delete_history_item
+
+    def start_queue_journal(self) -> None:
+        """Replay the queue journal and start journaling, from the server startup hook."""
+        if self._queue_journal is None:
+            return
+
+        self.replay_queue_journal()
+        self._queue_journal.start()
+
+    def replay_queue_journal(self) -> None:
+        """Put the prompts left unfinished by the last run back in the queue."""
+        replayed = self._queue_journal.replay()
+
+        for item, user_id in replayed:
+            self.__prompt_queue_put(UserQueueItem(prompt=item, user_id=user_id))
+
+        if replayed and hasattr(self.server, "number"):
+            # Keep new submissions behind the replayed ones.
+            self.server.number = max(
+                self.server.number, max(item[0] for item, _ in replayed) + 1
+            )
 
     def create_manager_access_control_middleware(
         self, manager_directory: str = "/extensions/comfyui-manager", manager_routes: tuple = ()
@@ -294,7 +869,7 @@ class AccessControl:
             """Middleware to handle manager access control."""
             user_id = request.get("user_id")
             
-            if self.users_db.get_admin_user()[0] == user_id or (not request.path.startswith(manager_routes) and not request.path.lower().startswith(manager_directory)):
+            if self.permissions.has_permission(user_id, "manage_nodes") or (not request.path.startswith(manager_routes) and not request.path.lower().startswith(manager_directory)):
                 return await handler(request)
 
             return web.HTTPForbidden(
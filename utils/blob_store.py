@@ -0,0 +1,205 @@
+import os
+import json
+import uuid
+import shutil
+import asyncio
+import hashlib
+import threading
+from aiohttp import web
+
+from .storage import UPLOAD_ROUTES
+
+IMAGE_UPLOAD_ROUTES = ("/upload/image", "/api/upload/image")
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_stream(stream) -> str:
+    """Get the sha256 of a file object, reading it in chunks."""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BlobStore:
+    """
+    Content addressed store shared by the per-user input folders.
+    - Uploaded files are hashed in chunks from the spooled upload aiohttp
+      buffered, then hardlinked to a blob named by their hash.
+    - The number of users referencing a blob is its link count minus one.
+    - Deleting a user's file only removes that user's link.
+    """
+
+    def __init__(self, blob_directory: str, directories: dict):
+        self.blob_directory = blob_directory
+        self.directories = directories
+
+        self._lock = threading.Lock()
+
+    def create_directory(self) -> None:
+        """Create the blob directory, from the server startup hook."""
+        os.makedirs(self.blob_directory, exist_ok=True)
+
+    def get_blob_path(self, digest: str) -> str:
+        """Get the path of a blob, sharded by the first byte of its hash."""
+        return os.path.join(self.blob_directory, digest[:2], digest)
+
+    def get_user_path(self, kind: str, user_id: str, *parts: str) -> str | None:
+        """Get a normalized path in a user's folder, or None if it points outside of it."""
+        user_directory = os.path.abspath(os.path.join(self.directories[kind], user_id))
+        path = os.path.abspath(os.path.join(user_directory, *parts))
+        if os.path.commonpath((user_directory, path)) != user_directory:
+            return None
+        return path
+
+    def detach(self, path: str) -> None:
+        """Give a shared file its own copy so writing to it leaves other users untouched."""
+        try:
+            if os.stat(path).st_nlink < 2:
+                return
+        except OSError:
+            return
+
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            shutil.copy2(path, temp_path)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def link(self, path: str, digest: str) -> bool:
+        """Replace a user's file with a link to the blob of its content."""
+        blob_path = self.get_blob_path(digest)
+
+        with self._lock:
+            try:
+                stat = os.stat(path)
+                if not os.path.exists(blob_path):
+                    os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                    os.link(path, blob_path)
+                    return True
+
+                blob_stat = os.stat(blob_path)
+                if (stat.st_dev, stat.st_ino) == (blob_stat.st_dev, blob_stat.st_ino):
+                    return True
+                if stat.st_size != blob_stat.st_size:
+                    return False
+
+                temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+                os.link(blob_path, temp_path)
+                os.replace(temp_path, path)
+                return True
+            except OSError:
+                # Hardlinks are not supported, keep the user's own copy.
+                return False
+
+    def prune(self) -> int:
+        """Remove blobs no user references anymore and return the bytes freed."""
+        freed = 0
+        with self._lock:
+            for blob_path, stat in self._iter_blobs():
+                if stat.st_nlink > 1:
+                    continue
+                try:
+                    os.remove(blob_path)
+                    freed += stat.st_size
+                except OSError:
+                    continue
+
+        return freed
+
+    def _iter_blobs(self):
+        try:
+            shards = [entry.path for entry in os.scandir(self.blob_directory) if entry.is_dir()]
+        except OSError:
+            return
+
+        for shard in shards:
+            try:
+                with os.scandir(shard) as entries:
+                    for entry in entries:
+                        try:
+                            yield entry.path, entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+
+    def report(self) -> dict:
+        """Get the number of blobs, references and bytes saved by sharing them."""
+        report = {"blobs": 0, "references": 0, "stored_bytes": 0, "saved_bytes": 0}
+        for _, stat in self._iter_blobs():
+            references = stat.st_nlink - 1
+            if references < 1:
+                continue
+
+            report["blobs"] += 1
+            report["references"] += references
+            report["stored_bytes"] += stat.st_size
+            report["saved_bytes"] += (references - 1) * stat.st_size
+
+        return report
+
+    def create_blob_middleware(self) -> web.middleware:
+        """Create middleware that deduplicates uploaded input files."""
+
+        @web.middleware
+        async def blob_middleware(request: web.Request, handler) -> web.Response:
+            """Middleware to link uploaded files to shared blobs."""
+            if request.method != "POST" or request.path not in UPLOAD_ROUTES:
+                return await handler(request)
+
+            user_id = request.get("user_id") or "public"
+            post = await request.post()
+            image = post.get("image")
+            kind = post.get("type", "input")
+            if kind not in self.directories or not getattr(image, "filename", None):
+                return await handler(request)
+
+            loop = asyncio.get_running_loop()
+
+            target = self.get_user_path(
+                kind, user_id, post.get("subfolder", ""), image.filename
+            )
+            if target is None:
+                # Leave paths outside the user's folder to ComfyUI's own checks.
+                return await handler(request)
+
+            if str(post.get("overwrite", "")).lower() in ("true", "1"):
+                # ComfyUI writes overwritten files in place.
+                await loop.run_in_executor(None, self.detach, target)
+
+            digest = None
+            if request.path in IMAGE_UPLOAD_ROUTES:
+
+                def hash_upload() -> str:
+                    image.file.seek(0)
+                    try:
+                        return hash_stream(image.file)
+                    finally:
+                        image.file.seek(0)
+
+                digest = await loop.run_in_executor(None, hash_upload)
+
+            response = await handler(request)
+
+            if digest and response.status == 200:
+                path = target
+                try:
+                    result = json.loads(response.body)
+                    path = self.get_user_path(
+                        result.get("type", kind),
+                        user_id,
+                        result.get("subfolder", ""),
+                        result["name"],
+                    )
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    pass
+
+                if path is not None:
+                    await loop.run_in_executor(None, self.link, path, digest)
+
+            return response
+
+        return blob_middleware
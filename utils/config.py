@@ -1,6 +1,6 @@
 import os
 import warnings
-import uuid
+import secrets
 import json
 from typing import Dict, Any
 
@@ -20,14 +20,18 @@ def load_config(file_path: str) -> Dict[str, Any]:
 
 config = load_config(CONFIG_FILE)
 
+TOKEN_KEY_ALGORITHM = config.get("token_key_algorithm", "")
+TOKEN_KEYRING = os.path.join(EXT_PATH, config.get("token_keyring", "keyring.json"))
+TOKEN_VERIFY_ONLY = config.get("token_verify_only", False)
+
 SECRET_KEY = os.getenv(config.get("secret_key_env", "SECRET_KEY"))
 
-if not SECRET_KEY:
+if not SECRET_KEY and not TOKEN_KEY_ALGORITHM:
     warnings.warn(
         "The SECRET_KEY environment variable is not set. A random key will be used for this session. "
         "This will cause all users to log out on server restart."
     )
-    SECRET_KEY = "".join([str(uuid.uuid4().hex) for _ in range(128)])
+    SECRET_KEY = secrets.token_hex(64)
 
 MATCH_HEADERS = {"X-Forwarded-Proto": "https"}
 
@@ -36,6 +40,9 @@ TOKEN_EXPIRE_MINUTES = 60 * config.get("access_token_expiration_hours", 12)
 MAX_TOKEN_EXPIRE_MINUTES = 60 * config.get("max_access_token_expiration_hours", 8760)
 
 USERS_FILE = os.path.join(EXT_PATH, config.get("users_db", "users_db.json"))
+PASSWORD_SCHEME = config.get("password_scheme", "bcrypt")
+PASSWORD_TARGET_MS = config.get("password_target_ms", 0)
+PASSWORD_WORK_FACTOR = config.get("password_work_factor", None)
 LOG_FILE = os.path.join(EXT_PATH, config.get("log", "sentinel.log"))
 LOG_LEVELS = config.get("log_levels", ["INFO"])
 
@@ -45,14 +52,49 @@ BLACKLIST = os.path.join(EXT_PATH, config.get("blacklist", "blacklist.txt"))
 BLACKLIST_AFTER_ATTEMPTS = config.get("blacklist_after_attempts")
 
 FREE_MEMORY_ON_LOGOUT = config.get("free_memory_on_logout", False)
+IDLE_FREE_MINUTES = config.get("idle_free_minutes", 0)
+IDLE_UNLOAD_MODELS = config.get("idle_unload_models", True)
+IDLE_FREE_MEMORY = config.get("idle_free_memory", True)
 FORCE_HTTPS = config.get("force_https", False)
 
 SEPERATE_USERS = config.get("seperate_users", False)
 
+HISTORY_DB = config.get("history_db", "")
+if HISTORY_DB:
+    HISTORY_DB = os.path.join(EXT_PATH, HISTORY_DB)
+HISTORY_HOT_ITEMS = config.get("history_hot_items", 64)
+HISTORY_MAX_ITEMS_PER_USER = config.get("history_max_items_per_user", 0)
+HISTORY_MAX_AGE_DAYS = config.get("history_max_age_days", 0)
+
+STORAGE_ACCOUNTING = config.get("storage_accounting", False)
+USER_QUOTA_BYTES = int(config.get("user_quota_mb", 0) * 1024 * 1024)
+
+INPUT_DEDUP = config.get("input_dedup", False)
+
+GC_INTERVAL_MINUTES = config.get("gc_interval_minutes", 0)
+GC_MAX_USER_BYTES = int(config.get("gc_max_user_mb", 0) * 1024 * 1024)
+GC_MAX_AGE_HOURS = config.get("gc_max_age_hours", 0)
+GC_MAX_FILES_PER_SECOND = config.get("gc_max_files_per_second", 200)
+GC_DRY_RUN = config.get("gc_dry_run", False)
+
+OUTPUT_INDEX = config.get("output_index", "")
+if OUTPUT_INDEX:
+    OUTPUT_INDEX = os.path.join(EXT_PATH, OUTPUT_INDEX)
+
+QUEUE_JOURNAL = config.get("queue_journal", "")
+if QUEUE_JOURNAL:
+    QUEUE_JOURNAL = os.path.join(EXT_PATH, QUEUE_JOURNAL)
+
+PROMPT_DEDUP_SECONDS = config.get("prompt_dedup_seconds", 0)
+
 MANAGER_ADMIN_ONLY = config.get("manager_admin_only", False)
 
+ROLES = config.get("roles", {})
+DEFAULT_ROLE = config.get("default_role", "user")
+
 WEB_DIR = os.path.join(EXT_PATH, "sentinel-web")
 HTML_DIR = WEB_DIR
 CSS_DIR = os.path.join(WEB_DIR, "css")
 JS_DIR = os.path.join(WEB_DIR, "js")
 ASSETS_DIR = os.path.join(WEB_DIR, "assets")
+RELOAD_WEB_FILES = config.get("reload_web_files", False)
@@ -0,0 +1,234 @@
+import sys
+import json
+import zlib
+from collections.abc import Mapping
+from typing import Optional
+
+_MISSING = object()
+
+
+class HistoryRecord(Mapping):
+    """
+    Compact in-memory history entry.
+    - Reads like the entry dict, so code doing history[prompt_id]["outputs"] keeps
+      working; use to_entry() for a dict that can be modified or serialized.
+    - The prompt tuple (graph, extra data and workflow) is kept zlib-compressed
+      and only decoded when it is read. A prompt holding values JSON cannot encode
+      is kept as it is.
+    - User ids and node class names are interned, so records share them.
+    """
+
+    __slots__ = ("number", "user_id", "class_types", "outputs", "status", "extra", "_prompt")
+
+    def __init__(
+        self,
+        prompt: tuple,
+        outputs: dict,
+        status: Optional[dict],
+        user_id: Optional[str],
+        extra: Optional[dict] = None,
+    ):
+        self.number = prompt[0]
+        self.user_id = sys.intern(user_id) if isinstance(user_id, str) else user_id
+        graph = prompt[2] if len(prompt) > 2 and isinstance(prompt[2], dict) else {}
+        self.class_types = tuple(
+            sorted(
+                {
+                    sys.intern(node["class_type"])
+                    for node in graph.values()
+                    if isinstance(node, dict) and isinstance(node.get("class_type"), str)
+                }
+            )
+        )
+        self.outputs = outputs
+        self.status = status
+        self.extra = extra or None
+        try:
+            self._prompt = zlib.compress(
+                json.dumps(prompt, separators=(",", ":")).encode("utf-8"), 1
+            )
+        except (TypeError, ValueError):
+            self._prompt = prompt
+
+    @classmethod
+    def from_entry(cls, entry: dict) -> "HistoryRecord":
+        """Compact a history entry dict."""
+        extra = {
+            key: value
+            for key, value in entry.items()
+            if key not in ("prompt", "outputs", "status", "user_id")
+        }
+        return cls(
+            entry["prompt"],
+            entry.get("outputs", {}),
+            entry.get("status"),
+            entry.get("user_id"),
+            extra,
+        )
+
+    @property
+    def prompt(self) -> tuple:
+        """Decode the prompt tuple."""
+        if not isinstance(self._prompt, bytes):
+            return self._prompt
+        return tuple(json.loads(zlib.decompress(self._prompt)))
+
+    def __getitem__(self, key: str):
+        if key == "prompt":
+            return self.prompt
+        if key == "outputs":
+            return self.outputs
+        if key == "status":
+            return self.status
+        if key == "user_id":
+            return self.user_id
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __iter__(self):
+        yield from ("prompt", "outputs", "status", "user_id")
+        yield from self.extra or ()
+
+    def __len__(self) -> int:
+        return 4 + len(self.extra or ())
+
+    def to_entry(self) -> dict:
+        """Get the full history entry, in the layout of ComfyUI's prompt queue history."""
+        return {
+            "prompt": self.prompt,
+            "outputs": self.outputs,
+            "status": self.status,
+            "user_id": self.user_id,
+            **(self.extra or {}),
+        }
+
+    def to_summary(self, prompt_id: str) -> dict:
+        """Get the history entry without the prompt graph, for listings."""
+        return {
+            "prompt": (self.number, prompt_id),
+            "outputs": self.outputs,
+            "status": self.status,
+            "user_id": self.user_id,
+            "class_types": list(self.class_types),
+            **(self.extra or {}),
+        }
+
+    @staticmethod
+    def summarize_entry(prompt_id: str, entry: dict) -> dict:
+        """Get the listing view of a history entry dict."""
+        prompt = entry.get("prompt") or (None,)
+        graph = prompt[2] if len(prompt) > 2 and isinstance(prompt[2], dict) else {}
+        return {
+            "prompt": (prompt[0], prompt_id),
+            **{key: value for key, value in entry.items() if key != "prompt"},
+            "class_types": sorted(
+                {
+                    node["class_type"]
+                    for node in graph.values()
+                    if isinstance(node, dict) and isinstance(node.get("class_type"), str)
+                }
+            ),
+        }
+
+
+class HistoryIndex:
+    """Per-user ordered index of prompt ids in the prompt queue history."""
+
+    def __init__(self):
+        self._ids = {}
+        self._heads = {}
+        self._owners = {}
+
+    def __contains__(self, prompt_id) -> bool:
+        return prompt_id in self._owners
+
+    def owner(self, prompt_id) -> Optional[str]:
+        """Get the user id that owns a history entry."""
+        return self._owners.get(prompt_id)
+
+    def count(self, user_id: str) -> int:
+        """Get the number of history entries of a user."""
+        return len(self._ids.get(user_id, ())) - self._heads.get(user_id, 0)
+
+    def oldest(self, user_id: str):
+        """Get the prompt id of a user's oldest history entry."""
+        if not self.count(user_id):
+            return None
+
+        return self._ids[user_id][self._heads[user_id]]
+
+    def add(self, user_id: str, prompt_id) -> None:
+        """Append a history entry to the end of a user's history."""
+        if prompt_id in self._owners:
+            self.remove(prompt_id)
+
+        self._ids.setdefault(user_id, []).append(prompt_id)
+        self._heads.setdefault(user_id, 0)
+        self._owners[prompt_id] = user_id
+
+    def remove(self, prompt_id) -> Optional[str]:
+        """Remove a history entry and return the user id that owned it."""
+        user_id = self._owners.pop(prompt_id, _MISSING)
+        if user_id is _MISSING:
+            return None
+
+        ids = self._ids[user_id]
+        head = self._heads[user_id]
+
+        if ids[head] == prompt_id:
+            # Evictions always hit the oldest entry, so only move the head.
+            ids[head] = None
+            head += 1
+        else:
+            ids.pop(ids.index(prompt_id, head))
+
+        if head == len(ids):
+            del self._ids[user_id]
+            del self._heads[user_id]
+        elif head > 64 and head * 2 > len(ids):
+            del ids[:head]
+            self._heads[user_id] = 0
+        else:
+            self._heads[user_id] = head
+
+        return user_id
+
+    def remove_user(self, user_id: str) -> list:
+        """Remove all history entries of a user and return their prompt ids."""
+        ids = self.ids(user_id)
+        for prompt_id in ids:
+            self._owners.pop(prompt_id, None)
+
+        self._ids.pop(user_id, None)
+        self._heads.pop(user_id, None)
+
+        return ids
+
+    def ids(self, user_id: str) -> list:
+        """Get a snapshot of a user's prompt ids, oldest first."""
+        return self._ids.get(user_id, [])[self._heads.get(user_id, 0) :]
+
+    def page(self, user_id: str, max_items: Optional[int] = None, offset: int = -1) -> list:
+        """
+        Get a page of a user's prompt ids, oldest first.
+        - A negative offset with max_items returns the latest max_items entries.
+        - A negative offset without max_items returns the whole history.
+        """
+        count = self.count(user_id)
+
+        if offset < 0:
+            offset = max(count - max_items, 0) if max_items is not None else 0
+
+        end = count if max_items is None else min(offset + max_items, count)
+        if offset >= end:
+            return []
+
+        head = self._heads[user_id]
+        return self._ids[user_id][head + offset : head + end]
+
+    def clear(self) -> None:
+        """Remove all history entries."""
+        self._ids.clear()
+        self._heads.clear()
+        self._owners.clear()
@@ -0,0 +1,207 @@
+import json
+import time
+import zlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+
+class HistoryStore:
+    """
+    SQLite backed store for prompt queue history entries.
+    - The database is opened by open() from the server startup hook, or on first use.
+    """
+
+    def __init__(
+        self, database: str | Path, hot_items: int = 64, max_age_days: float = 0
+    ):
+        self.database = database
+        self.hot_items = max(int(hot_items), 1)
+        self.max_age_days = max_age_days
+
+        self._lock = threading.RLock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def open(self) -> sqlite3.Connection:
+        """Open the database and create its tables, unless it is already open."""
+        with self._lock:
+            if self._connection is not None:
+                return self._connection
+
+            connection = sqlite3.connect(
+                self.database, check_same_thread=False, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS history ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "prompt_id TEXT NOT NULL UNIQUE, "
+                "user_id TEXT, "
+                "created REAL NOT NULL, "
+                "entry BLOB NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS history_created ON history (created)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS history_user ON history (user_id, seq)"
+            )
+            self._connection = connection
+            return connection
+
+    @staticmethod
+    def encode_entry(entry: dict) -> bytes:
+        """
+        Serialize a history entry into a compressed blob.
+        Raises TypeError or ValueError if the entry holds values JSON cannot encode.
+        """
+        return zlib.compress(json.dumps(entry).encode("utf-8"), 3)
+
+    @staticmethod
+    def decode_entry(blob: bytes) -> dict:
+        """Deserialize a history entry from a compressed blob."""
+        return json.loads(zlib.decompress(blob))
+
+    def page(
+        self, user_id: str, max_items: Optional[int] = None, offset: int = -1
+    ) -> list[str]:
+        """
+        Get a page of a user's prompt ids, oldest first.
+        - A negative offset with max_items returns the latest max_items entries.
+        - A negative offset without max_items returns the whole history.
+        """
+        if offset < 0 and max_items is not None:
+            query = (
+                "SELECT prompt_id FROM (SELECT seq, prompt_id FROM history "
+                "WHERE user_id IS ? ORDER BY seq DESC LIMIT ?) ORDER BY seq"
+            )
+            params = (user_id, max_items)
+        else:
+            query = (
+                "SELECT prompt_id FROM history WHERE user_id IS ? "
+                "ORDER BY seq LIMIT ? OFFSET ?"
+            )
+            params = (user_id, -1 if max_items is None else max_items, max(offset, 0))
+
+        with self._lock:
+            return [prompt_id for (prompt_id,) in self.open().execute(query, params)]
+
+    def iter_ids(self, user_id: str, batch_size: int = 256) -> Iterator[list[str]]:
+        """Iterate over a user's prompt ids in batches, oldest first."""
+        seq = 0
+        while True:
+            with self._lock:
+                rows = self.open().execute(
+                    "SELECT seq, prompt_id FROM history WHERE user_id IS ? AND seq > ? "
+                    "ORDER BY seq LIMIT ?",
+                    (user_id, seq, batch_size),
+                ).fetchall()
+
+            if not rows:
+                return
+            yield [prompt_id for _, prompt_id in rows]
+            seq = rows[-1][0]
+
+    def owns(self, prompt_id: str, user_id: str) -> bool:
+        """Check if a history entry belongs to a user."""
+        with self._lock:
+            row = self.open().execute(
+                "SELECT 1 FROM history WHERE prompt_id = ? AND user_id IS ?",
+                (prompt_id, user_id),
+            ).fetchone()
+
+        return row is not None
+
+    def put(self, prompt_id: str, user_id: str, entry: dict) -> None:
+        """Insert or replace a history entry, raising TypeError or ValueError if it cannot be encoded."""
+        blob = self.encode_entry(entry)
+        with self._lock:
+            self.open().execute(
+                "INSERT OR REPLACE INTO history (prompt_id, user_id, created, entry) "
+                "VALUES (?, ?, ?, ?)",
+                (prompt_id, user_id, time.time(), blob),
+            )
+
+    def get(self, prompt_id: str) -> Optional[dict]:
+        """Get a single history entry."""
+        return self.get_many((prompt_id,)).get(prompt_id)
+
+    def get_many(self, prompt_ids: Iterable[str]) -> dict:
+        """Get several history entries keyed by prompt id."""
+        prompt_ids = list(prompt_ids)
+        rows = []
+        with self._lock:
+            for i in range(0, len(prompt_ids), 500):
+                chunk = prompt_ids[i : i + 500]
+                rows += self.open().execute(
+                    "SELECT prompt_id, entry FROM history WHERE prompt_id IN "
+                    f"({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+
+        return {prompt_id: self.decode_entry(blob) for prompt_id, blob in rows}
+
+    def delete(self, prompt_ids: Iterable[str]) -> None:
+        """Delete history entries."""
+        prompt_ids = list(prompt_ids)
+        if not prompt_ids:
+            return
+
+        with self._lock:
+            self.open().executemany(
+                "DELETE FROM history WHERE prompt_id = ?",
+                ((prompt_id,) for prompt_id in prompt_ids),
+            )
+
+    def delete_user(self, user_id: str) -> None:
+        """Delete all history entries of a user."""
+        with self._lock:
+            self.open().execute(
+                "DELETE FROM history WHERE user_id IS ?", (user_id,)
+            )
+
+    def trim_user(self, user_id: str, max_items: int) -> list[str]:
+        """Delete a user's entries beyond the latest max_items and return their prompt ids."""
+        with self._lock:
+            expired = [
+                prompt_id
+                for (prompt_id,) in self.open().execute(
+                    "SELECT prompt_id FROM history WHERE user_id IS ? "
+                    "ORDER BY seq DESC LIMIT -1 OFFSET ?",
+                    (user_id, max_items),
+                )
+            ]
+            self.open().executemany(
+                "DELETE FROM history WHERE prompt_id = ?",
+                ((prompt_id,) for prompt_id in expired),
+            )
+
+        return expired
+
+    def prune_expired(self) -> list[str]:
+        """Delete entries older than max_age_days and return their prompt ids."""
+        if not self.max_age_days:
+            return []
+
+        cutoff = time.time() - self.max_age_days * 86400
+        with self._lock:
+            expired = [
+                prompt_id
+                for (prompt_id,) in self.open().execute(
+                    "SELECT prompt_id FROM history WHERE created < ?", (cutoff,)
+                )
+            ]
+            self.open().execute(
+                "DELETE FROM history WHERE created < ?", (cutoff,)
+            )
+
+        return expired
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -0,0 +1,116 @@
+import time
+import threading
+from server import PromptServer
+
+from .logger import Logger
+
+
+def request_memory_free(
+    server: PromptServer, unload_models: bool = False, free_memory: bool = False
+) -> None:
+    """Ask the prompt worker to free memory, like POST /free does."""
+    if unload_models:
+        server.prompt_queue.set_flag("unload_models", unload_models)
+    if free_memory:
+        server.prompt_queue.set_flag("free_memory", free_memory)
+
+
+class IdleMonitor:
+    """
+    Free memory once every user has been idle for a while.
+    - Users are active while they send requests or have prompts queued or running.
+    - Users idle for the whole window are dropped, so only active users are tracked.
+    """
+
+    def __init__(
+        self,
+        server: PromptServer,
+        logger: Logger,
+        idle_minutes: float = 0,
+        unload_models: bool = True,
+        free_memory: bool = True,
+    ):
+        self.server = server
+        self.logger = logger
+        self.idle_seconds = idle_minutes * 60
+        self.unload_models = unload_models
+        self.free_memory = free_memory
+
+        self._last_active = {}
+        self._started_at = time.monotonic()
+        self._freed = False
+        self._lock = threading.Lock()
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def touch(self, user_id: str) -> None:
+        """Record activity of a user."""
+        with self._lock:
+            self._last_active[user_id] = time.monotonic()
+            self._freed = False
+
+    def get_busy_users(self) -> set:
+        """Get the user ids of the queued and running prompts."""
+        prompt_queue = self.server.prompt_queue
+        with prompt_queue.mutex:
+            items = [*prompt_queue.queue, *prompt_queue.currently_running.values()]
+
+        # Without separate users queue items are not tagged with a user.
+        return {item.get("user_id") if isinstance(item, dict) else None for item in items}
+
+    def get_active_users(self) -> set:
+        """Get the users active within the idle window, forgetting the others."""
+        now = time.monotonic()
+        busy_users = self.get_busy_users()
+
+        with self._lock:
+            for user_id in busy_users:
+                self._last_active[user_id] = now
+            if busy_users:
+                # Prompts load models again, so they can be freed again.
+                self._freed = False
+
+            for user_id, last_active in list(self._last_active.items()):
+                if now - last_active >= self.idle_seconds:
+                    del self._last_active[user_id]
+
+            return set(self._last_active)
+
+    def check(self) -> bool:
+        """Free memory if no user was active or had work for the idle window."""
+        if not self.idle_seconds or self.get_active_users() or self._freed:
+            return False
+
+        if time.monotonic() - self._started_at < self.idle_seconds:
+            return False
+
+        request_memory_free(self.server, self.unload_models, self.free_memory)
+        self._freed = True
+        self.logger.info(
+            f"Freed memory after {self.idle_seconds / 60:g} idle minutes "
+            f"(unload_models={self.unload_models}, free_memory={self.free_memory})"
+        )
+        return True
+
+    def start(self) -> None:
+        """Start checking for idleness in the background."""
+        if self._thread is not None or not self.idle_seconds:
+            return
+
+        self._thread = threading.Thread(
+            target=self._run, name="sentinel-idle-monitor", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop checking for idleness."""
+        self._stop.set()
+
+    def _run(self) -> None:
+        interval = min(60.0, max(self.idle_seconds / 4, 1.0))
+        while not self._stop.wait(interval):
+            try:
+                self.check()
+            except Exception as e:
+                self.logger.error(f"Idle monitor failed: {e}")
@@ -35,8 +35,6 @@ class IPFilter:
         self.whitelist = []
         self.blacklist = []
 
-        self.load_filter_list()
-
     @staticmethod
     def calculate_file_hash(filter_file) -> str:
         """Calculate the SHA256 hash of the filter IP list file."""
@@ -67,7 +65,7 @@ class IPFilter:
                     setattr(self, hash_attribute, new_hash)
 
             else:
-                return getattr(self, hash_attribute.split("_")[0])
+                return getattr(self, hash_attribute.split("_")[1])
 
             return ip_list
 
@@ -1,11 +1,24 @@
-import jwt
 from aiohttp import web
 from datetime import datetime, timedelta, timezone
 
 from .users_db import UsersDB
 from .access_control import AccessControl
+from .idle_monitor import IdleMonitor
+from .keyring import Keyring
 from .logger import Logger
 
+_jwt = None
+
+
+def import_jwt():
+    """Import PyJWT once, from the server startup hook or on first use, and return it."""
+    global _jwt
+    if _jwt is None:
+        import jwt
+
+        _jwt = jwt
+    return _jwt
+
 
 class JWTAuth:
     def __init__(
@@ -16,16 +29,25 @@ class JWTAuth:
         secret_key: str,
         expire_minutes: int = 12 * 60,
         algorithm: str = "HS256",
+        idle_monitor: IdleMonitor | None = None,
+        keyring: Keyring | None = None,
     ):
         self.users_db = users_db
         self.access_control = access_control
         self.logger = logger
+        self.idle_monitor = idle_monitor
+        self.keyring = keyring
 
         self.expire_minutes = expire_minutes
         self.algorithm = algorithm
 
         self.__secret_key = secret_key
 
+    @property
+    def can_issue_tokens(self) -> bool:
+        """Check if this node holds a key to sign tokens."""
+        return self.keyring is None or self.keyring.can_sign
+
     @staticmethod
     def get_token_from_request(request: web.Request) -> str:
         """Extract token from request headers or cookies."""
@@ -36,15 +58,35 @@ class JWTAuth:
 
     def create_access_token(self, data: dict, expire_minutes=None) -> str:
         """Create a JWT access token."""
+        jwt = import_jwt()
         to_encode = data.copy()
         if not expire_minutes:
             expire_minutes = self.expire_minutes
         expire = datetime.now(timezone.utc) + timedelta(minutes=expire_minutes)
         to_encode.update({"exp": expire})
+
+        if self.keyring is not None:
+            kid, algorithm, key = self.keyring.get_signing_key()
+            return jwt.encode(to_encode, key, algorithm=algorithm, headers={"kid": kid})
+
         return jwt.encode(to_encode, self.__secret_key, algorithm=self.algorithm)
 
     def decode_access_token(self, token: str) -> dict:
-        """Decode a JWT access token."""
+        """Decode a JWT access token, picking the keyring key by its kid."""
+        jwt = import_jwt()
+        if self.keyring is not None:
+            kid = jwt.get_unverified_header(token).get("kid")
+            if kid is not None:
+                verify_key = self.keyring.get_verify_key(kid)
+                if verify_key is None:
+                    raise jwt.InvalidTokenError(f"Unknown signing key: {kid}")
+                algorithm, key = verify_key
+                return jwt.decode(token, key, algorithms=[algorithm])
+
+            if not self.__secret_key:
+                raise jwt.InvalidTokenError("Token has no key id")
+
+        # Tokens signed with the shared secret before a keyring was set up.
         return jwt.decode(token, self.__secret_key, algorithms=[self.algorithm])
 
     def create_jwt_middleware(
@@ -58,6 +100,7 @@ class JWTAuth:
         @web.middleware
         async def jwt_middleware(request: web.Request, handler) -> web.Response:
             """Middleware to handle JWT authentication."""
+            jwt = import_jwt()
             if (
                 request.path in public
                 or request.path.startswith(public_prefixes)
@@ -74,10 +117,15 @@ class JWTAuth:
                 user = self.decode_access_token(token)
                 user_id = user.get("id")
                 username = user.get("username")
-                if not user_id == self.users_db.get_user(username)[0]:
+                db_user_id, user_data = self.users_db.get_user(username)
+                if not user_id == db_user_id:
                     raise ValueError(
                         f"User with username: {username} is not in the database"
                     )
+                if user_data.get("disabled"):
+                    return await handle_unauthorized_access(
+                        request, "/logout", message="Account is disabled"
+                    )
 
                 request["user_id"] = user_id
                 request["user"] = username
@@ -85,11 +133,14 @@ class JWTAuth:
                 set_fallback = request.path in ["/api/prompt"]
                 self.access_control.set_current_user_id(user_id, set_fallback)
 
+                if self.idle_monitor is not None:
+                    self.idle_monitor.touch(user_id)
+
             except jwt.ExpiredSignatureError:
                 return await handle_unauthorized_access(
                     request, "/logout", message="Token has expired"
                 )
-            except jwt.DecodeError:
+            except jwt.InvalidTokenError:
                 return await handle_unauthorized_access(
                     request, "/logout", message="Token is invalid"
                 )
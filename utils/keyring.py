@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import uuid
+import argparse
+import threading
+import importlib.util
+from pathlib import Path
+
+ASYMMETRIC_ALGORITHMS = ("EdDSA", "ES256")
+
+
+def import_serialization(algorithm: str):
+    """Import the cryptography serialization module on first use."""
+    try:
+        from cryptography.hazmat.primitives import serialization
+    except ImportError:
+        raise RuntimeError(
+            f"{algorithm} tokens require the cryptography package: pip install cryptography"
+        )
+    return serialization
+
+
+def generate_key(algorithm: str) -> dict:
+    """Generate a PEM encoded key pair for a keyring."""
+    serialization = import_serialization(algorithm)
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+
+    if algorithm == "EdDSA":
+        private_key = ed25519.Ed25519PrivateKey.generate()
+    elif algorithm == "ES256":
+        private_key = ec.generate_private_key(ec.SECP256R1())
+    else:
+        raise ValueError(f"Unsupported keyring algorithm: {algorithm}")
+
+    return {
+        "alg": algorithm,
+        "created": int(time.time()),
+        "private": private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ).decode("utf-8"),
+        "public": private_key.public_key()
+        .public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+        .decode("utf-8"),
+    }
+
+
+class Keyring:
+    """
+    Asymmetric JWT keys identified by kid, stored in a local JSON file.
+    - The active key signs new tokens, every key in the file verifies them.
+    - Files without private keys make a verify-only node.
+    - The file is reloaded when it changes, so keys can be rotated without downtime.
+    """
+
+    def __init__(
+        self,
+        keyring_file: str | Path,
+        algorithm: str = "EdDSA",
+        verify_only: bool = False,
+        reload_interval: float = 5.0,
+    ):
+        if algorithm not in ASYMMETRIC_ALGORITHMS:
+            raise ValueError(
+                f"Unsupported keyring algorithm: {algorithm}. Valid algorithms are: {ASYMMETRIC_ALGORITHMS}"
+            )
+        if importlib.util.find_spec("cryptography") is None:
+            import_serialization(algorithm)
+
+        self.keyring_file = keyring_file
+        self.algorithm = algorithm
+        self.verify_only = verify_only
+        self.reload_interval = reload_interval
+
+        self.active_kid = None
+        self._signing_key = None
+        self._signing_algorithm = algorithm
+        self._verify_keys = {}
+        self._file_stat = None
+        self._checked_at = 0.0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def read(keyring_file: str | Path) -> dict:
+        """Read a keyring file."""
+        with open(keyring_file, "r") as f:
+            keyring = json.load(f)
+        keyring.setdefault("keys", {})
+        return keyring
+
+    @staticmethod
+    def write(keyring_file: str | Path, keyring: dict) -> None:
+        """Write a keyring file readable by the owner only."""
+        temp_file = f"{keyring_file}.tmp"
+        fd = os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        if hasattr(os, "fchmod"):
+            # A temp file left by an interrupted write keeps its old mode.
+            os.fchmod(fd, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(keyring, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, keyring_file)
+
+    @staticmethod
+    def restrict_permissions(keyring_file: str | Path) -> None:
+        """Make a keyring file with private keys readable by the owner only."""
+        try:
+            if os.stat(keyring_file).st_mode & 0o077:
+                os.chmod(keyring_file, 0o600)
+        except OSError:
+            pass
+
+    def load(self) -> None:
+        """Parse every key once so lookups by kid need no decoding, creating the file if missing."""
+        serialization = import_serialization(self.algorithm)
+        if not os.path.exists(self.keyring_file) and not self.verify_only:
+            self.rotate()
+        keyring = self.read(self.keyring_file)
+        if any(key.get("private") for key in keyring["keys"].values()):
+            self.restrict_permissions(self.keyring_file)
+
+        verify_keys = {}
+        for kid, key in keyring["keys"].items():
+            verify_keys[kid] = (
+                key.get("alg", self.algorithm),
+                serialization.load_pem_public_key(key["public"].encode("utf-8")),
+            )
+
+        active_kid = keyring.get("active")
+        signing_key = None
+        signing_algorithm = self.algorithm
+        if not self.verify_only and active_kid in keyring["keys"]:
+            private = keyring["keys"][active_kid].get("private")
+            signing_algorithm = keyring["keys"][active_kid].get("alg", self.algorithm)
+            if private:
+                signing_key = serialization.load_pem_private_key(
+                    private.encode("utf-8"), password=None
+                )
+
+        with self._lock:
+            self._verify_keys = verify_keys
+            self.active_kid = active_kid if signing_key is not None else None
+            self._signing_key = signing_key
+            self._signing_algorithm = signing_algorithm
+            self._file_stat = self._get_file_stat()
+            self._loaded = True
+
+    def _get_file_stat(self) -> tuple | None:
+        try:
+            stat = os.stat(self.keyring_file)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _refresh(self) -> None:
+        """Reload the keyring if the file changed, checking at most every reload_interval."""
+        now = time.monotonic()
+        if self._loaded and now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+
+        if not self._loaded or self._get_file_stat() != self._file_stat:
+            self.load()
+
+    def rotate(self, retire_after_days: float = 0) -> str:
+        """Add a new active key, keeping older keys for verification."""
+        keyring = (
+            self.read(self.keyring_file)
+            if os.path.exists(self.keyring_file)
+            else {"keys": {}}
+        )
+
+        kid = uuid.uuid4().hex[:16]
+        keyring["keys"][kid] = generate_key(self.algorithm)
+        keyring["active"] = kid
+
+        if retire_after_days:
+            cutoff = time.time() - retire_after_days * 86400
+            keyring["keys"] = {
+                key_id: key
+                for key_id, key in keyring["keys"].items()
+                if key_id == kid or key.get("created", 0) >= cutoff
+            }
+
+        self.write(self.keyring_file, keyring)
+        return kid
+
+    @property
+    def can_sign(self) -> bool:
+        self._refresh()
+        return self._signing_key is not None
+
+    def get_signing_key(self) -> tuple[str, str, object]:
+        """Get the (kid, algorithm, key) used to sign new tokens."""
+        self._refresh()
+        if self._signing_key is None:
+            raise RuntimeError("This node has no signing key and can only verify tokens")
+        return self.active_kid, self._signing_algorithm, self._signing_key
+
+    def get_verify_key(self, kid: str) -> tuple[str, object] | None:
+        """Get the (algorithm, key) that verifies tokens with a kid."""
+        self._refresh()
+        return self._verify_keys.get(kid)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the JWT keyring.")
+    parser.add_argument("command", choices=("rotate", "export-public"))
+    parser.add_argument("--file", default="keyring.json", help="keyring file")
+    parser.add_argument("--algorithm", choices=ASYMMETRIC_ALGORITHMS, default="EdDSA")
+    parser.add_argument(
+        "--retire-after-days",
+        type=float,
+        default=0,
+        help="drop keys older than this when rotating (0 keeps every key)",
+    )
+    parser.add_argument("--output", help="verify-only keyring file to write")
+    args = parser.parse_args()
+
+    if args.command == "rotate":
+        keyring = Keyring(args.file, args.algorithm)
+        if os.path.exists(args.file):
+            keyring.rotate(args.retire_after_days)
+        keyring.load()
+        print(f"active key: {keyring.active_kid}")
+    else:
+        keyring = Keyring.read(args.file)
+        public = {
+            "active": keyring.get("active"),
+            "keys": {
+                kid: {key_name: value for key_name, value in key.items() if key_name != "private"}
+                for kid, key in keyring["keys"].items()
+            },
+        }
+        output = args.output or f"{args.file}.public"
+        Keyring.write(output, public)
+        print(f"wrote {len(public['keys'])} public keys to {output}")
@@ -0,0 +1,216 @@
+import os
+import json
+import threading
+from pathlib import Path
+from typing import Optional
+
+from .storage import iter_output_files
+
+SORT_KEYS = {"path": 0, "size": 1, "mtime": 2}
+
+
+class OutputIndex:
+    """
+    Per-user index of generated output files, persisted as JSON lines.
+    - New files are appended to the index file of their user.
+    - Index files are compacted when they are loaded with overwritten lines
+      and every compact_every appended lines, dropping deleted files.
+    """
+
+    def __init__(
+        self,
+        index_directory: str | Path,
+        output_directory: str | Path,
+        compact_every: int = 1000,
+    ):
+        self.index_directory = index_directory
+        self.output_directory = output_directory
+        self.compact_every = compact_every
+
+        self._records = {}
+        self._sorted = {}
+        self._appended = {}
+        self._lock = threading.Lock()
+
+    def create_directory(self) -> None:
+        """Create the index directory, from the server startup hook."""
+        os.makedirs(self.index_directory, exist_ok=True)
+
+    @staticmethod
+    def check_user_id(user_id: str) -> str:
+        """Get the folder name of a user id, rejecting ids that are not a single path component."""
+        user_id = user_id or "public"
+        if user_id in (".", "..") or os.path.basename(user_id) != user_id:
+            raise ValueError(f"Invalid user id: {user_id!r}")
+        return user_id
+
+    def get_index_file(self, user_id: str) -> str:
+        """Get the index file of a user."""
+        return os.path.join(self.index_directory, f"{self.check_user_id(user_id)}.jsonl")
+
+    def _load(self, user_id: str) -> dict:
+        """Load the records of a user, rebuilding the index file if it is missing."""
+        records = self._records.get(user_id)
+        if records is not None:
+            return records
+
+        index_file = self.get_index_file(user_id)
+        if not os.path.exists(index_file):
+            return self._rebuild(user_id)
+
+        records = {}
+        lines = 0
+        with open(index_file, "r", encoding="utf-8") as f:
+            for line in f:
+                lines += 1
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                # Later lines win over earlier lines for overwritten files.
+                records.pop(record[0], None)
+                records[record[0]] = record
+
+        if lines > len(records):
+            return self._compact(user_id, records)
+
+        self._records[user_id] = records
+        self._appended[user_id] = 0
+        return records
+
+    def _write(self, user_id: str, records: dict) -> dict:
+        """Replace the index file of a user with their records."""
+        index_file = self.get_index_file(user_id)
+        with open(f"{index_file}.tmp", "w", encoding="utf-8") as f:
+            for record in records.values():
+                f.write(json.dumps(record) + "\n")
+        os.replace(f"{index_file}.tmp", index_file)
+
+        self._records[user_id] = records
+        self._sorted.pop(user_id, None)
+        self._appended[user_id] = 0
+        return records
+
+    def _compact(self, user_id: str, records: dict) -> dict:
+        """Rewrite the index file of a user without overwritten lines and deleted files."""
+        return self._write(
+            user_id,
+            {
+                path: record
+                for path, record in records.items()
+                if os.path.exists(os.path.join(self.output_directory, path))
+            },
+        )
+
+    def _rebuild(self, user_id: str) -> dict:
+        """Walk a user's output folder and rewrite their index file."""
+        records = {}
+        user_directory = os.path.join(self.output_directory, self.check_user_id(user_id))
+        for root, _, files in os.walk(user_directory):
+            for filename in files:
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                relative_path = os.path.relpath(path, self.output_directory).replace(
+                    os.sep, "/"
+                )
+                records[relative_path] = [
+                    relative_path,
+                    stat.st_size,
+                    stat.st_mtime,
+                    None,
+                ]
+
+        return self._write(
+            user_id,
+            dict(sorted(records.items(), key=lambda item: item[1][SORT_KEYS["mtime"]])),
+        )
+
+    def rebuild(self, user_id: str) -> None:
+        """Rebuild the index of a user from their output folder."""
+        with self._lock:
+            self._rebuild(user_id)
+
+    def add_outputs(self, user_id: str, prompt_id: str, outputs: dict) -> None:
+        """Add the output files of a finished prompt to the user's index."""
+        new_records = []
+        for file_type, subfolder, filename in iter_output_files(outputs):
+            if file_type != "output":
+                continue
+
+            relative_path = f"{subfolder}/{filename}" if subfolder else filename
+            try:
+                stat = os.stat(os.path.join(self.output_directory, relative_path))
+            except OSError:
+                continue
+            new_records.append([relative_path, stat.st_size, stat.st_mtime, prompt_id])
+
+        if not new_records:
+            return
+
+        with self._lock:
+            records = self._load(user_id)
+            with open(self.get_index_file(user_id), "a", encoding="utf-8") as f:
+                for record in new_records:
+                    f.write(json.dumps(record) + "\n")
+                    records.pop(record[0], None)
+                    records[record[0]] = record
+            self._sorted.pop(user_id, None)
+
+            self._appended[user_id] = self._appended.get(user_id, 0) + len(new_records)
+            if self._appended[user_id] >= self.compact_every:
+                self._compact(user_id, records)
+
+    def forget_user(self, user_id: str) -> None:
+        """Drop the in-memory records of a user."""
+        with self._lock:
+            self._records.pop(user_id, None)
+            self._sorted.pop(user_id, None)
+            self._appended.pop(user_id, None)
+
+    def list_files(
+        self,
+        user_id: str,
+        sort: str = "mtime",
+        descending: bool = True,
+        offset: int = 0,
+        limit: Optional[int] = 100,
+    ) -> tuple[int, list[dict]]:
+        """Get the total number of files of a user and a sorted page of them."""
+        key = SORT_KEYS.get(sort, SORT_KEYS["mtime"])
+
+        with self._lock:
+            records = self._load(user_id)
+            total = len(records)
+
+            views = self._sorted.setdefault(user_id, {})
+            ordered = views.get(key)
+            if ordered is None:
+                if key == SORT_KEYS["mtime"]:
+                    # Records are kept in the order they were written.
+                    ordered = list(records.values())
+                else:
+                    ordered = sorted(records.values(), key=lambda record: record[key])
+                views[key] = ordered
+
+            end = total if limit is None else min(offset + limit, total)
+            if offset >= end:
+                page = []
+            elif descending:
+                page = ordered[total - end : total - offset][::-1]
+            else:
+                page = ordered[offset:end]
+
+        return total, [
+            {
+                "filename": os.path.basename(path),
+                "subfolder": os.path.dirname(path),
+                "type": "output",
+                "size": size,
+                "mtime": mtime,
+                "prompt_id": prompt_id,
+            }
+            for path, size, mtime, prompt_id in page
+        ]
@@ -0,0 +1,173 @@
+import math
+import time
+import logging
+import argparse
+import importlib.util
+
+SCHEMES = ("bcrypt", "argon2id")
+BCRYPT_DEFAULT_ROUNDS = 12
+BCRYPT_ROUNDS_RANGE = (10, 16)
+ARGON2_DEFAULT_TIME_COST = 3
+ARGON2_TIME_COST_RANGE = (1, 10)
+ARGON2_MEMORY_COST = 64 * 1024
+CALIBRATION_PASSWORD = "calibration-password-1!"
+
+
+class PasswordHasher:
+    """
+    Hash and verify passwords with bcrypt or argon2id.
+    - The work factor can be calibrated to a target verify time on this host.
+    - Hashes made with another scheme or work factor report needs_rehash.
+    """
+
+    def __init__(
+        self,
+        scheme: str = "bcrypt",
+        target_ms: float = 0,
+        work_factor: int | None = None,
+    ):
+        if scheme not in SCHEMES:
+            raise ValueError(f"Unknown password scheme: {scheme}. Valid schemes are: {SCHEMES}")
+
+        if scheme == "argon2id" and importlib.util.find_spec("argon2") is None:
+            logging.getLogger("Sentinel").warning(
+                "argon2-cffi is not installed, falling back to bcrypt password hashes"
+            )
+            scheme = "bcrypt"
+
+        self.scheme = scheme
+        self.target_ms = target_ms
+
+        if not work_factor and not target_ms:
+            work_factor = (
+                BCRYPT_DEFAULT_ROUNDS if scheme == "bcrypt" else ARGON2_DEFAULT_TIME_COST
+            )
+        self._work_factor = work_factor
+        self._argon2 = None
+
+    @property
+    def work_factor(self) -> int:
+        """Get the work factor, calibrating it on first use."""
+        self.ensure_calibrated()
+        return self._work_factor
+
+    def ensure_calibrated(self) -> None:
+        """Calibrate the work factor to target_ms unless it is already known."""
+        if not self._work_factor:
+            self._work_factor = self.calibrate(self.scheme, self.target_ms)
+
+    def _get_argon2(self):
+        """Get the argon2id hasher, or None if argon2-cffi is not installed."""
+        if self._argon2 is None:
+            try:
+                import argon2
+            except ImportError:
+                return None
+
+            time_cost = (
+                self.work_factor
+                if self.scheme == "argon2id"
+                else ARGON2_DEFAULT_TIME_COST
+            )
+            self._argon2 = argon2.PasswordHasher(
+                time_cost=time_cost, memory_cost=ARGON2_MEMORY_COST, type=argon2.Type.ID
+            )
+        return self._argon2
+
+    @staticmethod
+    def calibrate(scheme: str, target_ms: float) -> int:
+        """Find the work factor whose hash time is closest to target_ms."""
+        if scheme == "bcrypt":
+            import bcrypt
+
+            # Each round doubles the cost, so time a cheap cost and extrapolate.
+            rounds = 8
+            started_at = time.perf_counter()
+            bcrypt.hashpw(CALIBRATION_PASSWORD.encode("utf-8"), bcrypt.gensalt(rounds))
+            elapsed_ms = max((time.perf_counter() - started_at) * 1000, 0.01)
+            rounds += round(math.log2(target_ms / elapsed_ms))
+            low, high = BCRYPT_ROUNDS_RANGE
+        else:
+            import argon2
+
+            # Argon2 time cost scales linearly with the number of passes.
+            hasher = argon2.PasswordHasher(
+                time_cost=1, memory_cost=ARGON2_MEMORY_COST, type=argon2.Type.ID
+            )
+            started_at = time.perf_counter()
+            hasher.hash(CALIBRATION_PASSWORD)
+            elapsed_ms = max((time.perf_counter() - started_at) * 1000, 0.01)
+            rounds = round(target_ms / elapsed_ms)
+            low, high = ARGON2_TIME_COST_RANGE
+
+        return min(max(rounds, low), high)
+
+    @staticmethod
+    def get_scheme(hashed: str) -> str | None:
+        """Get the scheme of a stored hash."""
+        if hashed.startswith(("$2a$", "$2b$", "$2y$")):
+            return "bcrypt"
+        if hashed.startswith("$argon2id$"):
+            return "argon2id"
+        return None
+
+    def hash(self, password: str) -> str:
+        """Hash a password with the configured scheme and work factor."""
+        if self.scheme == "argon2id":
+            return self._get_argon2().hash(password)
+
+        import bcrypt
+
+        return bcrypt.hashpw(
+            password.encode("utf-8"), bcrypt.gensalt(self.work_factor)
+        ).decode("utf-8")
+
+    def verify(self, password: str, hashed: str) -> bool:
+        """Check a password against a stored hash of any supported scheme."""
+        scheme = self.get_scheme(hashed)
+        if scheme == "bcrypt":
+            import bcrypt
+
+            return bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+
+        hasher = self._get_argon2() if scheme == "argon2id" else None
+        if hasher is not None:
+            from argon2.exceptions import InvalidHashError, VerificationError
+
+            try:
+                return hasher.verify(hashed, password)
+            except (VerificationError, InvalidHashError):
+                return False
+
+        return False
+
+    def needs_rehash(self, hashed: str) -> bool:
+        """Check if a stored hash uses another scheme or work factor."""
+        scheme = self.get_scheme(hashed)
+        if scheme != self.scheme:
+            return True
+
+        if scheme == "bcrypt":
+            try:
+                return int(hashed.split("$")[2]) != self.work_factor
+            except (IndexError, ValueError):
+                return True
+
+        return self._get_argon2().check_needs_rehash(hashed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Find the password work factor for a target hash time on this host."
+    )
+    parser.add_argument("--scheme", choices=SCHEMES, default="bcrypt")
+    parser.add_argument("--target-ms", type=float, default=250)
+    args = parser.parse_args()
+
+    hasher = PasswordHasher(args.scheme, args.target_ms)
+    started_at = time.perf_counter()
+    hasher.verify(CALIBRATION_PASSWORD, hasher.hash(CALIBRATION_PASSWORD))
+    elapsed_ms = (time.perf_counter() - started_at) * 1000 / 2
+
+    print(f"scheme: {hasher.scheme} | work factor: {hasher.work_factor} | ~{elapsed_ms:.0f} ms per hash")
+    print(f'config.json: "password_scheme": "{hasher.scheme}", "password_work_factor": {hasher.work_factor}')
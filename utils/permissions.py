@@ -0,0 +1,97 @@
+import time
+from aiohttp import web
+
+from .users_db import UsersDB
+
+PERMISSIONS = (
+    "submit_prompts",
+    "view_all_folders",
+    "manage_nodes",
+    "manage_storage",
+    "manage_users",
+)
+
+DEFAULT_ROLES = {
+    "admin": PERMISSIONS,
+    "user": ("submit_prompts",),
+    "viewer": (),
+}
+
+
+class Permissions:
+    """Role based permission table compiled from the user database."""
+
+    def __init__(
+        self,
+        users_db: UsersDB,
+        roles: dict = None,
+        default_role: str = "user",
+        refresh_interval: float = 1.0,
+    ):
+        self.users_db = users_db
+        self.roles = {
+            role: frozenset(permissions)
+            for role, permissions in {**DEFAULT_ROLES, **(roles or {})}.items()
+        }
+        self.default_role = default_role
+        self.refresh_interval = refresh_interval
+
+        self._table = {}
+        self._version = None
+        self._checked_at = 0.0
+
+    def get_role(self, user_data: dict) -> str:
+        """Get the role of a user, the first admin keeps the admin role."""
+        if user_data.get("admin"):
+            return "admin"
+        return user_data.get("role") or self.default_role
+
+    def refresh(self, force: bool = False) -> None:
+        """Rebuild the permission table if the user database changed."""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.refresh_interval:
+            return
+        self._checked_at = now
+
+        users = self.users_db.load_users()
+        if not force and self.users_db.version == self._version:
+            return
+
+        self._table = {
+            user_id: self.roles.get(self.get_role(user_data), frozenset())
+            for user_id, user_data in users.items()
+            if not user_data.get("disabled")
+        }
+        self._version = self.users_db.version
+
+    def get_permissions(self, user_id: str) -> frozenset:
+        """Get the permissions of a user."""
+        if self.users_db.version != self._version:
+            self.refresh(force=True)
+        else:
+            self.refresh()
+
+        return self._table.get(user_id, frozenset())
+
+    def has_permission(self, user_id: str, permission: str) -> bool:
+        """Check if a user has a permission."""
+        return permission in self.get_permissions(user_id)
+
+    def create_permission_middleware(self, rules: dict) -> web.middleware:
+        """
+        Create middleware that requires a permission for some routes.
+        - rules: (method, path) -> permission
+        """
+
+        @web.middleware
+        async def permission_middleware(request: web.Request, handler) -> web.Response:
+            """Middleware to check route permissions."""
+            permission = rules.get((request.method, request.path))
+            if permission is None or self.has_permission(
+                request.get("user_id"), permission
+            ):
+                return await handler(request)
+
+            return web.HTTPForbidden(reason="You do not have permission to do this.")
+
+        return permission_middleware
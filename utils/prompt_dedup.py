@@ -0,0 +1,105 @@
+import json
+import time
+import hashlib
+import threading
+
+from execution import MAXIMUM_HISTORY_SIZE
+
+
+class PromptDedup:
+    """
+    Detect repeated submissions of the same prompt graph by the same user.
+    - The graph is hashed without client data, node titles or the user prefix.
+    - A duplicate within the window becomes an alias of the pending or running prompt.
+    """
+
+    def __init__(
+        self,
+        window_seconds: float,
+        output_path_inputs: tuple = ("filename_prefix",),
+        max_aliases: int = MAXIMUM_HISTORY_SIZE,
+    ):
+        self.window_seconds = window_seconds
+        self.output_path_inputs = output_path_inputs
+        self.max_aliases = max_aliases
+
+        self.deduplicated = 0
+
+        self._active = {}
+        self._keys = {}
+        self._aliases = {}
+        self._lock = threading.Lock()
+
+    def canonical_hash(self, item: tuple, user_prefix: str) -> str:
+        """Hash the graph and outputs of a queue item, ignoring what differs per submission."""
+        prompt = item[2] if isinstance(item[2], dict) else {}
+
+        nodes = {}
+        for node_id, node in prompt.items():
+            if not isinstance(node, dict):
+                continue
+            inputs = dict(node.get("inputs") or {})
+            for key in self.output_path_inputs:
+                value = inputs.get(key)
+                if isinstance(value, str) and value.startswith(user_prefix):
+                    inputs[key] = value[len(user_prefix) :]
+            nodes[str(node_id)] = {"class_type": node.get("class_type"), "inputs": inputs}
+
+        outputs = sorted(str(output) for output in item[4]) if len(item) > 4 else []
+        data = json.dumps(
+            {"prompt": nodes, "outputs": outputs},
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str,
+        )
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def match(self, user_id: str, digest: str) -> str | None:
+        """Get the active prompt with the same hash submitted within the window."""
+        with self._lock:
+            active = self._active.get((user_id, digest))
+            if active is None:
+                return None
+
+            prompt_id, submitted_at = active
+            if time.monotonic() - submitted_at > self.window_seconds:
+                return None
+            return prompt_id
+
+    def remember(self, user_id: str, digest: str, prompt_id: str) -> None:
+        """Record a prompt that was queued."""
+        with self._lock:
+            key = (user_id, digest)
+            previous = self._active.get(key)
+            if previous is not None:
+                self._keys.pop(previous[0], None)
+            self._active[key] = (prompt_id, time.monotonic())
+            self._keys[prompt_id] = key
+
+    def add_alias(self, alias_id: str, prompt_id: str) -> None:
+        """Attach a duplicate submission to the prompt that will produce its result."""
+        with self._lock:
+            self._aliases[alias_id] = prompt_id
+            self.deduplicated += 1
+            while len(self._aliases) > self.max_aliases:
+                self._aliases.pop(next(iter(self._aliases)))
+
+    def resolve(self, prompt_id: str) -> str:
+        """Get the prompt that runs for a prompt id, which is itself unless it is an alias."""
+        return self._aliases.get(prompt_id, prompt_id)
+
+    def forget(self, prompt_id: str) -> None:
+        """Stop matching a prompt that finished or was removed from the queue."""
+        with self._lock:
+            key = self._keys.pop(prompt_id, None)
+            if key is not None:
+                self._active.pop(key, None)
+
+    def report(self) -> dict:
+        with self._lock:
+            return {
+                "window_seconds": self.window_seconds,
+                "deduplicated": self.deduplicated,
+                "active": len(self._active),
+                "aliases": len(self._aliases),
+            }
@@ -0,0 +1,153 @@
+import os
+import json
+import queue
+import atexit
+import threading
+from pathlib import Path
+from typing import Optional
+
+
+class QueueJournal:
+    """Write-ahead journal of the pending prompt queue."""
+
+    def __init__(self, journal_file: str | Path, compact_every: int = 1000):
+        self.journal_file = journal_file
+        self.compact_every = compact_every
+
+        self._events = queue.Queue()
+        self._live = {}
+        self._written = 0
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _apply(live: dict, event: dict) -> None:
+        """Apply a journal event to a prompt id -> put event mapping."""
+        op = event.get("op")
+        prompt_id = event.get("prompt_id")
+
+        if op == "put":
+            live[prompt_id] = event
+        elif op == "get" and prompt_id in live:
+            live[prompt_id]["running"] = True
+        elif op in ("done", "remove"):
+            live.pop(prompt_id, None)
+
+    def replay(self) -> list[tuple[tuple, str]]:
+        """
+        Read the journal and return the (item, user_id) pairs of unfinished prompts.
+        - Prompts that were running when the server stopped are returned as pending.
+        - Items are ordered by their queue priority.
+        - A torn last line from an interrupted write is ignored.
+        """
+        live = {}
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self._apply(live, json.loads(line))
+                    except (json.JSONDecodeError, AttributeError):
+                        break
+
+        self._live = live
+        self._compact()
+
+        out = []
+        for event in sorted(live.values(), key=lambda event: event["item"][0]):
+            item = list(event["item"])
+            if event.get("sensitive"):
+                # Sensitive data is never written to disk.
+                item.append({})
+            out.append((tuple(item), event["user_id"]))
+
+        return out
+
+    def start(self) -> None:
+        """Start the background journal writer."""
+        if self._thread is not None:
+            return
+
+        self._thread = threading.Thread(
+            target=self._run, name="sentinel-queue-journal", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    def close(self) -> None:
+        """Flush pending events and stop the background journal writer."""
+        if self._thread is None:
+            return
+
+        self._events.put(None)
+        self._thread.join(timeout=10)
+        self._thread = None
+
+    def record_put(self, item: tuple, user_id: str) -> None:
+        """Record a prompt put in the queue."""
+        self._events.put(
+            {
+                "op": "put",
+                "prompt_id": item[1],
+                "user_id": user_id,
+                "item": item[:5],
+                "sensitive": len(item) > 5,
+            }
+        )
+
+    def record_get(self, prompt_id: str) -> None:
+        """Record a prompt taken from the queue for execution."""
+        self._events.put({"op": "get", "prompt_id": prompt_id})
+
+    def record_done(self, prompt_id: str) -> None:
+        """Record a finished prompt."""
+        self._events.put({"op": "done", "prompt_id": prompt_id})
+
+    def record_remove(self, prompt_id: str) -> None:
+        """Record a prompt removed from the queue before running."""
+        self._events.put({"op": "remove", "prompt_id": prompt_id})
+
+    def _compact(self) -> None:
+        """Rewrite the journal with only the unfinished prompts."""
+        temp_file = f"{self.journal_file}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            for event in self._live.values():
+                f.write(json.dumps(event, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(temp_file, self.journal_file)
+        self._written = 0
+
+    def _run(self) -> None:
+        """Write journal events in batches with a single fsync per batch."""
+        f = open(self.journal_file, "a", encoding="utf-8")
+        try:
+            while True:
+                batch = [self._events.get()]
+                while True:
+                    try:
+                        batch.append(self._events.get_nowait())
+                    except queue.Empty:
+                        break
+
+                lines = []
+                for event in batch:
+                    if event is None:
+                        continue
+                    lines.append(json.dumps(event, default=str))
+                    self._apply(self._live, event)
+
+                if lines:
+                    f.write("\n".join(lines) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                    self._written += len(lines)
+
+                if self._written >= self.compact_every:
+                    f.close()
+                    self._compact()
+                    f = open(self.journal_file, "a", encoding="utf-8")
+
+                if None in batch:
+                    return
+        finally:
+            f.close()
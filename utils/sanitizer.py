@@ -2,7 +2,18 @@ import re
 import unicodedata
 import html
 from aiohttp import web
-from bleach import clean
+
+_clean = None
+
+
+def import_bleach():
+    """Import bleach's clean once, from the server startup hook or on first use, and return it."""
+    global _clean
+    if _clean is None:
+        from bleach import clean
+
+        _clean = clean
+    return _clean
 
 
 class Sanitizer:
@@ -16,6 +27,8 @@ class Sanitizer:
             value = value.replace("\r", "").replace("\n", "")
             value = re.sub(r"([;'\-()<>`=])", r"\\\1", value)
             value = re.sub(r"[;&|`]", "", value)
+
+            clean = _clean or import_bleach()
             value = clean(value, tags=[], attributes=[], protocols=[])
 
             xss_patterns = [
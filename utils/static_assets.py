@@ -0,0 +1,210 @@
+import os
+import gzip
+import hashlib
+import mimetypes
+import threading
+from aiohttp import web
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+
+class Asset:
+    """In-memory file with its ETag and precompressed variants."""
+
+    __slots__ = ("body", "content_type", "etag", "digest", "mtime", "encodings")
+
+    def __init__(self, body: bytes, content_type: str, mtime: float = 0.0):
+        self.body = body
+        self.content_type = content_type
+        self.digest = hashlib.sha256(body).hexdigest()
+        self.etag = f'"{self.digest[:32]}"'
+        self.mtime = mtime
+        self.encodings = {}
+
+        if content_type.startswith(COMPRESSIBLE_TYPES):
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) < len(body):
+                self.encodings["gzip"] = compressed
+
+            if brotli is not None:
+                compressed = brotli.compress(body)
+                if len(compressed) < len(body):
+                    self.encodings["br"] = compressed
+
+    def response(self, request: web.Request, cache_control: str) -> web.Response:
+        """Build a response, answering conditional requests with 304."""
+        headers = {
+            "ETag": self.etag,
+            "Cache-Control": cache_control,
+            "Vary": "Accept-Encoding",
+        }
+
+        if self.etag in request.headers.get("If-None-Match", ""):
+            return web.Response(status=304, headers=headers)
+
+        body = self.body
+        accept_encoding = request.headers.get("Accept-Encoding", "")
+        for encoding in ("br", "gzip"):
+            if encoding in self.encodings and encoding in accept_encoding:
+                body = self.encodings[encoding]
+                headers["Content-Encoding"] = encoding
+                break
+
+        return web.Response(body=body, content_type=self.content_type, headers=headers)
+
+
+class StaticAssets:
+    """
+    Serve the Sentinel pages and static files from memory.
+    - Files are loaded and compressed once, at server startup or on first use.
+    - Static files get content-hashed URLs that can be cached forever.
+    - With reload on, files are reloaded when their mtime changes.
+    """
+
+    def __init__(
+        self,
+        web_directory: str,
+        static_directories: tuple = ("css", "js", "assets"),
+        prefix: str = "/sentinel",
+        reload: bool = False,
+    ):
+        self.web_directory = web_directory
+        self.static_directories = static_directories
+        self.prefix = prefix
+        self.reload = reload
+
+        self._assets = {}
+        self._hashed_paths = {}
+        self._urls = {}
+        self._templates = {}
+        self._rendered = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_hashed_path(path: str, digest: str) -> str:
+        """Insert a content hash before the file extension."""
+        root, ext = os.path.splitext(path)
+        return f"{root}.{digest[:12]}{ext}"
+
+    def _read(self, path: str) -> Asset:
+        full_path = os.path.join(self.web_directory, path)
+        with open(full_path, "rb") as f:
+            body = f.read()
+
+        content_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+        return Asset(body, content_type, os.path.getmtime(full_path))
+
+    def load(self) -> None:
+        """Load every static file and template into memory."""
+        assets = {}
+        for directory in self.static_directories:
+            base = os.path.join(self.web_directory, directory)
+            for root, _, files in os.walk(base):
+                for filename in files:
+                    path = os.path.relpath(os.path.join(root, filename), self.web_directory)
+                    path = path.replace(os.sep, "/")
+                    assets[path] = self._read(path)
+
+        hashed_paths = {}
+        urls = {}
+        for path, asset in assets.items():
+            hashed_path = self.get_hashed_path(path, asset.digest)
+            hashed_paths[hashed_path] = path
+            urls[f"{self.prefix}/{path}"] = f"{self.prefix}/{hashed_path}"
+
+        templates = {}
+        for filename in os.listdir(self.web_directory):
+            if filename.endswith(".html"):
+                full_path = os.path.join(self.web_directory, filename)
+                with open(full_path, "r", encoding="utf-8") as f:
+                    templates[filename] = (f.read(), os.path.getmtime(full_path))
+
+        with self._lock:
+            self._assets = assets
+            self._hashed_paths = hashed_paths
+            self._urls = urls
+            self._templates = templates
+            self._rendered = {}
+            self._loaded = True
+
+    def _ensure_loaded(self) -> None:
+        """Load the files on first use, or reload them if one changed on disk."""
+        if not self._loaded:
+            self.load()
+        elif self.reload:
+            self._check_reload()
+
+    def _check_reload(self) -> None:
+        """Reload everything if a file changed on disk."""
+        for path, asset in list(self._assets.items()):
+            try:
+                if os.path.getmtime(os.path.join(self.web_directory, path)) != asset.mtime:
+                    return self.load()
+            except OSError:
+                return self.load()
+
+        for filename, (_, mtime) in list(self._templates.items()):
+            try:
+                if os.path.getmtime(os.path.join(self.web_directory, filename)) != mtime:
+                    return self.load()
+            except OSError:
+                return self.load()
+
+    def url_for(self, path: str) -> str:
+        """Get the content-hashed URL of a static file."""
+        self._ensure_loaded()
+        return self._urls.get(path, path)
+
+    def render(self, name: str, replacements: dict = None) -> Asset:
+        """Render a template with hashed asset URLs and the given replacements."""
+        self._ensure_loaded()
+
+        key = (name, tuple(sorted((replacements or {}).items())))
+        asset = self._rendered.get(key)
+        if asset is not None:
+            return asset
+
+        html = self._templates[name][0]
+        for url, hashed_url in self._urls.items():
+            html = html.replace(f'"{url}"', f'"{hashed_url}"')
+        for placeholder, value in (replacements or {}).items():
+            html = html.replace(placeholder, value)
+
+        asset = Asset(html.encode("utf-8"), "text/html")
+        self._rendered[key] = asset
+        return asset
+
+    def template_response(
+        self, request: web.Request, name: str, replacements: dict = None
+    ) -> web.Response:
+        """Respond with a rendered template."""
+        return self.render(name, replacements).response(
+            request, REVALIDATE_CACHE_CONTROL
+        )
+
+    async def handle_static(self, request: web.Request) -> web.Response:
+        """Serve a static file by its hashed or plain path."""
+        self._ensure_loaded()
+
+        path = request.match_info["path"]
+        plain_path = self._hashed_paths.get(path)
+        if plain_path is not None:
+            return self._assets[plain_path].response(request, IMMUTABLE_CACHE_CONTROL)
+
+        asset = self._assets.get(path)
+        if asset is None or path.split("/", 1)[0] not in self.static_directories:
+            raise web.HTTPNotFound()
+
+        return asset.response(request, REVALIDATE_CACHE_CONTROL)
+
+    def get_routes(self) -> list:
+        """Get the route serving the static files."""
+        return [web.get(f"{self.prefix}/{{path:.+}}", self.handle_static)]
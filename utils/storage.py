@@ -0,0 +1,235 @@
+import os
+import json
+import time
+import threading
+from aiohttp import web
+from typing import Iterator
+
+UPLOAD_ROUTES = ("/upload/image", "/upload/mask", "/api/upload/image", "/api/upload/mask")
+PROMPT_ROUTES = ("/prompt", "/api/prompt")
+QUOTA_KINDS = ("input", "output")
+
+
+def iter_output_files(outputs: dict) -> Iterator[tuple[str, str, str]]:
+    """Iterate over the (type, subfolder, filename) of files in history outputs."""
+    for node_output in (outputs or {}).values():
+        if not isinstance(node_output, dict):
+            continue
+
+        for items in node_output.values():
+            if not isinstance(items, list):
+                continue
+
+            for item in items:
+                if (
+                    isinstance(item, dict)
+                    and item.get("filename")
+                    and item.get("type") in ("output", "temp")
+                ):
+                    yield item["type"], item.get("subfolder", ""), item["filename"]
+
+
+def get_directory_size(directory: str) -> int:
+    """Get the total size of the files under a directory."""
+    total = 0
+    stack = [directory]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            total += entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return total
+
+
+class StorageUsage:
+    """Incremental per-user storage usage of the input, output and temp folders."""
+
+    def __init__(self, directories: dict, quota_bytes: int = 0):
+        self.directories = directories
+        self.quota_bytes = quota_bytes
+
+        self._usage = {}
+        self._scanned = set()
+        self._scan_complete = False
+        self._lock = threading.Lock()
+        self._scan_thread = None
+
+    @property
+    def scan_complete(self) -> bool:
+        return self._scan_complete
+
+    def start(self) -> None:
+        """Seed the usage index with a background scan of the user folders."""
+        if self._scan_thread is not None:
+            return
+
+        self._scan_thread = threading.Thread(
+            target=self.scan, name="sentinel-storage-scan", daemon=True
+        )
+        self._scan_thread.start()
+
+    def scan(self) -> None:
+        """Walk every user folder once and record its size."""
+        for kind, base_directory in self.directories.items():
+            try:
+                with os.scandir(base_directory) as entries:
+                    user_ids = [
+                        entry.name
+                        for entry in entries
+                        if entry.is_dir() and not entry.name.startswith(".")
+                    ]
+            except OSError:
+                continue
+
+            for user_id in user_ids:
+                size = get_directory_size(os.path.join(base_directory, user_id))
+                with self._lock:
+                    self._usage.setdefault(user_id, {})[kind] = size
+                    self._scanned.add((user_id, kind))
+
+        self._scan_complete = True
+
+    def get_user_path(self, user_id: str, kind: str, *parts: str) -> str:
+        """Get a path inside a user folder."""
+        return os.path.join(self.directories[kind], user_id or "public", *parts)
+
+    def get_file_path(
+        self, user_id: str, kind: str, subfolder: str, filename: str
+    ) -> str:
+        """Get the path of a file as referenced by ComfyUI."""
+        if kind == "output":
+            # Output subfolders already start with the user folder.
+            return os.path.join(self.directories[kind], subfolder, filename)
+
+        return self.get_user_path(user_id, kind, subfolder, filename)
+
+    def add(self, user_id: str, kind: str, delta: int) -> None:
+        """Add a size delta to a user folder."""
+        user_id = user_id or "public"
+        with self._lock:
+            # Folders not scanned yet will pick the change up from the scan.
+            if not self._scan_complete and (user_id, kind) not in self._scanned:
+                return
+
+            usage = self._usage.setdefault(user_id, {})
+            usage[kind] = max(usage.get(kind, 0) + delta, 0)
+
+    def add_outputs(self, user_id: str, outputs: dict) -> None:
+        """Account for the files written by a finished prompt."""
+        for file_type, subfolder, filename in iter_output_files(outputs):
+            path = self.get_file_path(user_id, file_type, subfolder, filename)
+            try:
+                self.add(user_id, file_type, os.path.getsize(path))
+            except OSError:
+                continue
+
+    def get(self, user_id: str) -> dict:
+        """Get the usage of a user by folder kind."""
+        with self._lock:
+            usage = dict(self._usage.get(user_id or "public", {}))
+
+        return {kind: usage.get(kind, 0) for kind in self.directories}
+
+    def report(self) -> dict:
+        """Get the usage of every user."""
+        with self._lock:
+            user_ids = list(self._usage)
+
+        return {user_id: self.get(user_id) for user_id in user_ids}
+
+    def is_over_quota(self, user_id: str, extra_bytes: int = 0) -> bool:
+        """Check if a user's input and output usage exceeds the quota."""
+        if not self.quota_bytes:
+            return False
+
+        usage = self.get(user_id)
+        return sum(usage[kind] for kind in QUOTA_KINDS) + extra_bytes > self.quota_bytes
+
+    def create_storage_middleware(self) -> web.middleware:
+        """Create middleware for storage accounting and quota enforcement."""
+
+        @web.middleware
+        async def storage_middleware(request: web.Request, handler) -> web.Response:
+            """Middleware to track uploads and enforce storage quotas."""
+            if request.method != "POST":
+                return await handler(request)
+
+            user_id = request.get("user_id")
+
+            if request.path in PROMPT_ROUTES:
+                if self.is_over_quota(user_id):
+                    message = "Storage quota exceeded. Delete some files before queueing new prompts."
+                    return web.json_response(
+                        {
+                            "error": {
+                                "type": "storage_quota_exceeded",
+                                "message": message,
+                                "details": "",
+                                "extra_info": {},
+                            },
+                            "node_errors": {},
+                        },
+                        status=403,
+                    )
+                return await handler(request)
+
+            if request.path not in UPLOAD_ROUTES:
+                return await handler(request)
+
+            if self.is_over_quota(user_id, request.content_length or 0):
+                return web.json_response(
+                    {"error": "Storage quota exceeded"}, status=413
+                )
+
+            post = await request.post()
+            image = post.get("image")
+            kind = post.get("type", "input")
+            previous_size = 0
+            if (
+                kind in self.directories
+                and getattr(image, "filename", None)
+                and str(post.get("overwrite", "")).lower() in ("true", "1")
+            ):
+                try:
+                    previous_size = os.path.getsize(
+                        self.get_file_path(
+                            user_id, kind, post.get("subfolder", ""), image.filename
+                        )
+                    )
+                except OSError:
+                    pass
+
+            started_at = time.time()
+            response = await handler(request)
+
+            if response.status == 200 and getattr(response, "body", None):
+                try:
+                    result = json.loads(response.body)
+                    path = self.get_file_path(
+                        user_id,
+                        result.get("type", "input"),
+                        result.get("subfolder", ""),
+                        result["name"],
+                    )
+                    stat = os.stat(path)
+                    # Duplicate uploads are not rewritten by ComfyUI.
+                    if stat.st_mtime >= started_at - 1:
+                        self.add(
+                            user_id,
+                            result.get("type", "input"),
+                            stat.st_size - previous_size,
+                        )
+                except (ValueError, KeyError, TypeError, OSError):
+                    pass
+
+            return response
+
+        return storage_middleware
@@ -0,0 +1,219 @@
+import os
+import time
+import threading
+from typing import Optional
+
+from .logger import Logger
+from .storage import StorageUsage
+from .blob_store import BlobStore
+from .access_control import AccessControl
+
+# Suffixes ComfyUI appends to file inputs that name their folder type.
+FILE_ANNOTATIONS = (" [input]", " [output]", " [temp]")
+
+
+class StorageGC:
+    """Background size and age based cleanup of the per-user input and temp folders."""
+
+    def __init__(
+        self,
+        directories: dict,
+        logger: Logger,
+        max_user_bytes: int = 0,
+        max_age_hours: float = 0,
+        interval_minutes: float = 0,
+        max_files_per_second: float = 200,
+        dry_run: bool = False,
+        storage_usage: Optional[StorageUsage] = None,
+        blob_store: Optional[BlobStore] = None,
+        access_control: Optional[AccessControl] = None,
+    ):
+        self.directories = directories
+        self.logger = logger
+        self.max_user_bytes = max_user_bytes
+        self.max_age_hours = max_age_hours
+        self.interval_minutes = interval_minutes
+        self.max_files_per_second = max_files_per_second
+        self.dry_run = dry_run
+        self.storage_usage = storage_usage
+        self.blob_store = blob_store
+        self.access_control = access_control
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._run_lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start the periodic background cleanup."""
+        if self._thread is not None or not self.interval_minutes:
+            return
+
+        self._thread = threading.Thread(
+            target=self._run, name="sentinel-storage-gc", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the periodic background cleanup."""
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_minutes * 60):
+            try:
+                report = self.collect()
+                self.logger.info(
+                    f"Storage GC {'would remove' if report['dry_run'] else 'removed'} "
+                    f"{report['files']} files ({report['bytes']} bytes)"
+                )
+            except Exception as e:
+                self.logger.error(f"Storage GC failed: {e}")
+
+    def _throttle(self, started_at: float, operations: int) -> None:
+        """Sleep to keep file operations under max_files_per_second."""
+        if not self.max_files_per_second:
+            return
+
+        delay = operations / self.max_files_per_second - (time.monotonic() - started_at)
+        if delay > 0:
+            self._stop.wait(delay)
+
+    def _scan_user_directory(
+        self, directory: str, started_at: float, operations: int
+    ) -> tuple[list, int]:
+        """List (last_used, size, path) of the files in a user folder."""
+        files = []
+        stack = [directory]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            elif entry.is_file(follow_symlinks=False):
+                                stat = entry.stat(follow_symlinks=False)
+                                files.append(
+                                    (
+                                        max(stat.st_atime, stat.st_mtime),
+                                        stat.st_size,
+                                        entry.path,
+                                    )
+                                )
+                        except OSError:
+                            continue
+
+                        operations += 1
+                        self._throttle(started_at, operations)
+            except OSError:
+                continue
+
+        return files, operations
+
+    def _get_protected_paths(self, user_directory: str, user_id: str) -> set:
+        """Get the paths in a user folder named by inputs of running or pending prompts."""
+        if self.access_control is None:
+            return set()
+
+        paths = set()
+        for prompt_user_id, prompt in self.access_control.get_active_prompts():
+            if prompt_user_id != user_id:
+                continue
+
+            for node in prompt.values():
+                inputs = node.get("inputs") if isinstance(node, dict) else None
+                for value in (inputs or {}).values():
+                    if not isinstance(value, str) or not value:
+                        continue
+                    for annotation in FILE_ANNOTATIONS:
+                        if value.endswith(annotation):
+                            value = value[: -len(annotation)]
+                            break
+                    paths.add(os.path.normpath(os.path.join(user_directory, value)))
+
+        return paths
+
+    def collect(self, dry_run: Optional[bool] = None) -> dict:
+        """
+        Evict files from every user folder and return a report.
+        - Files not used for max_age_hours are evicted first.
+        - Then the least recently used files are evicted until the folder
+          fits in max_user_bytes.
+        - Files named by inputs of running or pending prompts are kept.
+        - In dry run mode nothing is deleted.
+        """
+        dry_run = self.dry_run if dry_run is None else dry_run
+        report = {"dry_run": dry_run, "files": 0, "bytes": 0, "users": {}}
+
+        if not self.max_user_bytes and not self.max_age_hours:
+            return report
+
+        with self._run_lock:
+            started_at = time.monotonic()
+            operations = 0
+            cutoff = time.time() - self.max_age_hours * 3600
+
+            for kind, base_directory in self.directories.items():
+                try:
+                    with os.scandir(base_directory) as entries:
+                        user_ids = [
+                            entry.name
+                            for entry in entries
+                            if entry.is_dir() and not entry.name.startswith(".")
+                        ]
+                except OSError:
+                    continue
+
+                for user_id in user_ids:
+                    user_directory = os.path.join(base_directory, user_id)
+                    files, operations = self._scan_user_directory(
+                        user_directory, started_at, operations
+                    )
+                    files.sort()
+
+                    # Read after the throttled scan, so prompts queued meanwhile count.
+                    protected = self._get_protected_paths(user_directory, user_id)
+
+                    remaining = sum(size for _, size, _ in files)
+                    evicted = []
+                    for last_used, size, path in files:
+                        if not (self.max_age_hours and last_used < cutoff) and not (
+                            self.max_user_bytes and remaining > self.max_user_bytes
+                        ):
+                            break
+                        if os.path.normpath(path) in protected:
+                            continue
+                        evicted.append((size, path))
+                        remaining -= size
+
+                    removed_files = 0
+                    removed_bytes = 0
+                    for size, path in evicted:
+                        if not dry_run:
+                            try:
+                                os.remove(path)
+                            except OSError:
+                                remaining += size
+                                continue
+                            operations += 1
+                            self._throttle(started_at, operations)
+                        removed_files += 1
+                        removed_bytes += size
+
+                    if not removed_files:
+                        continue
+
+                    if not dry_run and self.storage_usage is not None:
+                        self.storage_usage.add(user_id, kind, -removed_bytes)
+
+                    report["users"].setdefault(user_id, {})[kind] = {
+                        "files": removed_files,
+                        "bytes": removed_bytes,
+                        "remaining_bytes": remaining,
+                    }
+                    report["files"] += removed_files
+                    report["bytes"] += removed_bytes
+
+            if not dry_run and self.blob_store is not None:
+                self.blob_store.prune()
+
+        return report
@@ -0,0 +1,256 @@
+import os
+import csv
+import io
+import json
+import uuid
+import bisect
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from .users_db import UsersDB
+from .permissions import Permissions
+from .sanitizer import Sanitizer
+from .validate import validate_username, validate_password
+
+
+class UserAdmin:
+    """
+    Admin operations on the user database.
+    - Users are listed from a sorted username index and a role index.
+    - Every change is applied to the database in a single write.
+    """
+
+    def __init__(
+        self,
+        users_db: UsersDB,
+        permissions: Permissions,
+        hash_workers: Optional[int] = None,
+    ):
+        self.users_db = users_db
+        self.permissions = permissions
+        self.hash_workers = hash_workers or min(32, os.cpu_count() or 1)
+
+        self._names = []
+        self._roles = {}
+        self._version = None
+        self._on_change_handlers = []
+
+    def add_on_change_handler(self, handler) -> None:
+        """
+        Call handler(event, users) after users are created, renamed or deleted.
+        - users maps the changed user ids to their data, so an import is one event.
+        """
+        self._on_change_handlers.append(handler)
+
+    def _notify(self, event: str, users: dict) -> None:
+        for handler in self._on_change_handlers:
+            try:
+                handler(event, users)
+            except Exception:
+                logging.getLogger("Sentinel").exception("User change handler failed")
+
+    def _build_index(self) -> None:
+        """Rebuild the username and role indexes if the users changed."""
+        users = self.users_db.load_users()
+        if self.users_db.version == self._version:
+            return
+
+        names = sorted((data.get("username", ""), uid) for uid, data in users.items())
+        roles = {}
+        for username, uid in names:
+            roles.setdefault(self.permissions.get_role(users[uid]), []).append(
+                (username, uid)
+            )
+
+        self._names = names
+        self._roles = roles
+        self._version = self.users_db.version
+
+    def describe(self, user_id: str, user_data: dict) -> dict:
+        """Get the public fields of a user."""
+        return {
+            "id": user_id,
+            "username": user_data.get("username"),
+            "role": self.permissions.get_role(user_data),
+            "owner": bool(user_data.get("admin")),
+            "disabled": bool(user_data.get("disabled")),
+        }
+
+    def list_users(
+        self,
+        prefix: str = "",
+        role: Optional[str] = None,
+        offset: int = 0,
+        limit: int = 100,
+    ) -> tuple[int, list[dict]]:
+        """Get the number of matching users and a page of them, sorted by username."""
+        self._build_index()
+        names = self._roles.get(role, []) if role else self._names
+
+        start = bisect.bisect_left(names, (prefix,)) if prefix else 0
+        end = bisect.bisect_left(names, (prefix + "\uffff",)) if prefix else len(names)
+
+        users = self.users_db.users
+        page = names[start + offset : min(start + offset + limit, end)]
+        return max(end - start, 0), [self.describe(uid, users[uid]) for _, uid in page]
+
+    def _get_existing(self, users: dict, user_id: str) -> dict:
+        if user_id not in users:
+            raise KeyError("User not found")
+        return users[user_id]
+
+    def _check_not_owner(self, user_data: dict) -> None:
+        if user_data.get("admin"):
+            raise ValueError("The owner admin account cannot be changed this way")
+
+    def delete_user(self, user_id: str) -> dict:
+        """Delete a user."""
+
+        def delete(users: dict) -> dict:
+            self._check_not_owner(self._get_existing(users, user_id))
+            return users.pop(user_id)
+
+        user_data = self.users_db.update_users(delete)
+        self._notify("deleted", {user_id: user_data})
+        return self.describe(user_id, user_data)
+
+    def set_disabled(self, user_id: str, disabled: bool) -> dict:
+        """Disable or enable a user."""
+
+        def set_disabled(users: dict) -> dict:
+            user_data = self._get_existing(users, user_id)
+            self._check_not_owner(user_data)
+            if disabled:
+                user_data["disabled"] = True
+            else:
+                user_data.pop("disabled", None)
+            return user_data
+
+        return self.describe(user_id, self.users_db.update_users(set_disabled))
+
+    def rename_user(self, user_id: str, username: str) -> dict:
+        """Change the username of a user."""
+        valid, message = validate_username(username)
+        if not valid:
+            raise ValueError(message)
+
+        def rename(users: dict) -> dict:
+            user_data = self._get_existing(users, user_id)
+            if any(
+                uid != user_id and data.get("username") == username
+                for uid, data in users.items()
+            ):
+                raise ValueError("Username already exists")
+            user_data["username"] = username
+            return user_data
+
+        user_data = self.users_db.update_users(rename)
+        self._notify("renamed", {user_id: user_data})
+        return self.describe(user_id, user_data)
+
+    def reset_password(self, user_id: str, password: str) -> dict:
+        """Set a new password for a user."""
+        valid, message = validate_password(password)
+        if not valid:
+            raise ValueError(message)
+
+        password_hash = self.users_db.hash_password(password)
+
+        def reset(users: dict) -> dict:
+            user_data = self._get_existing(users, user_id)
+            user_data["password"] = password_hash
+            return user_data
+
+        return self.describe(user_id, self.users_db.update_users(reset))
+
+    def set_role(self, user_id: str, role: str) -> dict:
+        """Change the role of a user."""
+        if role not in self.permissions.roles:
+            raise ValueError(f"Unknown role: {role}")
+
+        def set_role(users: dict) -> dict:
+            user_data = self._get_existing(users, user_id)
+            self._check_not_owner(user_data)
+            user_data["role"] = role
+            return user_data
+
+        return self.describe(user_id, self.users_db.update_users(set_role))
+
+    @staticmethod
+    def parse_import(body: str, content_type: str) -> list[dict]:
+        """Parse users to import from a JSON list or a CSV with a header row."""
+        if "json" in content_type:
+            records = json.loads(body)
+            if isinstance(records, dict):
+                records = records.get("users", [])
+            if not isinstance(records, list):
+                raise ValueError("Expected a list of users")
+        else:
+            records = list(csv.DictReader(io.StringIO(body)))
+
+        return [
+            {
+                key: Sanitizer.sanitize_input(str(record.get(key) or ""))
+                for key in ("username", "password", "role")
+            }
+            for record in records
+            if isinstance(record, dict)
+        ]
+
+    def import_users(self, records: list[dict]) -> dict:
+        """Create many users at once, hashing their passwords in parallel."""
+        users = self.users_db.load_users()
+        taken = {data.get("username") for data in users.values()}
+
+        accepted = []
+        errors = []
+        for row, record in enumerate(records, start=1):
+            username = record.get("username", "")
+            role = record.get("role") or self.permissions.default_role
+
+            for valid, message in (
+                validate_username(username),
+                validate_password(record.get("password", "")),
+                (role in self.permissions.roles, f"Unknown role: {role}"),
+                (username not in taken, "Username already exists"),
+            ):
+                if not valid:
+                    errors.append({"row": row, "username": username, "error": message})
+                    break
+            else:
+                taken.add(username)
+                accepted.append((str(uuid.uuid4()), username, record["password"], role))
+
+        with ThreadPoolExecutor(max_workers=self.hash_workers) as executor:
+            hashes = list(
+                executor.map(
+                    self.users_db.hash_password, [record[2] for record in accepted]
+                )
+            )
+
+        created = {}
+        for (user_id, username, _, role), password_hash in zip(accepted, hashes):
+            user_data = {"username": username, "password": password_hash}
+            if role != self.permissions.default_role:
+                user_data["role"] = role
+            created[user_id] = user_data
+
+        def add(users: dict) -> dict:
+            existing = {data.get("username") for data in users.values()}
+            added = {
+                uid: data
+                for uid, data in created.items()
+                if data["username"] not in existing
+            }
+            users.update(added)
+            return added
+
+        added = self.users_db.update_users(add) if created else {}
+        if added:
+            self._notify("created", added)
+
+        return {
+            "created": [self.describe(uid, data) for uid, data in added.items()],
+            "errors": errors,
+        }
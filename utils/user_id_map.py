@@ -0,0 +1,126 @@
+import re
+import json
+import uuid
+import threading
+
+from .users_db import UsersDB
+
+
+class UserIdMap:
+    """
+    Two-way map between Sentinel user ids and ComfyUI user manager keys.
+    - The Sentinel user id is the canonical id used by folders and queues.
+    - Usernames are resolved through the user database index.
+    """
+
+    def __init__(self, users_db: UsersDB, user_manager):
+        self.users_db = users_db
+        self.user_manager = user_manager
+
+        self._settings_keys = {}
+        self._user_ids = {}
+        self._version = None
+        self._manager_size = None
+        self._lock = threading.Lock()
+
+    def rebuild(self) -> None:
+        """Join the user manager keys with the user database by username."""
+        self.users_db.load_users()
+        manager_users = dict(getattr(self.user_manager, "users", {}) or {})
+
+        settings_keys = {}
+        user_ids = {}
+        for settings_key, username in manager_users.items():
+            user_id, _ = self.users_db.get_user(username)
+            if user_id is None or user_id in settings_keys:
+                continue
+            settings_keys[user_id] = settings_key
+            user_ids[settings_key] = user_id
+
+        with self._lock:
+            self._settings_keys = settings_keys
+            self._user_ids = user_ids
+            self._version = self.users_db.version
+            self._manager_size = len(manager_users)
+
+    def _refresh(self) -> None:
+        """Rebuild if users were added or removed outside of this map."""
+        if self._version != self.users_db.version or self._manager_size != len(
+            getattr(self.user_manager, "users", {}) or {}
+        ):
+            self.rebuild()
+
+    def add(self, user_id: str, settings_key: str) -> None:
+        """Record the user manager key of a newly registered user."""
+        with self._lock:
+            self._settings_keys[user_id] = settings_key
+            self._user_ids[settings_key] = user_id
+            self._version = self.users_db.version
+            self._manager_size = len(getattr(self.user_manager, "users", {}) or {})
+
+    @staticmethod
+    def make_settings_key(username: str) -> str:
+        """Make a user manager key for a username, like ComfyUI's UserManager.add_user."""
+        return re.sub("[^a-zA-Z0-9-_]+", "-", username.strip()) + "_" + str(uuid.uuid4())
+
+    def add_users(self, usernames: dict) -> None:
+        """
+        Add new users to the ComfyUI user manager.
+        - A single user is added through UserManager.add_user.
+        - UserManager has no bulk API and add_user rewrites its users file on
+          each call, so several users are added to it at once and the file is
+          replaced once.
+        """
+        users = getattr(self.user_manager, "users", None)
+        if (
+            len(usernames) == 1
+            or users is None
+            or not hasattr(self.user_manager, "get_users_file")
+        ):
+            for user_id, username in usernames.items():
+                self.add(user_id, self.user_manager.add_user(username))
+            return
+
+        for user_id, username in usernames.items():
+            settings_key = self.make_settings_key(username)
+            users[settings_key] = username.strip()
+            self.add(user_id, settings_key)
+        self._write_users_file()
+
+    def _write_users_file(self) -> None:
+        """Replace the ComfyUI user manager users file, so a crash never leaves it truncated."""
+        UsersDB.write_atomic(
+            self.user_manager.get_users_file(),
+            json.dumps(self.user_manager.users).encode("utf-8"),
+        )
+
+    def remove(self, user_id: str) -> None:
+        """Forget a user."""
+        with self._lock:
+            settings_key = self._settings_keys.pop(user_id, None)
+            self._user_ids.pop(settings_key, None)
+
+    def rename(self, user_id: str, username: str) -> None:
+        """Rename a user in the ComfyUI user manager so the join keeps matching."""
+        settings_key = self._settings_keys.get(user_id)
+        users = getattr(self.user_manager, "users", None)
+        if settings_key is None or users is None:
+            return
+
+        users[settings_key] = username
+        if hasattr(self.user_manager, "get_users_file"):
+            self._write_users_file()
+
+    def get_settings_key(self, user_id: str) -> str | None:
+        """Get the user manager key of a user."""
+        self._refresh()
+        return self._settings_keys.get(user_id)
+
+    def get_user_id(self, settings_key: str) -> str | None:
+        """Get the user id behind a user manager key."""
+        self._refresh()
+        return self._user_ids.get(settings_key)
+
+    def get_username(self, user_id: str) -> str | None:
+        """Get the username of a user."""
+        return self.users_db.get_user(user_id=user_id)[1].get("username")
@@ -1,91 +1,274 @@
-import bcrypt
 import json
 import os
+import time
+import atexit
 import hashlib
+import logging
+import threading
 from pathlib import Path
+from typing import Callable
+
+from .password_hasher import PasswordHasher
 
 
 class UsersDB:
-    def __init__(self, database: str | Path):
+    def __init__(
+        self,
+        database: str | Path,
+        write_delay: float = 0.05,
+        password_hasher: PasswordHasher | None = None,
+    ):
         self.database = database
+        self.password_hasher = password_hasher or PasswordHasher()
+        self.backup = f"{database}.bak"
+        self.write_delay = write_delay
 
         self.users = {}
         self.admin_user = (None, {})
+        self.version = 0
+
+        self._user_ids = {}
 
         self._database_hash = None
+        self._database_stat = None
+        self._loaded = False
+        self._lock = threading.RLock()
 
-        self.load_users()
+        self._pending = None
+        self._writing = False
+        self._write_condition = threading.Condition()
+        self._writer = None
+
+        atexit.register(self.flush)
+
+    def hash_password(self, password: str) -> str:
+        """Hash a password with the configured scheme and work factor."""
+        return self.password_hasher.hash(password)
 
     @staticmethod
-    def hash_password(password: str) -> str:
-        """Hash a password using bcrypt."""
-        return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    def hash_bytes(data: bytes) -> str:
+        """Calculate the SHA256 hash of serialized users."""
+        return hashlib.sha256(data).hexdigest()
 
     def calculate_file_hash(self) -> str:
         """Calculate the SHA256 hash of the database file."""
         if os.path.exists(self.database):
             with open(self.database, "rb") as f:
-                file_data = f.read()
-                return hashlib.sha256(file_data).hexdigest()
+                return self.hash_bytes(f.read())
         return ""
 
+    def get_file_stat(self) -> tuple | None:
+        """Get the modification time and size of the database file."""
+        try:
+            stat = os.stat(self.database)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _set_users(self, users: dict) -> None:
+        """Replace the users and bump the version."""
+        self.users = users
+        self._user_ids = {
+            user_data.get("username"): uid for uid, user_data in users.items()
+        }
+        self.admin_user = next(
+            ((uid, data) for uid, data in users.items() if data.get("admin")),
+            (None, {}),
+        )
+        self.version += 1
+
+    def _read_file(self, path: str) -> tuple[dict, str]:
+        """Read and decode a database file, returning the users and their hash."""
+        with open(path, "rb") as f:
+            data = f.read()
+
+        users = json.loads(data)
+        if not isinstance(users, dict):
+            raise ValueError(f"{path} does not contain a user mapping")
+        return users, self.hash_bytes(data)
+
     def load_users(self) -> dict:
         """Load users from the database if it has changed."""
-        current_hash = self.calculate_file_hash()
-        if current_hash != self._database_hash:
-            if os.path.exists(self.database):
-                with open(self.database, "r") as f:
-                    try:
-                        self.users = json.load(f)
-                        self._database_hash = current_hash
-                    except json.JSONDecodeError:
-                        self.users = {}
-        return self.users
+        if self._pending is not None or self._writing:
+            # The in-memory users are newer than the file until it is written.
+            return self.users
+
+        current_stat = self.get_file_stat()
+        if current_stat is not None and current_stat == self._database_stat:
+            return self.users
+
+        with self._lock:
+            if current_stat is None:
+                self._database_stat = None
+                self._loaded = True
+                return self.users
+
+            try:
+                users, current_hash = self._read_file(self.database)
+            except (OSError, ValueError) as e:
+                users, current_hash = self._recover(e)
+                if users is None:
+                    return self.users
+
+            if current_hash != self._database_hash:
+                self._set_users(users)
+                self._database_hash = current_hash
+            self._database_stat = current_stat
+            self._loaded = True
+            return self.users
+
+    def _recover(self, error: Exception) -> tuple[dict | None, str | None]:
+        """Fall back to the last known good snapshot when the database is unreadable."""
+        logger = logging.getLogger("Sentinel")
+        try:
+            users, backup_hash = self._read_file(self.backup)
+        except (OSError, ValueError):
+            if self._loaded:
+                logger.error(
+                    f"Cannot read {self.database} ({error}), keeping the users in memory"
+                )
+                return None, None
+            raise RuntimeError(
+                f"Cannot read the user database {self.database} and no usable "
+                f"backup exists at {self.backup}: {error}"
+            ) from error
+
+        logger.error(
+            f"Cannot read {self.database} ({error}), loaded the backup {self.backup}"
+        )
+        return users, backup_hash
 
     def save_users(self, users: dict) -> None:
-        """Save users to the database and update the hash."""
-        with open(self.database, "w") as f:
-            json.dump(users, f)
+        """Update the users in memory and schedule an atomic write to the database."""
+        data = json.dumps(users).encode("utf-8")
+
+        with self._lock:
+            self._set_users(users)
+            self._database_hash = self.hash_bytes(data)
+            self._loaded = True
 
-        self._database_hash = self.calculate_file_hash()
+        with self._write_condition:
+            self._pending = data
+            if self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._write_loop, name="sentinel-users-db", daemon=True
+                )
+                self._writer.start()
+            self._write_condition.notify_all()
+
+    @staticmethod
+    def write_atomic(path: str, data: bytes) -> None:
+        """Write a file through a temporary file, fsync and rename."""
+        temp_file = f"{path}.tmp"
+        with open(temp_file, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, path)
+
+        if hasattr(os, "O_DIRECTORY"):
+            directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_DIRECTORY)
+            try:
+                os.fsync(directory)
+            finally:
+                os.close(directory)
+
+    def _write_loop(self) -> None:
+        while True:
+            with self._write_condition:
+                while self._pending is None:
+                    self._write_condition.wait()
+                self._writing = True
+
+            # Let a burst of changes settle so they are written once.
+            time.sleep(self.write_delay)
+
+            with self._write_condition:
+                data, self._pending = self._pending, None
+
+            try:
+                self.write_atomic(self.database, data)
+                self.write_atomic(self.backup, data)
+                with self._lock:
+                    if self._pending is None:
+                        self._database_stat = self.get_file_stat()
+            except OSError as e:
+                logging.getLogger("Sentinel").error(
+                    f"Failed to write {self.database}: {e}"
+                )
+            finally:
+                with self._write_condition:
+                    self._writing = False
+                    self._write_condition.notify_all()
+
+    def flush(self, timeout: float = 10.0) -> None:
+        """Wait until pending changes are written to disk."""
+        deadline = time.monotonic() + timeout
+        with self._write_condition:
+            while self._pending is not None or self._writing:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                self._write_condition.wait(remaining)
+
+    def update_users(self, update: Callable[[dict], object]):
+        """
+        Apply a change to a copy of the users and save it.
+        - The JSON database is rewritten as a whole, by the background writer
+          that coalesces bursts of changes into one write.
+        """
+        with self._lock:
+            users = {uid: dict(data) for uid, data in self.load_users().items()}
+            result = update(users)
+            self.save_users(users)
+            return result
 
     def add_user(self, id: str, username: str, password: str, admin: bool) -> None:
         """Add a user to the database."""
-        self.load_users()
         user = {"username": username, "password": self.hash_password(password)}
         if admin:
             user["admin"] = admin
-        self.users[id] = user
-        self.save_users(self.users)
+
+        def add(users: dict) -> None:
+            users[id] = user
+
+        self.update_users(add)
 
     def get_user(self, username: str = "", user_id: str = "") -> tuple[str, dict]:
-        """Retrieve a user by username."""
+        """Retrieve a user by username or id."""
         self.load_users()
 
-        if user_id:
-            return user_id, self.users[user_id] or None, {}
+        if not user_id:
+            user_id = self._user_ids.get(username)
 
-        for uid, user_data in self.users.items():
-            if user_data["username"] == username:
-                return uid, user_data
+        if user_id in self.users:
+            return user_id, self.users[user_id]
 
         return None, {}
 
     def check_username_password(self, username: str, password: str) -> bool:
         """Check if the username and password match."""
         user_id, user_data = self.get_user(username)
-        if not user_id:
+        if not user_id or user_data.get("disabled"):
             return False
 
-        return bcrypt.checkpw(
-            password.encode("utf-8"), user_data["password"].encode("utf-8")
-        )
+        stored_hash = user_data["password"]
+        if not self.password_hasher.verify(password, stored_hash):
+            return False
+
+        if self.password_hasher.needs_rehash(stored_hash):
+            new_hash = self.hash_password(password)
+
+            def rehash(users: dict) -> None:
+                # Skip if the password was changed meanwhile.
+                if users.get(user_id, {}).get("password") == stored_hash:
+                    users[user_id]["password"] = new_hash
+
+            self.update_users(rehash)
+
+        return True
 
     def get_admin_user(self) -> tuple[str, dict] | None:
         """Get the admin user from the database."""
         self.load_users()
-        for uid, user_data in self.users.items():
-            if user_data.get("admin"):
-                self.admin_user = (uid, user_data)
-
         return self.admin_user
@@ -1,86 +1,121 @@
+import { app } from "/scripts/app.js";
 import { $el } from "/scripts/ui.js";
 
-async function setupLogout() {
+function logoutAction() {
   try {
-    await new Promise((resolve) => {
-      const interval = setInterval(() => {
-        if (document.querySelector(".side-tool-bar-end")) {
-          clearInterval(interval);
-          resolve();
-        }
-      }, 100);
+    localStorage.clear();
+    sessionStorage.clear();
+    document.cookie.split(";").forEach((cookie) => {
+      const cookieName = cookie.split("=")[0].trim();
+      document.cookie = `${cookieName}=; expires=Thu, 01 Jan 1970 00:00:00 UTC; path=/`;
     });
 
-    function logoutAction() {
-      try {
-        localStorage.clear();
-        sessionStorage.clear();
-        document.cookie.split(";").forEach((cookie) => {
-          const cookieName = cookie.split("=")[0].trim();
-          document.cookie = `${cookieName}=; expires=Thu, 01 Jan 1970 00:00:00 UTC; path=/`;
-        });
-
-        window.location.href = "/logout";
-      } catch (error) {
-        console.error("Error during logout process:", error);
-      }
-    }
+    window.location.href = "/logout";
+  } catch (error) {
+    console.error("Error during logout process:", error);
+  }
+}
 
-    $el(
-      "button",
-      {
-        className:
-          "p-button p-component p-button-icon-only p-button-text comfy-settings-btn side-bar-button p-button-secondary sentinel-logout",
-        type: "button",
-        id: "logout-button",
-        ariaLabel: "Logout",
+function createLogoutButton() {
+  return $el(
+    "button",
+    {
+      className:
+        "p-button p-component p-button-icon-only p-button-text comfy-settings-btn side-bar-button p-button-secondary sentinel-logout",
+      type: "button",
+      id: "logout-button",
+      ariaLabel: "Logout",
+      dataset: {
+        pcName: "button",
+        pDisabled: false,
+        pcSection: "root",
+        pdTooltip: false,
+        "v-6ab4daa6": "",
+        "v-33cac83a": "",
+      },
+      onclick: logoutAction,
+    },
+    [
+      $el("li", {
+        className: "pi pi-sign-out side-bar-button-icon",
         dataset: {
-          pcName: "button",
-          pDisabled: false,
-          pcSection: "root",
-          pdTooltip: false,
           "v-6ab4daa6": "",
-          "v-33cac83a": "",
         },
-        parent: document.querySelector(".side-tool-bar-end"),
-        onclick: logoutAction,
-      },
-      [
-        $el("li", {
-          className: "pi pi-sign-out side-bar-button-icon",
-          dataset: {
-            "v-6ab4daa6": "",
-          },
-        }),
-      ]
-    );
+      }),
+    ]
+  );
+}
 
-    $el(
-      "button",
-      {
-        textContent: "Logout",
-        id: "logout-menu-button",
-        parent: document.querySelector(".comfy-menu"),
-        onclick: logoutAction,
-      },
-      [
-        $el("li", {
-          className: "pi pi-sign-out logout-icon",
-        }),
-      ]
-    );
+function whenMounted(selector, callback) {
+  // Observe the DOM only until the element exists.
+  const element = document.querySelector(selector);
+  if (element) {
+    callback(element);
+    return;
+  }
 
-  } catch (error) {
-    console.error("Error setting up Logout button:", error);
+  const observer = new MutationObserver(() => {
+    const element = document.querySelector(selector);
+    if (element) {
+      observer.disconnect();
+      callback(element);
+    }
+  });
+  observer.observe(document.body, { childList: true, subtree: true });
+}
+
+function whenDetached(element, callback) {
+  // Re-rendering the sidebar or any of its ancestors replaces a child of one of
+  // the element's ancestors, so watching their direct children is enough.
+  const observer = new MutationObserver(() => {
+    if (!element.isConnected) {
+      observer.disconnect();
+      callback();
+    }
+  });
+  for (let node = element.parentElement; node; node = node.parentElement) {
+    observer.observe(node, { childList: true });
   }
 }
 
-let isSettingUp = false;
+function mountLogoutButton() {
+  whenMounted(".side-tool-bar-end", (toolbar) => {
+    const button = createLogoutButton();
+    toolbar.append(button);
+    whenDetached(button, mountLogoutButton);
+  });
+}
 
-setInterval(async () => {
-  if (document.getElementById("logout-button") === null && !isSettingUp) {
-    isSettingUp = true;
-    await setupLogout();
-    isSettingUp = false;
+function mountLogoutMenuButton() {
+  const menu = document.querySelector(".comfy-menu");
+  if (!menu || document.getElementById("logout-menu-button")) {
+    return;
   }
-}, 500);
\ No newline at end of file
+
+  $el(
+    "button",
+    {
+      textContent: "Logout",
+      id: "logout-menu-button",
+      parent: menu,
+      onclick: logoutAction,
+    },
+    [
+      $el("li", {
+        className: "pi pi-sign-out logout-icon",
+      }),
+    ]
+  );
+}
+
+app.registerExtension({
+  name: "Sentinel.Logout",
+  setup() {
+    try {
+      mountLogoutButton();
+      mountLogoutMenuButton();
+    } catch (error) {
+      console.error("Error setting up Logout button:", error);
+    }
+  },
+});